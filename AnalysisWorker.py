@@ -0,0 +1,151 @@
+# AnalysisWorker.py
+# Chạy phân tích ảnh + gọi agent ngoài luồng script của Streamlit:
+#   - việc nặng CPU (ImageMetrics trên frame full-res) chạy trong process pool
+#   - gọi agent (I/O, mạng) chạy trên 1 event loop asyncio ở luồng riêng
+# UI chỉ submit() rồi kiểm tra future.done() ở các lần rerun, không bao giờ bị chặn.
+import asyncio
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from ImageMetrics import compute_metrics
+
+
+def _analyze_frame(array, pixel_format):
+    """Chạy trong process con (phải là hàm cấp module để pickle được)."""
+    metrics = compute_metrics(array, pixel_format)
+    metrics["histogram"] = metrics["histogram"].tolist()
+    return metrics
+
+
+class EchoAgent:
+    """
+    Agent giả lập chạy local (không gọi mạng): trả lời lại prompt kèm tóm tắt chỉ số ảnh.
+    Agent thật chỉ cần có coroutine ask(prompt, metrics) -> str.
+    """
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    async def ask(self, prompt, metrics=None):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if metrics is None:
+            return f"Echo from bot: {prompt}"
+        return (f"Echo from bot: {prompt} (brightness {metrics['mean']:.2f}, "
+                f"clipped {metrics['clipped_high']:.2%}, sharpness {metrics['sharpness']:.0f})")
+
+
+class _Job:
+    __slots__ = ("id", "key", "array", "pixel_format", "prompt", "seq", "future", "submitted")
+
+    def __init__(self, job_id, key, array, pixel_format, prompt, seq):
+        self.id = job_id
+        self.key = key
+        self.array = array
+        self.pixel_format = pixel_format
+        self.prompt = prompt
+        self.seq = seq
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class AnalysisWorker:
+    """
+    Nhận job (frame + prompt), trả về concurrent.futures.Future với kết quả dict:
+        {"seq", "prompt", "metrics", "reply", "stale", "latency"}
+
+    Mỗi `key` (vd. 1 phiên chat hoặc "analyze") có tối đa 1 job đang chạy và 1 job chờ:
+    job mới tới khi job cũ còn chờ sẽ thay thế nó (future cũ bị cancel), nên khi frame tới
+    nhanh hơn tốc độ phân tích thì chỉ frame mới nhất được xử lý. Kết quả của job đang chạy
+    được đánh dấu stale=True nếu đã có job mới hơn cùng key.
+    """
+    def __init__(self, agent=None, processes=1):
+        self.agent = agent if agent is not None else EchoAgent()
+        # spawn: process con không kế thừa luồng grab/HTTP của process chính
+        self._pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="AnalysisLoop", daemon=True)
+        self._thread.start()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._running = {}
+        self._pending = {}
+        self._latest = {}
+        # Thống kê
+        self.submitted = 0
+        self.completed = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    def submit(self, array=None, prompt=None, key="default", pixel_format=None, seq=None):
+        """
+        Đưa 1 job vào hàng đợi (không chặn). array=None: chỉ gọi agent với prompt.
+        array phải là bản copy riêng (frame trong ring buffer có thể bị ghi đè).
+        Job cùng key được gộp; dùng key riêng cho job không được phép bỏ (vd. mỗi tin nhắn chat).
+        """
+        job = _Job(next(self._ids), key, array, pixel_format, prompt, seq)
+        with self._lock:
+            self.submitted += 1
+            self._latest[key] = job.id
+            old = self._pending.get(key)
+            if key in self._running:
+                self._pending[key] = job
+                if old is not None:
+                    self.coalesced += 1
+                    old.future.cancel()
+                return job.future
+            self._running[key] = job
+        self._start(job)
+        return job.future
+
+    def _start(self, job):
+        asyncio.run_coroutine_threadsafe(self._run(job), self._loop)
+
+    async def _run(self, job):
+        result = {"seq": job.seq, "prompt": job.prompt, "metrics": None, "reply": None}
+        try:
+            if not job.future.set_running_or_notify_cancel():
+                return  # UI đã huỷ trước khi job bắt đầu
+            if job.array is not None:
+                result["metrics"] = await self._loop.run_in_executor(
+                    self._pool, _analyze_frame, job.array, job.pixel_format)
+            job.array = None  # không giữ frame lâu hơn cần thiết
+            if job.prompt:
+                result["reply"] = await self.agent.ask(job.prompt, result["metrics"])
+            with self._lock:
+                result["stale"] = self._latest.get(job.key) != job.id
+                self.completed += 1
+            result["latency"] = round(time.perf_counter() - job.submitted, 4)
+            job.future.set_result(result)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            job.future.set_exception(e)
+        finally:
+            with self._lock:
+                nxt = self._pending.pop(job.key, None)
+                if nxt is None:
+                    self._running.pop(job.key, None)
+                    if self._latest.get(job.key) == job.id:
+                        del self._latest[job.key]
+                else:
+                    self._running[job.key] = nxt
+            if nxt is not None:
+                self._start(nxt)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "coalesced": self.coalesced,
+                "failed": self.failed,
+                "running": len(self._running),
+                "pending": len(self._pending),
+            }
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=1.0)
+        self._pool.shutdown(wait=False, cancel_futures=True)
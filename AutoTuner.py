@@ -0,0 +1,249 @@
+# AutoTuner.py
+# Bộ điều khiển vòng kín chỉnh ExposureTime/Gain/AcquisitionFrameRate cho tới khi độ sáng ảnh
+# (ImageMetrics) đạt mục tiêu, dùng mô hình cảm biến tuyến tính để hội tụ trong vài frame.
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+_GOLDEN = (math.sqrt(5.0) - 1.0) / 2.0
+
+
+class AutoTuner:
+    """
+    Chạy trên BaslerCameraAPI đã kết nối (đang grab nền hoặc chụp từng frame):
+
+    1. Exposure: ảnh tuyến tính theo ExposureTime x Gain nên mỗi vòng nhân "lượng sáng"
+       với (target / mean) ** damping, tức bước tỉ lệ trên log-exposure. Lượng sáng được phân bổ:
+       ExposureTime trước (trong chu kỳ frame), rồi hạ AcquisitionFrameRate tới min_fps (nếu có),
+       cuối cùng mới tăng Gain (tăng nhiễu). Cháy sáng quá max_clipped luôn kéo lượng sáng xuống.
+    2. refine=True: golden-section trên log(ExposureTime) quanh điểm vừa tìm (Gain giữ nguyên),
+       tối đa hoá sharpness có phạt cháy sáng.
+
+    Mọi giới hạn lấy từ `_Min`/`_Max` của get_settings. Sau mỗi lần ghi, frame phơi sáng trước khi
+    setting có hiệu lực bị bỏ: chỉ nhận frame về sau lúc ghi, và bỏ thêm settle_frames frame
+    (frame đang phơi sáng / đang đọc ra lúc ghi, thường 1-2 frame trên camera Basler).
+    """
+    def __init__(self, api, target=0.45, tolerance=0.04, max_clipped=0.005, damping=1.0,
+                 min_fps=None, settle_frames=2, max_iterations=12, refine=False,
+                 refine_iterations=6, timeout=2.0):
+        self.api = api
+        self.target = target
+        self.tolerance = tolerance
+        self.max_clipped = max_clipped
+        self.damping = damping
+        self.min_fps = min_fps
+        self.settle_frames = settle_frames
+        self.max_iterations = max_iterations
+        self.refine = refine
+        self.refine_iterations = refine_iterations
+        self.timeout = timeout
+        # Thống kê lần chạy gần nhất
+        self.frames = 0
+        self.discarded = 0
+        self.history = []
+        self._seq = -1
+
+    # ---------------- Đọc frame sau khi setting có hiệu lực ----------------
+    def _fresh_frame(self, t_write):
+        """
+        Frame đầu tiên chắc chắn phơi sáng với setting ghi lúc t_write (None nếu timeout).
+        t_write=None: không có gì mới được ghi, lấy frame kế tiếp.
+        """
+        api = self.api
+        settle = self.settle_frames if t_write is not None else 0
+        t_write = -math.inf if t_write is None else t_write
+        if api.is_background_grabbing:
+            deadline = time.perf_counter() + self.timeout
+            fresh = 0
+            while True:
+                remaining = deadline - time.perf_counter()
+                frame = api.get_next(self._seq, timeout=max(remaining, 0.0))
+                if frame is None:
+                    return None
+                self._seq = frame.seq
+                self.frames += 1
+                if frame.host_time > t_write:
+                    fresh += 1
+                    if fresh > settle:
+                        return frame.array
+                self.discarded += 1
+        # Không grab nền: trigger/grab-one luôn bắt đầu sau lúc ghi; chỉ khi camera
+        # đang grabbing liên tục mới có frame cũ trong hàng đợi cần bỏ
+        if api.trigger_source is None and api.camera.IsGrabbing():
+            for _ in range(settle):
+                api.get_image()
+                self.frames += 1
+                self.discarded += 1
+        array = api.get_image()
+        self.frames += 1
+        return array
+
+    def _measure(self, t_write):
+        array = self._fresh_frame(t_write)
+        if array is None:
+            raise TimeoutError("AutoTuner: không nhận được frame mới")
+        return self.api.analyze_image(array)
+
+    # ---------------- Mô hình lượng sáng ----------------
+    def _read_limits(self):
+        s = self.api.get_settings(["ExposureTime", "Gain", "AcquisitionFrameRate", "AcquisitionFrameRateEnable"])
+        if s.get("ExposureTime") is None:
+            raise RuntimeError("AutoTuner: camera không có node ExposureTime")
+        self._limits = s
+        self._nominal_fps = s.get("AcquisitionFrameRate")
+        return {"ExposureTime": s["ExposureTime"], "Gain": s.get("Gain"),
+                "AcquisitionFrameRate": s.get("AcquisitionFrameRate")}
+
+    def _gain_floor(self):
+        return self._limits.get("Gain_Min") or 0.0
+
+    def _light(self, settings):
+        """Lượng sáng tương đối = ExposureTime x hệ số Gain (so với Gain_Min)."""
+        gain = settings.get("Gain")
+        gain_db = 0.0 if gain is None else gain - self._gain_floor()
+        return settings["ExposureTime"] * 10 ** (gain_db / 20.0)
+
+    def _allocate(self, light):
+        """Chia lượng sáng cho ExposureTime -> AcquisitionFrameRate -> Gain, trong giới hạn node."""
+        lim = self._limits
+        e_min, e_max = lim["ExposureTime_Min"], lim["ExposureTime_Max"]
+        fps = self._nominal_fps
+        e_frame = min(e_max, 1e6 / fps) if fps else e_max
+        exposure = min(max(light, e_min), e_frame)
+        if light > e_frame and fps and self.min_fps and self.min_fps < fps:
+            # Ưu tiên giảm frame rate hơn tăng Gain (Gain làm tăng nhiễu)
+            exposure = min(light, e_max, 1e6 / self.min_fps)
+            fps = max(min(fps, 1e6 / exposure), lim.get("AcquisitionFrameRate_Min") or 0.0)
+        settings = {"ExposureTime": exposure}
+        if lim.get("Gain") is not None:
+            g_min, g_max = self._gain_floor(), lim["Gain_Max"]
+            gain_db = 20.0 * math.log10(light / exposure) if light > exposure else 0.0
+            settings["Gain"] = min(max(g_min + gain_db, g_min), g_max)
+        if lim.get("AcquisitionFrameRate") is not None:
+            settings["AcquisitionFrameRate"] = fps
+        return settings
+
+    def _step_ratio(self, m):
+        mean = max(m["mean"], 1.0 / 1024)
+        ratio = self.target / mean
+        if m["clipped_high"] > self.max_clipped:
+            ratio = min(ratio, 0.8)
+        ratio = min(max(ratio, 1.0 / 16), 16.0)
+        return ratio ** self.damping
+
+    def _converged(self, m):
+        if m["clipped_high"] > self.max_clipped:
+            return False
+        if abs(m["mean"] - self.target) <= self.tolerance:
+            return True
+        # Cảnh tương phản cao: vùng sáng sắp cháy trước khi mean tới mục tiêu
+        return m["mean"] < self.target and m["p99"] >= 0.98
+
+    def _write(self, current, settings):
+        """Ghi các giá trị đã đổi qua apply_settings (1 giao dịch). Trả về (settings thực tế, lúc ghi)."""
+        changes = {k: v for k, v in settings.items()
+                   if current.get(k) is None or not math.isclose(v, current[k], rel_tol=1e-3)}
+        if not changes:
+            return current, None
+        if "AcquisitionFrameRate" in changes and self._limits.get("AcquisitionFrameRateEnable") is not None:
+            changes["AcquisitionFrameRateEnable"] = True
+        if not self.api.apply_settings(changes):
+            raise RuntimeError(f"AutoTuner: không ghi được {changes}")
+        t_write = time.perf_counter()
+        applied = dict(current)
+        applied.update({k: v for k, v in self.api.last_applied_settings.items() if k in current})
+        return applied, t_write
+
+    def _record(self, phase, settings, m):
+        self.history.append({"phase": phase, **settings,
+                             **{k: m[k] for k in ("mean", "p99", "clipped_high", "sharpness", "noise")}})
+
+    # ---------------- Golden-section trên độ nét ----------------
+    def _score(self, m):
+        score = m["sharpness"]
+        if m["clipped_high"] > self.max_clipped:
+            score *= self.max_clipped / m["clipped_high"]
+        return score
+
+    def _refine(self, current, m):
+        """Golden-section trên log(ExposureTime) trong [e/2, 2e], chỉ chọn điểm vẫn đạt độ sáng mục tiêu (nếu có)."""
+        lim = self._limits
+        fps = current.get("AcquisitionFrameRate")
+        e_hi = min(lim["ExposureTime_Max"], 1e6 / fps) if fps else lim["ExposureTime_Max"]
+        e = current["ExposureTime"]
+        lo, hi = math.log(max(lim["ExposureTime_Min"], e / 2)), math.log(min(e_hi, e * 2))
+        state = {"settings": current}
+        # Điểm xuất phát cũng là 1 ứng viên: refine không bao giờ làm kết quả tệ hơn
+        scores = {math.log(e): (self._score(m), current, m)}
+        if hi - lo < 1e-3:
+            return current, m
+
+        def evaluate(x):
+            settings, t_write = self._write(state["settings"], {"ExposureTime": math.exp(x)})
+            state["settings"] = settings
+            m = self._measure(t_write)
+            self._record("refine", settings, m)
+            scores[x] = (self._score(m), settings, m)
+            return scores[x][0]
+
+        a, b = lo, hi
+        c, d = b - _GOLDEN * (b - a), a + _GOLDEN * (b - a)
+        fc, fd = evaluate(c), evaluate(d)
+        for _ in range(max(self.refine_iterations - 2, 0)):
+            if fc >= fd:
+                b, d, fd = d, c, fc
+                c = b - _GOLDEN * (b - a)
+                fc = evaluate(c)
+            else:
+                a, c, fc = c, d, fd
+                d = a + _GOLDEN * (b - a)
+                fd = evaluate(d)
+        candidates = [v for v in scores.values() if self._converged(v[2])] or list(scores.values())
+        _, best, m = max(candidates, key=lambda v: v[0])
+        settings, t_write = self._write(state["settings"], best)
+        if t_write is not None:
+            m = self._measure(t_write)
+            self._record("refine", settings, m)
+        return settings, m
+
+    # ---------------- Vòng điều khiển ----------------
+    def run(self):
+        """
+        Chạy tới khi hội tụ hoặc hết max_iterations. Trả về dict: converged, iterations (số lần ghi), frames
+        (đã đọc, gồm cả frame bỏ), discarded, wall_time (s), settings cuối, metrics cuối, history.
+        """
+        t0 = time.perf_counter()
+        self.frames = self.discarded = 0
+        self.history = []
+        self._seq = self.api.latest_seq if self.api.is_background_grabbing else -1
+        current = self._read_limits()
+        m = self._measure(None)
+        self._record("start", current, m)
+        iterations = 0
+        while not self._converged(m) and iterations < self.max_iterations:
+            target_settings = self._allocate(self._light(current) * self._step_ratio(m))
+            current, t_write = self._write(current, target_settings)
+            if t_write is None:
+                break  # đã chạm giới hạn node, không chỉnh thêm được
+            iterations += 1
+            m = self._measure(t_write)
+            self._record("exposure", current, m)
+        converged = self._converged(m)
+        if self.refine:
+            current, m = self._refine(current, m)
+            converged = self._converged(m)
+        result = {
+            "converged": converged,
+            "iterations": iterations,
+            "frames": self.frames,
+            "discarded": self.discarded,
+            "wall_time": round(time.perf_counter() - t0, 4),
+            "settings": current,
+            "metrics": {k: v for k, v in m.items() if k != "histogram"},
+            "history": self.history,
+        }
+        logger.info("%s sau %d vòng, %d frame (%d bỏ), %.0f ms: %s", "Hội tụ" if converged else "Chưa hội tụ",
+                    iterations, self.frames, self.discarded, result["wall_time"] * 1e3, current)
+        return result
@@ -1,7 +1,20 @@
 # basler_api.py
 
+import logging
+import threading
+import time
 from pypylon import pylon
 import numpy as np
+from FrameBuffer import Frame, FrameRingBuffer
+from Recorder import RawRecorder
+from EventClip import EventClipBuffer
+from SettingsCache import SettingsCache
+from ImageMetrics import ImageMetrics
+from Telemetry import TELEMETRY
+from PixelConverter import PixelConverter
+from ChangeDetector import ChangeDetector
+
+logger = logging.getLogger(__name__)
 
 class CameraInfo:
     def __init__(self, friendly_name, serial_number, info):
@@ -12,17 +25,233 @@ class CameraInfo:
     def __repr__(self):
         return f"CameraInfo(friendly_name='{self.friendly_name}', serial_number='{self.serial_number}')"
 
+# Thứ tự ghi node: node đứng trước quyết định giới hạn (Min/Max) của node đứng sau
+_SETTING_ORDER = [
+    "PixelFormat",
+    "BinningHorizontal", "BinningVertical", "DecimationHorizontal", "DecimationVertical",
+    "Width", "Height", "OffsetX", "OffsetY", "ReverseX", "ReverseY",
+    "TriggerSelector", "TriggerMode", "TriggerSource", "TriggerActivation",
+    "ExposureAuto", "GainAuto", "BalanceWhiteAuto",
+    "ExposureTime", "Gain",
+    "AcquisitionFrameRateEnable", "AcquisitionFrameRate",
+]
+# Node chỉ ghi được khi không grabbing (thay đổi kích thước payload)
+_RESTART_NODES = {"PixelFormat", "Width", "Height", "OffsetX", "OffsetY",
+                  "BinningHorizontal", "BinningVertical", "DecimationHorizontal", "DecimationVertical"}
+
+
+def create_instant_camera(tl_factory, device_info=None):
+    """
+    Tạo camera từ tl_factory (pylon.TlFactory hoặc backend thay thế như SimCamera.SimTlFactory).
+    Backend mà CreateDevice trả về thẳng đối tượng kiểu InstantCamera thì dùng luôn, không bọc lại.
+    """
+    device = tl_factory.CreateDevice(device_info) if device_info is not None else tl_factory.CreateFirstDevice()
+    return device if hasattr(device, "RetrieveResult") else pylon.InstantCamera(device)
+
+
+def _coerce_value(node, value):
+    """Ép kiểu value theo kiểu giá trị hiện tại của node."""
+    cur_type = type(node.Value)
+    if cur_type is bool:
+        return bool(value)
+    if cur_type is int:
+        return int(round(float(value)))
+    if cur_type is float:
+        return float(value)
+    return value
+
+
+def _clamp_to_node(node, value):
+    """Kẹp value vào [Min, Max] và làm tròn theo Inc của node (nếu node có các thuộc tính này)."""
+    try:
+        lo, hi = node.Min, node.Max
+    except Exception:
+        return value
+    if lo is None or hi is None:
+        return value
+    value = min(max(value, lo), hi)
+    try:
+        inc = node.Inc
+    except Exception:
+        inc = None
+    if inc:
+        value = lo + round((value - lo) / inc) * inc
+        if value > hi:
+            value -= inc
+    return type(lo)(value) if isinstance(lo, int) else value
+
+
+def _align_span(start, end, limit, offset_inc, size_inc, min_size):
+    """
+    Căn đoạn [start, end) theo Inc của node Offset/Size, mở rộng ra ngoài để vẫn phủ đoạn yêu cầu
+    và nằm trong [0, limit). Trả về (offset, size).
+    """
+    offset_inc = max(int(offset_inc or 1), 1)
+    size_inc = max(int(size_inc or 1), 1)
+    size_max = limit - limit % size_inc
+    offset = int(start) // offset_inc * offset_inc
+    size = -(-(int(np.ceil(end)) - offset) // size_inc) * size_inc
+    size = min(max(size, int(min_size or size_inc)), size_max)
+    if offset + size > limit:
+        offset = (limit - size) // offset_inc * offset_inc
+    return offset, size
+
+
+_ROI_AXES = (("Width", "OffsetX"), ("Height", "OffsetY"))
+
+
+def _plan_settings(settings_dict, current=None):
+    """
+    Sắp xếp {setting: value} thành danh sách (name, value) theo thứ tự phụ thuộc.
+    Lô có Offset: Offset được đưa về 0 trước để Width/Height luôn ghi được, rồi ghi Offset đích.
+    Lô chỉ có Width/Height: current = {offset: (giá trị trước lô, Width/Height.Max trước lô)}; Offset
+    chỉ về 0 khi cần chỗ (kích thước mới vượt Max, hoặc lô đổi Binning/PixelFormat), sau đó ghi lại
+    giá trị cũ (kẹp theo Max mới) để vùng không bị dời. Không có current thì đưa về 0 như trước.
+    """
+    rank = {name: i for i, name in enumerate(_SETTING_ORDER)}
+    names = sorted(settings_dict, key=lambda n: rank.get(n, len(rank)))
+    reshapes = any(rank.get(n, len(rank)) < rank["Width"] for n in names)
+    clear, restore = [], []
+    for size, offset in _ROI_AXES:
+        if offset in settings_dict:
+            clear.append((offset, 0))
+        elif size in settings_dict:
+            old, size_max = (current or {}).get(offset, (None, None))
+            try:
+                fits = not reshapes and size_max is not None and float(settings_dict[size]) <= size_max
+            except (TypeError, ValueError):
+                fits = False
+            if fits:
+                continue  # Offset giữ nguyên, Width/Height mới vẫn nằm trong sensor
+            clear.append((offset, 0))
+            if old:
+                restore.append((offset, old))
+    # Offset 0 phải nằm sau Binning/PixelFormat nhưng trước Width/Height
+    head = [n for n in names if rank.get(n, len(rank)) < rank["Width"]]
+    sizes = [n for n in names if n in ("Width", "Height")]
+    tail = [n for n in names if n not in head and n not in sizes]
+    return ([(n, settings_dict[n]) for n in head] + clear + [(n, settings_dict[n]) for n in sizes] + restore
+            + [(n, settings_dict[n]) for n in tail])
+
+
+class GrabLease:
+    """
+    Giữ 1 grab result của pylon cho tới khi phía dùng trả lại.
+    `array` là view zero-copy vào buffer của driver, chỉ hợp lệ trước release().
+    """
+    def __init__(self, grab):
+        self._grab = grab
+        self._ctx = grab.GetArrayZeroCopy()
+        self.array = self._ctx.__enter__()
+        self.timestamp = grab.TimeStamp
+
+    def release(self):
+        if self._grab is None:
+            return
+        self.array = None
+        try:
+            self._ctx.__exit__(None, None, None)
+        except Exception as e:
+            # pypylon báo lỗi nếu vẫn còn tham chiếu tới array
+            logger.error("Lỗi trả buffer: %s", e)
+        finally:
+            self._grab.Release()
+            self._grab = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class _DeviceRemovalHandler(pylon.ConfigurationEventHandler):
+    """Callback rút thiết bị của pylon (chạy ở luồng của pylon) -> BaslerCameraAPI._on_device_lost."""
+    def __init__(self, api):
+        super().__init__()
+        self._api = api
+
+    def OnCameraDeviceRemoved(self, camera):
+        self._api._on_device_lost("removed")
+
+
 class BaslerCameraAPI:
-    def __init__(self):
+    def __init__(self, camera=None, registry=None, telemetry=None, convert=False, tl_factory=None,
+                 change_detection=False, auto_reconnect=False, reconnect_backoff=(0.1, 5.0)):
+        """
+        camera: (tuỳ chọn) đối tượng kiểu InstantCamera đã tạo sẵn,
+        ví dụ SimCamera.SimulatedCamera để chạy thử khi không có camera thật.
+        tl_factory: (tuỳ chọn) backend thay pylon.TlFactory cho list_cameras/connect,
+        ví dụ SimCamera.SimTlFactory để chạy cả ứng dụng không cần camera.
+        change_detection: True hoặc ChangeDetector = đánh dấu frame trùng để bỏ qua encode/phân tích lại.
+        registry: (tuỳ chọn) DeviceRegistry.DeviceRegistry; connect() tạo camera từ DeviceInfo
+        đã cache thay vì enumerate lại.
+        telemetry: (tuỳ chọn) Telemetry.Telemetry nhận số liệu grab, mặc định Telemetry.TELEMETRY.
+        convert: True = frame trả về đã chuyển sang 8-bit mono/RGB theo PixelFormat (set_conversion).
+        auto_reconnect: True = khi thiết bị bị rút, tự kết nối lại theo serial (chờ lũy thừa trong khoảng
+        reconnect_backoff giây), ghi lại các setting đã áp dụng và chạy lại grab nền.
+        """
         self.camera = None
         self.is_connected = False
+        self._camera_override = camera
+        self._registry = registry
+        self._tl_factory = tl_factory
+        # Grab nền
+        self._ring = None
+        self._grab_thread = None
+        self._grab_stop = threading.Event()
+        # Trigger: None = freerun, "Software" hoặc tên line ("Line1", ...)
+        self._trigger_source = None
+        # Hàm được gọi trong luồng grab sau mỗi frame: listener(ring, seq)
+        self._frame_listeners = []
+        # Giá trị setting gắn vào metadata của frame (cập nhật khi update_setting)
+        self._frame_meta = {"ExposureTime": None, "Gain": None}
+        self._recorder = None
+        self._event_clip = None
+        # Các setting đã áp dụng thành công gần nhất (apply_settings)
+        self.last_applied_settings = {}
+        self._settings_cache = SettingsCache()
+        # Chỉ số chất lượng ảnh của lần analyze_image gần nhất
+        self._metrics = ImageMetrics()
+        self.last_metrics = None
+        # Số liệu đo theo frame, gắn nhãn serial camera lúc connect (_bind_telemetry)
+        self.telemetry = telemetry if telemetry is not None else TELEMETRY
+        self._tm = None
+        self._tick_s = 1e-9
+        # Frame rate trước khi vào chế độ vùng kiểm tra (set_inspect_region)
+        self._region_saved_fps = None
+        # Chuyển đổi PixelFormat -> 8-bit (demosaic/giải nén) chạy 1 lần trong luồng grab
+        self._converter = PixelConverter() if convert else None
+        # Phát hiện frame trùng trong luồng grab (set_change_detection)
+        self._change_detector = ChangeDetector() if change_detection is True else (change_detection or None)
+        self._metrics_seq = -1
+        # Giám sát kết nối (auto_reconnect): mọi setting đã ghi thành công kể từ connect, ghi lại khi kết nối lại
+        self.auto_reconnect = auto_reconnect
+        self.reconnect_backoff = tuple(reconnect_backoff)
+        # Không có frame quá chừng ấy giây thì hỏi camera còn không (GigE chỉ báo rút sau heartbeat timeout)
+        self.stall_check_s = 1.0
+        self._serial = None
+        self._desired_settings = {}
+        self._conn_state = "disconnected"
+        self._state_lock = threading.Lock()
+        self._reconnect_thread = None
+        self._reconnect_stop = threading.Event()
+        self._reconnect_wake = threading.Event()
+        self._lost_at = None
+        self._resume = None  # trạng thái stream cần khôi phục sau khi kết nối lại
+        self._grab_timeout = 100
+        # Tham số của lần start_background_grab gần nhất, dùng lại khi phải chạy lại grab nền (set_trigger_mode)
+        self._grab_args = {"buffer_size": 8, "timeout": 100}
+        self._removal_handler = None
+        self._conn_stats = {"lost": 0, "reconnects": 0, "attempts": 0, "last_reason": None, "last_recovery_ms": None}
 
     @staticmethod
-    def list_cameras():
+    def list_cameras(tl_factory=None):
         """
         Liệt kê các camera hiện có, trả về list[CameraInfo]
         """
-        tl_factory = pylon.TlFactory.GetInstance()
+        if tl_factory is None:
+            tl_factory = pylon.TlFactory.GetInstance()
         devices = tl_factory.EnumerateDevices()
         camera_list = []
         for dev in devices:
@@ -39,124 +268,1013 @@ class BaslerCameraAPI:
         """
         if self.is_connected:
             return True
+        # Đang tự kết nối lại: thiết bị vắng mặt là bình thường, không báo ở mỗi lần thử
+        log_missing = logger.debug if self._conn_state == "reconnecting" else logger.warning
         try:
-            tl_factory = pylon.TlFactory.GetInstance()
+            tl_factory = self._tl_factory
             device = None
-            if serial:
+            if self._camera_override is not None:
+                self.camera = self._camera_override
+            elif self._registry is not None:
+                self.camera = self._registry.create_camera(serial)
+                if self.camera is None:
+                    log_missing("Không tìm thấy camera serial: %s", serial)
+                    return False
+            elif serial:
+                tl_factory = tl_factory or pylon.TlFactory.GetInstance()
                 for dev in tl_factory.EnumerateDevices():
                     if dev.GetSerialNumber() == str(serial):
                         device = dev
                         break
                 if device is None:
-                    print(f"[BaslerCameraAPI] Không tìm thấy camera serial: {serial}")
+                    log_missing("Không tìm thấy camera serial: %s", serial)
                     return False
-                self.camera = pylon.InstantCamera(tl_factory.CreateDevice(device))
+                self.camera = create_instant_camera(tl_factory, device)
             else:
-                self.camera = pylon.InstantCamera(tl_factory.CreateFirstDevice())
+                self.camera = create_instant_camera(tl_factory or pylon.TlFactory.GetInstance())
             self.camera.Open()
             self.is_connected = True
-            print(f"[BaslerCameraAPI] Đã kết nối: {self.camera.GetDeviceInfo().GetModelName()} ({self.camera.GetDeviceInfo().GetSerialNumber()})")
+            self._settings_cache.bind(self.camera)
+            serial = self.camera.GetDeviceInfo().GetSerialNumber()
+            if serial != self._serial:
+                self._desired_settings = {}
+            self._serial = serial
+            if self._conn_state != "reconnecting":
+                self._conn_state = "connected"  # kết nối lại: _reopen chuyển trạng thái sau khi khôi phục xong
+            self._bind_telemetry(serial)
+            self._pixel_format_changed()
+            if self._registry is not None:
+                self._registry.watch(self.camera, serial)
+            try:
+                self._removal_handler = _DeviceRemovalHandler(self)
+                self.camera.RegisterConfiguration(self._removal_handler, pylon.RegistrationMode_Append,
+                                                  pylon.Cleanup_None)
+            except Exception:
+                pass  # không có callback: phát hiện rút qua lỗi grab / IsCameraDeviceRemoved
+            logger.info("Đã kết nối: %s (%s)", self.camera.GetDeviceInfo().GetModelName(), self.camera.GetDeviceInfo().GetSerialNumber())
             return True
         except Exception as e:
-            print(f"[BaslerCameraAPI] Lỗi khi kết nối: {e}")
+            if self._conn_state == "reconnecting":
+                logger.debug("Lỗi khi kết nối: %s", e)
+            else:
+                logger.error("Lỗi khi kết nối: %s", e)
             self.camera = None
             self.is_connected = False
             return False
 
+    def _bind_telemetry(self, serial):
+        """Lấy các chuỗi số liệu của camera `serial` (cùng serial thì đếm tiếp sau khi kết nối lại)."""
+        t = self.telemetry
+        self._tm = {
+            "retrieve": t.timing("grab_retrieve_wait", "Thời gian chờ trong RetrieveResult", camera=serial),
+            "copy": t.timing("grab_copy", "Chép (và chuyển đổi PixelFormat) buffer của driver vào ring buffer",
+                             camera=serial),
+            "transport": t.timing("grab_transport_delay",
+                                  "Host nhận trừ timestamp camera, phần vượt mức nhỏ nhất đã thấy", camera=serial),
+            "listeners": t.timing("grab_listeners", "Thời gian chạy các frame listener trong luồng grab",
+                                  camera=serial),
+            "frames": t.rate("grab_frames", "Frame grab thành công", camera=serial),
+            "dropped": t.counter("grab_dropped", "Frame lỗi hoặc bị mất (BlockID nhảy cóc)", camera=serial),
+            "timeouts": t.counter("grab_timeouts", "RetrieveResult hết hạn không có frame (underrun)", camera=serial),
+            "errors": t.counter("grab_errors", "Lỗi khi grab/get_image", camera=serial),
+            "unchanged": t.counter("grab_unchanged", "Frame ChangeDetector coi là trùng frame trước",
+                                   fn=lambda: self._ring.frames_unchanged if self._ring is not None else 0,
+                                   camera=serial),
+            "analysis_unchanged": t.counter("analysis_unchanged", "analyze_image dùng lại kết quả vì cảnh không đổi",
+                                            camera=serial),
+            "lost": t.counter("device_lost", "Thiết bị bị rút / mất kết nối", camera=serial),
+            "reconnects": t.counter("device_reconnects", "Kết nối lại thành công sau khi mất thiết bị", camera=serial),
+            "recovery": t.timing("device_recovery", "Từ lúc mất thiết bị tới khi kết nối lại xong", camera=serial),
+        }
+        try:
+            # GigE: tần số tick cấu hình được; USB3/ace 2: timestamp tính bằng ns
+            self._tick_s = 1.0 / float(self.camera.GevTimestampTickFrequency.Value)
+        except Exception:
+            self._tick_s = 1e-9
+
     def disconnect(self):
         """
-        Ngắt kết nối camera.
+        Ngắt kết nối camera (dừng cả việc tự kết nối lại nếu đang chạy).
         """
+        self._stop_reconnect()
         try:
+            self.stop_recording()
+            self.disable_event_clip()
+            self.stop_background_grab()
             if self.camera:
-                if self.camera.IsGrabbing():
-                    self.camera.StopGrabbing()
-                self.camera.Close()
-                print("[BaslerCameraAPI] Đã ngắt kết nối camera.")
+                self._release_camera()
+                logger.info("Đã ngắt kết nối camera.")
+        except Exception as e:
+            logger.error("Lỗi khi disconnect: %s", e)
+        finally:
+            self._settings_cache.unbind()
             self.camera = None
             self.is_connected = False
-        except Exception as e:
-            print(f"[BaslerCameraAPI] Lỗi khi disconnect: {e}")
+            self._conn_state = "disconnected"
+            self._trigger_source = None
+            self._desired_settings = {}
+            self._resume = None
+
+    def _release_camera(self, destroy=False):
+        """Dừng grab và đóng camera, bỏ qua lỗi từng bước (thiết bị đã rút thì các lệnh đều báo lỗi)."""
+        camera = self.camera
+        if camera is None:
+            return
+        steps = [lambda: camera.IsGrabbing() and camera.StopGrabbing(), camera.Close]
+        if destroy and hasattr(camera, "DestroyDevice"):
+            steps.append(camera.DestroyDevice)  # pylon: phải huỷ device đã rút mới tạo lại được
+        for step in steps:
+            try:
+                step()
+            except Exception as e:
+                logger.debug("Bỏ qua lỗi khi đóng camera: %s", e)
+
+    def _camera_ready(self):
+        return self.is_connected and self.camera is not None and self.camera.IsOpen()
 
     def start_stream(self):
         """
         Bắt đầu stream (grabbing liên tục).
         """
-        if self.camera is None or not self.camera.IsOpen():
-            raise RuntimeError(f"{self.camera} and {self.camera.IsOpen()} Camera chưa kết nối!")
+        if not self._camera_ready():
+            raise RuntimeError("Camera chưa kết nối!")
         if not self.camera.IsGrabbing():
-            # Đảm bảo TriggerMode = 'Off' (Freerun)
-            if hasattr(self.camera, 'TriggerMode'):
+            # Đảm bảo TriggerMode = 'Off' (Freerun), trừ khi đã bật chế độ trigger
+            if self._trigger_source is None and hasattr(self.camera, 'TriggerMode'):
                 try:
                     self.camera.TriggerMode.Value = 'Off'
+                    self._settings_cache.invalidate(["TriggerMode"])
                 except Exception:
                     pass  # Không phải camera nào cũng có TriggerMode
             self.camera.StartGrabbing(pylon.GrabStrategy_OneByOne)
-            print("[BaslerCameraAPI] Bắt đầu grabbing.")
+            logger.info("Bắt đầu grabbing.")
 
     def stop_stream(self):
         """
         Dừng stream (grabbing).
         """
+        self.stop_background_grab()
         if self.camera and self.camera.IsGrabbing():
             self.camera.StopGrabbing()
-            print("[BaslerCameraAPI] Đã dừng grabbing.")
+            logger.info("Đã dừng grabbing.")
 
-    def get_image(self, timeout=500):
+    def get_image(self, timeout=500, out=None):
         """
         Lấy 1 frame hiện tại (numpy array).
         Nếu đang grabbing thì lấy luôn frame tiếp theo.
         Nếu không grabbing, sẽ thực hiện grab one.
+        out: buffer cấp phát sẵn (cùng shape/dtype với frame) để nhận dữ liệu,
+        tránh cấp phát mảng mới cho mỗi frame.
         """
-        if self.camera is None or not self.camera.IsOpen():
-            print("[BaslerCameraAPI] Camera chưa kết nối!")
+        if not self._camera_ready():
+            logger.warning("Camera chưa kết nối!")
             return None
+        if self._trigger_source is not None:
+            # Chế độ trigger: grab engine đã sẵn sàng, chỉ cần 1 lần trigger
+            frames = self.capture_burst(1, timeout=timeout)
+            if not frames:
+                return None
+            if out is not None and out.shape == frames[0].array.shape:
+                np.copyto(out, frames[0].array)
+                return out
+            return frames[0].array
+        if self.is_background_grabbing:
+            # Đã có luồng grab nền: lấy frame mới từ ring thay vì tranh RetrieveResult
+            frame = self._ring.get_next(self._ring.latest_seq, timeout=timeout / 1000.0, out=out)
+            return None if frame is None else frame.array
         try:
             if not self.camera.IsGrabbing():
                 self.camera.StartGrabbingMax(1)
+            t0 = time.perf_counter()
             grab = self.camera.RetrieveResult(timeout, pylon.TimeoutHandling_ThrowException)
+            if self._tm is not None:
+                self._tm["retrieve"].observe((time.perf_counter() - t0) * 1e3)
             img = None
-            if grab.GrabSucceeded():
-                img = grab.Array  # numpy array (shape HxW hoặc HxWx3)
-            grab.Release()
+            try:
+                if grab.GrabSucceeded():
+                    if self._converter is not None:
+                        with grab.GetArrayZeroCopy() as arr:
+                            img = self._converter.convert(arr, out)
+                    elif out is not None:
+                        with grab.GetArrayZeroCopy() as arr:
+                            if arr.shape == out.shape and arr.dtype == out.dtype:
+                                np.copyto(out, arr)
+                                img = out
+                            else:
+                                img = arr.copy()
+                    else:
+                        img = grab.Array  # numpy array (shape HxW hoặc HxWx3)
+            finally:
+                grab.Release()
             return img
         except Exception as e:
-            print(f"[BaslerCameraAPI] Lỗi get_image: {e}")
+            if self._tm is not None:
+                self._tm["errors"].inc()
+            if self._device_removed():
+                self._on_device_lost("removed")
+            else:
+                logger.error("Lỗi get_image: %s", e)
+            return None
+
+    def grab_frame(self, timeout=500):
+        """
+        Grab 1 frame không copy: trả về GrabLease giữ nguyên buffer của driver,
+        `lease.array` là view trực tiếp vào buffer đó. Phải trả buffer lại bằng
+        `lease.release()` hoặc dùng `with api.grab_frame() as lease:`.
+        Số lease giữ cùng lúc không được vượt quá số buffer của camera (MaxNumBuffer).
+        Trả về None nếu lỗi/timeout.
+        """
+        if not self._camera_ready():
+            logger.warning("Camera chưa kết nối!")
+            return None
+        if self.is_background_grabbing:
+            logger.warning("Đang grab nền, dùng get_latest(copy=False) thay cho grab_frame.")
+            return None
+        try:
+            if not self.camera.IsGrabbing():
+                self.camera.StartGrabbingMax(1)
+            grab = self.camera.RetrieveResult(timeout, pylon.TimeoutHandling_ThrowException)
+            if not grab.GrabSucceeded():
+                grab.Release()
+                return None
+            return GrabLease(grab)
+        except Exception as e:
+            logger.error("Lỗi grab_frame: %s", e)
+            return None
+
+    # ------------------ Giám sát kết nối (rút/cắm lại thiết bị) ------------------
+    @property
+    def connection_state(self):
+        """
+        "connected", "reconnecting" (thiết bị bị rút, đang tự kết nối lại), "lost" (bị rút,
+        auto_reconnect tắt) hoặc "disconnected".
+        """
+        return self._conn_state
+
+    def connection_stats(self):
+        """Số lần mất thiết bị / kết nối lại, số lần thử của lần mất gần nhất và thời gian phục hồi."""
+        stats = dict(self._conn_stats)
+        stats["state"] = self._conn_state
+        stats["serial"] = self._serial
+        if self._conn_state == "reconnecting" and self._lost_at is not None:
+            stats["down_s"] = round(time.perf_counter() - self._lost_at, 3)
+        return stats
+
+    def _device_removed(self, camera=None):
+        """True nếu pylon báo thiết bị đã bị rút (phân biệt với timeout/lỗi frame thông thường)."""
+        camera = camera if camera is not None else self.camera
+        try:
+            return bool(camera.IsCameraDeviceRemoved())
+        except Exception:
+            return False
+
+    def _on_device_lost(self, reason):
+        """
+        Thiết bị bị rút (callback của pylon, lỗi grab hoặc IsCameraDeviceRemoved). Có thể chạy trong
+        luồng grab hay luồng của pylon nên chỉ đổi trạng thái và giao việc cho luồng kết nối lại.
+        """
+        with self._state_lock:
+            if self._conn_state != "connected":
+                return  # đã xử lý (callback và lỗi grab cùng báo)
+            self._conn_state = "reconnecting" if self.auto_reconnect else "lost"
+            self.is_connected = False
+            self._lost_at = time.perf_counter()
+            self._conn_stats["lost"] += 1
+            self._conn_stats["attempts"] = 0
+            self._conn_stats["last_reason"] = reason
+            self._resume = {
+                "grab": self._grab_thread is not None,
+                "buffer_size": self._ring.capacity if self._ring is not None else 8,
+                "timeout": self._grab_timeout,
+                "trigger": self._trigger_source,
+            }
+        self._grab_stop.set()
+        if self._tm is not None:
+            self._tm["lost"].inc()
+        logger.warning("Mất camera %s (%s)%s", self._serial, reason, ", đang kết nối lại" if self.auto_reconnect else "")
+        if self.auto_reconnect:
+            self._reconnect_stop.clear()
+            self._reconnect_wake.clear()
+            self._reconnect_thread = threading.Thread(target=self._reconnect_loop, name="BaslerReconnect", daemon=True)
+            self._reconnect_thread.start()
+
+    def _on_registry_event(self, event, serial, info):
+        # DeviceRegistry thấy thiết bị cắm lại: thử ngay, không chờ hết lượt backoff
+        if event == "added" and serial == self._serial:
+            self._reconnect_wake.set()
+
+    def _reconnect_loop(self):
+        """Luồng kết nối lại: dọn camera cũ rồi thử lại theo serial, thời gian chờ tăng gấp đôi mỗi lần."""
+        self.stop_background_grab()
+        self._release_camera(destroy=self._camera_override is None)
+        self._settings_cache.unbind()
+        self.camera = None
+        delay, max_delay = self.reconnect_backoff
+        if self._registry is not None:
+            self._registry.add_listener(self._on_registry_event)
+        try:
+            while True:
+                self._reconnect_wake.wait(delay)
+                self._reconnect_wake.clear()
+                if self._reconnect_stop.is_set():
+                    return
+                self._conn_stats["attempts"] += 1
+                if self._reopen():
+                    return
+                delay = min(delay * 2, max_delay)
+        finally:
+            if self._registry is not None:
+                self._registry.remove_listener(self._on_registry_event)
+
+    def _reopen(self):
+        """1 lần thử: connect theo serial, ghi lại các setting đã áp dụng, khôi phục trigger và grab nền."""
+        if not self.connect(serial=self._serial):
+            return False
+        resume = self._resume or {}
+        try:
+            if self._desired_settings and not self.apply_settings(dict(self._desired_settings)):
+                logger.warning("Không ghi lại được setting sau khi kết nối lại camera %s", self._serial)
+            if resume.get("trigger") is not None:
+                self.set_trigger_mode(resume["trigger"])
+            if resume.get("grab"):
+                self.start_background_grab(resume["buffer_size"], resume["timeout"])
+        except Exception as e:
+            logger.error("Lỗi khôi phục camera %s sau khi kết nối lại: %s", self._serial, e)
+        self._resume = None
+        elapsed = (time.perf_counter() - self._lost_at) * 1e3
+        with self._state_lock:
+            self._conn_state = "connected"
+        self._conn_stats["reconnects"] += 1
+        self._conn_stats["last_recovery_ms"] = round(elapsed, 1)
+        self._tm["reconnects"].inc()
+        self._tm["recovery"].observe(elapsed)
+        logger.info("Đã kết nối lại camera %s sau %.0f ms (%d lần thử)", self._serial, elapsed,
+                    self._conn_stats["attempts"])
+        if self._device_removed():
+            self._on_device_lost("removed")  # bị rút lại ngay trong lúc khôi phục
+        return True
+
+    def _stop_reconnect(self):
+        thread = self._reconnect_thread
+        if thread is None:
+            return
+        self._reconnect_stop.set()
+        self._reconnect_wake.set()
+        if thread is not threading.current_thread():
+            thread.join(timeout=5.0)
+        self._reconnect_thread = None
+
+    # ------------------ Trigger + burst ------------------
+    @property
+    def trigger_source(self):
+        return self._trigger_source
+
+    def set_trigger_mode(self, source=None, activation="RisingEdge"):
+        """
+        Chọn chế độ chụp:
+          source=None      : freerun (TriggerMode = Off)
+          source="Software": trigger bằng ExecuteSoftwareTrigger
+          source="Line1"...: trigger phần cứng qua line I/O
+        Grab engine được giữ ở trạng thái sẵn sàng (armed), mỗi lần chụp chỉ tốn
+        1 vòng trigger thay vì start/stop grabbing.
+        """
+        if not self._camera_ready():
+            logger.warning("Camera chưa kết nối!")
+            return False
+        was_background = self.is_background_grabbing
+        try:
+            if self.camera.IsGrabbing():
+                self.stop_stream()
+            if hasattr(self.camera, "TriggerSelector"):
+                self.camera.TriggerSelector.Value = "FrameStart"
+            if source is None:
+                self.camera.TriggerMode.Value = "Off"
+            else:
+                self.camera.TriggerMode.Value = "On"
+                self.camera.TriggerSource.Value = source
+                if source != "Software" and hasattr(self.camera, "TriggerActivation"):
+                    self.camera.TriggerActivation.Value = activation
+            self._trigger_source = source
+            self._settings_cache.invalidate(["TriggerSelector", "TriggerMode", "TriggerSource", "TriggerActivation"])
+            if was_background:
+                # Giữ buffer_size/timeout phía gọi đã chọn, không quay về mặc định
+                self.start_background_grab(**self._grab_args)
+            elif source is not None:
+                # Arm grab engine ngay để lần chụp đầu không phải chờ start
+                self.start_stream()
+            logger.info("Trigger mode: %s", source or 'Off')
+            return True
+        except Exception as e:
+            logger.error("Lỗi set_trigger_mode %s: %s", source, e)
+            return False
+
+    def execute_software_trigger(self, timeout=1000):
+        """
+        Chờ camera sẵn sàng nhận trigger rồi phát 1 software trigger.
+        """
+        if self.camera.WaitForFrameTriggerReady(timeout, pylon.TimeoutHandling_ThrowException):
+            self.camera.ExecuteSoftwareTrigger()
+
+    def capture_burst(self, n, timeout=1000):
+        """
+        Lấy n frame liên tiếp trong 1 lần gọi, trả về list[Frame] (mỗi frame có
+        TimeStamp của camera và thời điểm host nhận). Software trigger được phát
+        cho từng frame; trigger line thì chờ n xung; freerun lấy n frame kế tiếp.
+        Dữ liệu n frame nằm chung 1 mảng (n, H, W[, C]) cấp phát 1 lần cho cả burst.
+        """
+        if not self._camera_ready():
+            logger.warning("Camera chưa kết nối!")
+            return []
+        software = self._trigger_source == "Software"
+        frames = []
+        try:
+            if self.is_background_grabbing:
+                seq = self._ring.latest_seq
+                for _ in range(n):
+                    if software:
+                        self.execute_software_trigger(timeout)
+                    frame = self._ring.get_next(seq, timeout=timeout / 1000.0)
+                    if frame is None:
+                        break
+                    seq = frame.seq
+                    frames.append(frame)
+                return frames
+            if not self.camera.IsGrabbing():
+                if self._trigger_source is None:
+                    self.camera.StartGrabbingMax(n)
+                else:
+                    self.camera.StartGrabbing(pylon.GrabStrategy_OneByOne)
+            stack = None
+            for i in range(n):
+                if software:
+                    self.execute_software_trigger(timeout)
+                grab = self.camera.RetrieveResult(timeout, pylon.TimeoutHandling_ThrowException)
+                try:
+                    if grab.GrabSucceeded():
+                        with grab.GetArrayZeroCopy() as arr:
+                            conv = self._converter
+                            if stack is None:
+                                shape, dtype = conv.output_spec(arr) if conv is not None else (arr.shape, arr.dtype)
+                                stack = np.empty((n,) + tuple(shape), dtype=dtype)
+                            k = len(frames)
+                            if conv is not None:
+                                conv.convert(arr, stack[k])
+                            else:
+                                np.copyto(stack[k], arr)
+                        frames.append(Frame(i, grab.TimeStamp, time.perf_counter(), stack[k]))
+                finally:
+                    grab.Release()
+        except Exception as e:
+            logger.error("Lỗi capture_burst: %s", e)
+        return frames
+
+    def capture(self, timeout=1000):
+        """
+        Chụp 1 ảnh (numpy array) hoặc None. Ở chế độ trigger chỉ tốn 1 vòng trigger.
+        """
+        frames = self.capture_burst(1, timeout=timeout)
+        return frames[0].array if frames else None
+
+    # ------------------ Grab nền + ring buffer ------------------
+    @property
+    def is_background_grabbing(self):
+        return self._grab_thread is not None and self._grab_thread.is_alive()
+
+    def start_background_grab(self, buffer_size=8, timeout=100):
+        """
+        Bắt đầu grab nền: 1 luồng riêng lấy frame liên tục từ camera và chép vào
+        ring buffer cấp phát sẵn `buffer_size` slot. Phía hiển thị/phân tích dùng
+        get_latest() / get_next() mà không bao giờ phải chờ camera.
+        """
+        if self.is_background_grabbing:
+            return
+        self.start_stream()
+        self._grab_args = {"buffer_size": buffer_size, "timeout": timeout}
+        self._grab_timeout = timeout
+        if self._ring is None or self._ring.capacity != buffer_size:
+            self._ring = FrameRingBuffer(buffer_size)
+        self._ring.change_detector = self._change_detector
+        self._grab_stop.clear()
+        self._grab_thread = threading.Thread(
+            target=self._grab_loop, args=(timeout,), name="BaslerGrabThread", daemon=True
+        )
+        self._grab_thread.start()
+        logger.info("Bắt đầu grab nền.")
+
+    def stop_background_grab(self):
+        """
+        Dừng luồng grab nền (ring buffer vẫn giữ các frame cuối).
+        """
+        thread = self._grab_thread
+        if thread is None:
+            return
+        self._grab_stop.set()
+        if thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+        self._grab_thread = None
+        logger.info("Đã dừng grab nền.")
+
+    def _grab_loop(self, timeout):
+        camera = self.camera
+        ring = self._ring
+        if self._tm is None:
+            self._bind_telemetry("unknown")
+        tm = self._tm
+        retrieve, copy, transport, listeners = tm["retrieve"], tm["copy"], tm["transport"], tm["listeners"]
+        frames, dropped, timeouts, errors = tm["frames"], tm["dropped"], tm["timeouts"], tm["errors"]
+        tick = self._tick_s
+        # Đồng hồ camera và host không đồng bộ: chỉ đo được phần trễ vượt mức nhỏ nhất đã thấy
+        min_offset = None
+        last_block = None
+        # Lỗi liên tiếp: chờ lũy thừa thay vì lặp lại ngay; timeout (chưa có frame) thì không
+        backoff = timeout / 1000.0
+        last_frame_t = time.perf_counter()
+        while not self._grab_stop.is_set():
+            try:
+                if not camera.IsGrabbing():
+                    # Có thể đang tạm dừng để đổi ROI (update_setting), chờ grabbing lại
+                    time.sleep(0.005)
+                    continue
+                t0 = time.perf_counter()
+                grab = camera.RetrieveResult(timeout, pylon.TimeoutHandling_Return)
+                t1 = time.perf_counter()
+            except Exception as e:
+                if self._grab_stop.is_set():
+                    break
+                errors.inc()
+                if self._device_removed(camera):
+                    self._on_device_lost("removed")
+                    break
+                logger.error("Lỗi grab nền: %s (thử lại sau %.2f s)", e, backoff)
+                self._grab_stop.wait(backoff)
+                backoff = min(backoff * 2, self.reconnect_backoff[1])
+                continue
+            backoff = timeout / 1000.0
+            if grab is None or not grab.IsValid():
+                timeouts.inc()
+                # Timeout thường chỉ là chưa có frame (trigger, exposure dài); quá lâu không có frame
+                # thì hỏi xem thiết bị còn không (GigE báo rút chậm, sau heartbeat timeout)
+                if t1 - last_frame_t > self.stall_check_s:
+                    last_frame_t = t1
+                    if self._device_removed(camera):
+                        self._on_device_lost("removed")
+                        break
+                continue  # timeout, thử lại
+            last_frame_t = t1
+            retrieve.observe((t1 - t0) * 1e3)
+            seq = None
+            try:
+                if grab.GrabSucceeded():
+                    # Frame bị mất phía camera/driver (BlockID nhảy cóc)
+                    block = getattr(grab, "BlockID", 0)
+                    if last_block is not None and block > last_block + 1:
+                        ring.frames_dropped += block - last_block - 1
+                        dropped.inc(block - last_block - 1)
+                    last_block = block
+                    offset = t1 - grab.TimeStamp * tick
+                    if min_offset is None or offset < min_offset:
+                        min_offset = offset
+                    transport.observe((offset - min_offset) * 1e3)
+                    # Chép (hoặc chuyển đổi) thẳng từ buffer của driver vào slot của ring, không cấp phát
+                    with grab.GetArrayZeroCopy() as arr:
+                        seq = ring.write(arr, grab.TimeStamp, self._converter)
+                    t2 = time.perf_counter()
+                    copy.observe((t2 - t1) * 1e3)
+                    frames.tick(t2)
+                else:
+                    ring.frames_dropped += 1
+                    dropped.inc()
+                    # Frame lỗi vẫn có BlockID: không đếm lại nó như frame mất ở frame kế tiếp
+                    last_block = getattr(grab, "BlockID", last_block)
+            except Exception as e:
+                errors.inc()
+                logger.error("Lỗi xử lý frame: %s", e)
+            finally:
+                grab.Release()
+            if seq is not None and self._frame_listeners:
+                t2 = time.perf_counter()
+                for listener in self._frame_listeners:
+                    try:
+                        listener(ring, seq)
+                    except Exception as e:
+                        logger.error("Lỗi frame listener: %s", e)
+                listeners.observe((time.perf_counter() - t2) * 1e3)
+
+    def add_frame_listener(self, listener):
+        """
+        Đăng ký listener(ring, seq) được gọi trong luồng grab nền sau mỗi frame mới.
+        Listener phải chạy nhanh (chỉ giao việc cho luồng khác), không được chặn luồng grab.
+        """
+        if listener not in self._frame_listeners:
+            self._frame_listeners = self._frame_listeners + [listener]
+
+    def remove_frame_listener(self, listener):
+        self._frame_listeners = [l for l in self._frame_listeners if l != listener]
+
+    # ------------------ Ghi hình ------------------
+    @property
+    def is_recording(self):
+        return self._recorder is not None
+
+    def _refresh_frame_meta(self):
+        for name in self._frame_meta:
+            self._frame_meta[name] = self._frame_meta_value(name)
+
+    def start_recording(self, path, max_frames=None, duration=None, workers=2):
+        """
+        Ghi stream ra file raw memory-mapped (Recorder.RawRecorder) ở tốc độ sensor.
+        Dung lượng file được cấp phát trước cho `max_frames` frame (hoặc `duration` giây
+        theo AcquisitionFrameRate). Yêu cầu đang grab nền; luồng grab chỉ giao việc,
+        việc chép xuống file do pool `workers` luồng ghi đảm nhận.
+        """
+        if self._recorder is not None:
+            logger.warning("Đang ghi hình rồi!")
             return None
+        if not self.is_background_grabbing:
+            self.start_background_grab()
+        frame = self._ring.get_latest(copy=False) or self._ring.get_next(-1, timeout=1.0, copy=False)
+        if frame is None:
+            logger.warning("Không lấy được frame để bắt đầu ghi hình!")
+            return None
+        if max_frames is None:
+            fps = self._frame_meta_value("AcquisitionFrameRate") or 30.0
+            max_frames = int((duration or 10.0) * fps)
+        self._refresh_frame_meta()
+        recorder = RawRecorder(path, frame.array.shape, frame.array.dtype, capacity=max_frames,
+                               pixel_format=self.frame_format or "", workers=workers)
+        meta = self._frame_meta
+
+        def on_frame(ring, seq):
+            if not recorder.is_full:
+                recorder.submit_from_ring(ring, seq, meta["ExposureTime"], meta["Gain"])
 
-    def get_settings(self):
+        recorder.listener = on_frame
+        self._recorder = recorder
+        self.add_frame_listener(on_frame)
+        logger.info("Bắt đầu ghi hình: %s (%s frame)", path, max_frames)
+        return recorder
+
+    def _frame_meta_value(self, name):
+        try:
+            return float(getattr(self.camera, name).Value)
+        except Exception:
+            return None
+
+    def stop_recording(self):
         """
-        Lấy các thông số hiện tại (trả về dict).
+        Dừng ghi hình, chờ luồng ghi xong và đóng file. Trả về thống kê (dict).
         """
-        if self.camera is None or not self.camera.IsOpen():
-            print("[BaslerCameraAPI] Camera chưa kết nối!")
+        recorder = self._recorder
+        if recorder is None:
             return {}
-        s = {}
-        def getval(node, attr='Value', default=None):
+        self.remove_frame_listener(recorder.listener)
+        self._recorder = None
+        recorder.close()
+        logger.info("Đã dừng ghi hình: %s", recorder.path)
+        return recorder.stats()
+
+    def recording_stats(self):
+        return {} if self._recorder is None else self._recorder.stats()
+
+    # ------------------ Event clip (pre/post trigger) ------------------
+    @property
+    def event_clip(self):
+        return self._event_clip
+
+    def enable_event_clip(self, pre_seconds=2.0, post_seconds=1.0, byte_budget_mb=256, out_dir="clips"):
+        """
+        Luôn giữ `pre_seconds` frame gần nhất trong bộ đệm giới hạn `byte_budget_mb` MB,
+        để trigger_event_clip() ghi được cả những frame trước sự kiện.
+        Tốn 1 lần chép full frame mỗi frame trong luồng grab, nên chỉ bật khi thực sự cần clip.
+        """
+        if self._event_clip is not None:
+            return self._event_clip
+        self._refresh_frame_meta()
+        self._event_clip = EventClipBuffer(pre_seconds, post_seconds, int(byte_budget_mb * 2**20), out_dir,
+                                           pixel_format=self.frame_format or "",
+                                           frame_meta=self._frame_meta)
+        self.add_frame_listener(self._event_clip.on_frame)
+        return self._event_clip
+
+    def disable_event_clip(self):
+        clip = self._event_clip
+        if clip is None:
+            return
+        self.remove_frame_listener(clip.on_frame)
+        clip.flush()
+        self._event_clip = None
+
+    def trigger_event_clip(self, path=None, callback=None):
+        """
+        Đóng băng cửa sổ [bây giờ - pre, bây giờ + post] và ghi ra file .bcraw ở luồng nền.
+        Trả về đường dẫn file hoặc None nếu chưa enable_event_clip().
+        """
+        if self._event_clip is None:
+            logger.warning("Chưa bật event clip!")
+            return None
+        return self._event_clip.trigger(path, callback)
+
+    def get_latest(self, copy=True, out=None):
+        """
+        Lấy frame mới nhất từ ring buffer (FrameBuffer.Frame) hoặc None, không chờ camera.
+        """
+        if self._ring is None:
+            return None
+        return self._ring.get_latest(copy=copy, out=out)
+
+    def get_next(self, after_seq=-1, timeout=0.0, copy=True, out=None, newest=False):
+        """
+        Lấy frame kế tiếp có seq > after_seq từ ring buffer, chờ tối đa `timeout` giây.
+        newest=True lấy frame mới nhất thay vì frame kế tiếp (bỏ qua frame cũ khi hiển thị chậm).
+        """
+        if self._ring is None:
+            return None
+        return self._ring.get_next(after_seq, timeout=timeout, copy=copy, out=out, newest=newest)
+
+    def get_nearest(self, value, key="host_time", copy=True):
+        """
+        Lấy frame trong ring buffer có host_time/timestamp gần `value` nhất (dùng cho CameraArray).
+        """
+        if self._ring is None:
+            return None
+        return self._ring.get_nearest(value, key=key, copy=copy)
+
+    @property
+    def latest_seq(self):
+        """seq của frame mới nhất trong ring buffer của grab nền, -1 nếu chưa có."""
+        return self._ring.latest_seq if self._ring is not None else -1
+
+    def get_grab_stats(self):
+        """
+        Thống kê grab nền: số frame đã ghi, bị ghi đè khi chưa đọc, bị mất.
+        """
+        if self._ring is None:
+            return {}
+        stats = self._ring.stats()
+        stats["running"] = self.is_background_grabbing
+        return stats
+
+    def get_pixel_format(self):
+        """
+        Tên PixelFormat hiện tại (vd. 'Mono8', 'BayerRG8', 'Mono12') hoặc None.
+        """
+        try:
+            return str(self.camera.PixelFormat.Value)
+        except Exception:
+            return None
+
+    # ------------------ Vùng kiểm tra (ROI + binning) ------------------
+    def binning_nodes(self):
+        """Cặp node gộp pixel camera có: Binning, không có thì Decimation; None nếu không hỗ trợ."""
+        for pair in (("BinningHorizontal", "BinningVertical"), ("DecimationHorizontal", "DecimationVertical")):
             try:
-                return getattr(getattr(self.camera, node), attr)
+                if all(getattr(self.camera, name).Max > 1 for name in pair):
+                    return pair
             except Exception:
-                return default
-        basic_settings = [
-            "ExposureTime", "Gain", "Width", "Height",
-            "OffsetX", "OffsetY", "ReverseX", "ReverseY",
-            "TriggerMode", "BalanceWhiteAuto", "AcquisitionFrameRate"
-        ]
-        for name in basic_settings:
-            s[name] = getval(name)
-        # Lấy thêm min/max cho các thông số số học
-        for name in ["ExposureTime", "Gain", "Width", "Height", "OffsetX", "OffsetY", "AcquisitionFrameRate"]:
-            s[f"{name}_Min"] = getval(name, "Min")
-            s[f"{name}_Max"] = getval(name, "Max")
+                continue
+        return None
+
+    def region_geometry(self):
+        """(OffsetX, OffsetY, binning ngang, binning dọc) hiện tại, đọc qua SettingsCache."""
+        cache = self._settings_cache
+        pair = self.binning_nodes()
+        bx, by = (int(cache.get(name) or 1) for name in pair) if pair else (1, 1)
+        return int(cache.get("OffsetX") or 0), int(cache.get("OffsetY") or 0), bx, by
+
+    def sensor_size(self):
+        """Kích thước sensor đầy đủ (pixel chưa binning): SensorWidth/Height, không có thì suy từ Width.Max."""
+        try:
+            return int(self.camera.SensorWidth.Value), int(self.camera.SensorHeight.Value)
+        except Exception:
+            ox, oy, bx, by = self.region_geometry()
+            return (ox + int(self.camera.Width.Max)) * bx, (oy + int(self.camera.Height.Max)) * by
+
+    def frame_to_sensor(self, x, y):
+        """
+        Đổi toạ độ pixel trên frame hiện tại (có ROI/binning) về toạ độ sensor đầy đủ.
+        x, y: số hoặc np.ndarray; kết quả analysis trên ảnh ROI dùng hàm này để so với ảnh full sensor.
+        """
+        ox, oy, bx, by = self.region_geometry()
+        return (np.asarray(x) + ox) * bx, (np.asarray(y) + oy) * by
+
+    def current_region(self):
+        """Vùng frame hiện tại trên toạ độ sensor (x, y, w, h) và binning (bx, by)."""
+        ox, oy, bx, by = self.region_geometry()
+        cache = self._settings_cache
+        return (ox * bx, oy * by, int(cache.get("Width")) * bx, int(cache.get("Height")) * by), (bx, by)
+
+    def max_frame_rate(self):
+        """
+        Frame rate tối đa với ROI/binning/exposure hiện tại: đọc ResultingFrameRate khi tạm tắt
+        AcquisitionFrameRateEnable (cách Basler hướng dẫn), không có node đó thì AcquisitionFrameRate.Max.
+        """
+        camera = self.camera
+        try:
+            enable = getattr(camera, "AcquisitionFrameRateEnable", None)
+            if enable is not None and hasattr(camera, "ResultingFrameRate"):
+                was_enabled = bool(enable.Value)
+                if was_enabled:
+                    enable.Value = False
+                try:
+                    return float(camera.ResultingFrameRate.Value)
+                finally:
+                    if was_enabled:
+                        enable.Value = True
+            return float(camera.AcquisitionFrameRate.Max)
+        except Exception as e:
+            logger.debug("Không đọc được frame rate tối đa: %s", e)
+            return None
+
+    def set_inspect_region(self, region=None, binning=1, match_frame_rate=True):
+        """
+        Chỉ đọc 1 vùng của sensor để tăng frame rate và giảm băng thông.
+        region: (x, y, w, h) trên toạ độ sensor đầy đủ, None = toàn sensor.
+        binning: hệ số gộp pixel (BinningHorizontal/Vertical, không có thì Decimation, không có cả hai thì bỏ qua).
+        Vùng được căn theo Inc của các node ROI (mở rộng để vẫn phủ vùng chọn) và ghi trong 1 lần
+        apply_settings, nên đang stream chỉ restart acquisition 1 lần.
+        match_frame_rate: đặt AcquisitionFrameRate lên mức tối đa mới; quay về toàn sensor thì trả lại
+        frame rate cũ.
+        Trả về dict {"region", "binning", "max_fps", "previous_max_fps"} (region trên toạ độ sensor) hoặc None.
+        """
+        if not self._camera_ready():
+            logger.warning("Camera chưa kết nối!")
+            return None
+        camera = self.camera
+        sensor_w, sensor_h = self.sensor_size()
+        if region is None:
+            region = (0, 0, sensor_w, sensor_h)
+        x, y, w, h = (float(v) for v in region)
+        x, y = min(max(x, 0.0), sensor_w - 1.0), min(max(y, 0.0), sensor_h - 1.0)
+        w, h = min(max(w, 1.0), sensor_w - x), min(max(h, 1.0), sensor_h - y)
+        settings = {}
+        pair = self.binning_nodes()
+        bx = by = 1
+        if pair:
+            nodes = [getattr(camera, name) for name in pair]
+            bx, by = (int(_clamp_to_node(node, int(binning))) for node in nodes)
+            settings.update({pair[0]: bx, pair[1]: by})
+        elif binning != 1:
+            logger.warning("Camera không hỗ trợ binning/decimation, bỏ qua binning=%s", binning)
+        ox, width = _align_span(x / bx, (x + w) / bx, sensor_w // bx, camera.OffsetX.Inc, camera.Width.Inc,
+                                camera.Width.Min)
+        oy, height = _align_span(y / by, (y + h) / by, sensor_h // by, camera.OffsetY.Inc, camera.Height.Inc,
+                                 camera.Height.Min)
+        settings.update({"OffsetX": ox, "OffsetY": oy, "Width": width, "Height": height})
+        previous_max = self.max_frame_rate()
+        full_sensor = (bx, by, ox, oy, width * bx, height * by) == (1, 1, 0, 0, sensor_w, sensor_h)
+        if not self.apply_settings(settings):
+            return None
+        max_fps = self.max_frame_rate()
+        if match_frame_rate and max_fps:
+            # Frame rate người dùng đặt trước khi vào chế độ vùng kiểm tra, trả lại khi về toàn sensor
+            if full_sensor:
+                fps = self._region_saved_fps or max_fps
+                self._region_saved_fps = None
+            else:
+                if self._region_saved_fps is None:
+                    self._region_saved_fps = self._frame_meta_value("AcquisitionFrameRate")
+                fps = max_fps
+            self.update_setting("AcquisitionFrameRate", _clamp_to_node(camera.AcquisitionFrameRate, min(fps, max_fps)))
+        info = {
+            "region": (ox * bx, oy * by, width * bx, height * by),
+            "binning": (bx, by),
+            "max_fps": max_fps,
+            "previous_max_fps": previous_max,
+        }
+        logger.info("Vùng kiểm tra %s, binning %s: frame rate tối đa %s -> %s fps",
+                    info["region"], info["binning"], previous_max, max_fps)
+        return info
+
+    # ------------------ Chuyển đổi PixelFormat ------------------
+    @property
+    def converter(self):
+        return self._converter
+
+    def set_conversion(self, enabled=True):
+        """
+        Bật/tắt chuyển đổi frame sang 8-bit mono/RGB (PixelConverter) cho luồng grab nền, get_image và
+        capture: Bayer được demosaic, 10/12-bit (kể cả packed) được đưa về 8-bit đúng 1 lần, hiển thị,
+        phân tích và ghi hình dùng chung kết quả. Có hiệu lực từ frame kế tiếp; grab_frame() luôn trả về frame thô.
+        """
+        if enabled and self._converter is None:
+            self._converter = PixelConverter(self.get_pixel_format())
+        elif not enabled:
+            self._converter = None
+        self._pixel_format_changed()
+
+    def _pixel_format_changed(self):
+        """PixelFormat (hoặc chế độ chuyển đổi) vừa đổi: cập nhật converter và ChangeDetector."""
+        if self._converter is not None:
+            self._converter.pixel_format = self.get_pixel_format()
+        if self._change_detector is not None:
+            self._change_detector.pixel_format = self.frame_format
+
+    @property
+    def frame_format(self):
+        """PixelFormat của frame mà API trả về: sau chuyển đổi nếu đang bật (vd. 'RGB8' với camera Bayer)."""
+        conv = self._converter
+        if conv is not None and conv.pixel_format:
+            return conv.output_format
+        return self.get_pixel_format()
+
+    # ------------------ Bỏ qua frame trùng (cảnh tĩnh) ------------------
+    @property
+    def change_detector(self):
+        return self._change_detector
+
+    def set_change_detection(self, detector=True):
+        """
+        Bật/tắt phát hiện frame trùng trong luồng grab nền. detector: True = ChangeDetector mặc định,
+        hoặc 1 ChangeDetector.ChangeDetector đã cấu hình (threshold, method, refresh_interval), False/None = tắt.
+        Frame trùng mang change_seq cũ (Frame.unchanged_since): MjpegStreamServer, VisionUI và
+        analyze_image bỏ qua encode/phân tích lại cho frame đó.
+        """
+        if detector is True:
+            detector = ChangeDetector()
+        self._change_detector = detector or None
+        self._pixel_format_changed()
+        if self._ring is not None:
+            self._ring.change_detector = self._change_detector
+
+    def analyze_image(self, array=None):
+        """
+        Tính chỉ số chất lượng ảnh (ImageMetrics) cho `array`, hoặc frame mới nhất nếu không truyền:
+        lấy từ ring buffer khi đang grab nền, ngược lại gọi get_image(). Trả về dict hoặc None.
+        """
+        if array is None:
+            if self.is_background_grabbing:
+                # Không copy: thống kê trên lưới lấy mẫu không bị ảnh hưởng đáng kể nếu slot bị ghi đè giữa chừng
+                frame = self._ring.get_latest(copy=False)
+                if frame is not None and self.last_metrics is not None and frame.unchanged_since(self._metrics_seq):
+                    # Cảnh không đổi từ lần phân tích trước: dùng lại kết quả
+                    self._tm["analysis_unchanged"].inc()
+                    return self.last_metrics
+                array = None if frame is None else frame.array
+                self._metrics_seq = -1 if frame is None else frame.seq
+            else:
+                array = self.get_image()
+                self._metrics_seq = -1
+            if array is None:
+                return None
+        else:
+            self._metrics_seq = -1
+        self._metrics.pixel_format = self.frame_format
+        self.last_metrics = self._metrics.compute(array)
+        try:
+            # Vùng của frame trên sensor đầy đủ: đổi toạ độ kết quả về sensor bằng frame_to_sensor
+            region, binning = self.current_region()
+            self.last_metrics["region"] = {"sensor_xywh": region, "binning": binning}
+        except Exception:
+            pass
+        return self.last_metrics
+
+    def get_settings(self, names=None, refresh=False):
+        """
+        Lấy các thông số hiện tại (trả về dict), đọc qua SettingsCache nên các lần gọi
+        lặp lại (mỗi lần Streamlit rerun) không phải hỏi lại thiết bị.
+        names: danh sách node bất kỳ (mặc định là basic_settings); với node số có thêm
+        `<name>_Min` / `<name>_Max`. refresh=True bỏ cache và đọc lại toàn bộ.
+        """
+        if not self._camera_ready():
+            logger.warning("Camera chưa kết nối!")
+            return {}
+        cache = self._settings_cache
+        if refresh:
+            cache.invalidate()
+        s = {}
+        if names is None:
+            basic_settings = [
+                "ExposureTime", "Gain", "Width", "Height",
+                "OffsetX", "OffsetY", "ReverseX", "ReverseY",
+                "TriggerMode", "BalanceWhiteAuto", "AcquisitionFrameRate"
+            ]
+            for name in basic_settings:
+                s[name] = cache.get(name)
+            # Lấy thêm min/max cho các thông số số học
+            for name in ["ExposureTime", "Gain", "Width", "Height", "OffsetX", "OffsetY", "AcquisitionFrameRate"]:
+                s[f"{name}_Min"] = cache.get(name, "Min")
+                s[f"{name}_Max"] = cache.get(name, "Max")
+            return s
+        for name in names:
+            s[name] = cache.get(name)
+            if isinstance(s[name], (int, float)) and not isinstance(s[name], bool):
+                s[f"{name}_Min"] = cache.get(name, "Min")
+                s[f"{name}_Max"] = cache.get(name, "Max")
         return s
 
+    def settings_cache_stats(self):
+        """
+        Số lần get_settings lấy từ cache (hits) và phải đọc thiết bị (misses).
+        """
+        return self._settings_cache.stats()
+
     def update_setting(self, name, value):
         """
         Đặt 1 giá trị setting (tự động kiểm tra kiểu dữ liệu).
         Một số setting như Width/Height/Offset khi đang grabbing cần stop stream.
         """
-        if self.camera is None or not self.camera.IsOpen():
-            print("[BaslerCameraAPI] Camera chưa kết nối!")
+        if not self._camera_ready():
+            logger.warning("Camera chưa kết nối!")
             return False
         try:
             node = getattr(self.camera, name)
@@ -168,38 +1286,114 @@ class BaslerCameraAPI:
             # Đặt giá trị
             if hasattr(node, "Value"):
                 # Tự động ép kiểu nếu cần
-                cur_type = type(node.Value)
-                if cur_type is bool:
-                    node.Value = bool(value)
-                elif cur_type is int:
-                    node.Value = int(value)
-                elif cur_type is float:
-                    node.Value = float(value)
-                else:
-                    node.Value = value
+                node.Value = _coerce_value(node, value)
             else:
                 setattr(self.camera, name, value)
             if need_restart:
                 self.camera.StartGrabbing(pylon.GrabStrategy_OneByOne)
-            print(f"[BaslerCameraAPI] Đã set {name} = {value}")
+            if name in self._frame_meta:
+                self._frame_meta[name] = getattr(node, "Value", value)
+            if name == "PixelFormat":
+                self._pixel_format_changed()
+            self._desired_settings[name] = getattr(node, "Value", value)
+            self._settings_cache.invalidate_after_write(name, value)
+            logger.debug("Đã set %s = %s", name, value)
             return True
         except Exception as e:
-            print(f"[BaslerCameraAPI] Lỗi update_setting {name}: {e}")
+            self._settings_cache.invalidate_after_write(name)
+            logger.error("Lỗi update_setting %s: %s", name, e)
             return False
 
-    def parse_settings(self, settings_dict):
+    def _write_node(self, name, value, clamp=True):
+        """
+        Ghi 1 node, kẹp vào [Min, Max] và làm tròn theo Inc nếu là node số. Trả về giá trị đã ghi.
         """
-        Nhận 1 dict {setting: value} và update lần lượt.
+        node = getattr(self.camera, name)
+        value = _coerce_value(node, value)
+        if clamp and isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = _clamp_to_node(node, value)
+        try:
+            node.Value = value
+        finally:
+            self._settings_cache.invalidate_after_write(name, value)
+        return node.Value
+
+    def apply_settings(self, settings_dict):
+        """
+        Áp dụng nhiều setting trong 1 giao dịch:
+          - sắp xếp thứ tự ghi theo phụ thuộc giữa các node (PixelFormat/Binning -> ROI -> Exposure -> FrameRate)
+          - ROI: đưa Offset về 0 trước rồi mới ghi Width/Height, sau đó ghi Offset đích
+            (không bị lỗi dù thu nhỏ hay phóng to); lô không có Offset thì giữ Offset cũ
+            (kẹp theo Max mới), chỉ tạm về 0 khi cần chỗ cho kích thước mới
+          - dừng grabbing tối đa 1 lần cho cả lô
+          - kẹp giá trị vào Min/Max/Inc của node
+          - lỗi ở bất kỳ node nào -> khôi phục toàn bộ giá trị cũ
+        Trả về True/False; giá trị thực sự đã ghi nằm trong self.last_applied_settings.
         """
         if not isinstance(settings_dict, dict):
-            print("[BaslerCameraAPI] Dữ liệu không phải dict!")
+            logger.warning("Dữ liệu không phải dict!")
+            return False
+        if not self._camera_ready():
+            logger.warning("Camera chưa kết nối!")
             return False
+        # Offset trước lô của các trục chỉ đổi Width/Height, để giữ nguyên vị trí vùng
+        current = {}
+        for size, offset in _ROI_AXES:
+            if size in settings_dict and offset not in settings_dict:
+                try:
+                    current[offset] = (getattr(self.camera, offset).Value, getattr(self.camera, size).Max)
+                except Exception:
+                    pass
+        plan = _plan_settings(settings_dict, current)
+        need_restart = self.camera.IsGrabbing() and any(name in _RESTART_NODES for name, _ in plan)
+        # Lưu giá trị cũ của mọi node sẽ bị chạm tới để rollback
+        backup = {}
+        for name, _ in plan:
+            if name not in backup:
+                try:
+                    backup[name] = getattr(self.camera, name).Value
+                except Exception:
+                    pass
+        applied = {}
         ok = True
-        for k, v in settings_dict.items():
-            if not self.update_setting(k, v):
-                ok = False
+        name = None
+        try:
+            if need_restart:
+                self.camera.StopGrabbing()
+            for name, value in plan:
+                applied[name] = self._write_node(name, value)
+        except Exception as e:
+            ok = False
+            logger.error("Lỗi apply_settings tại %s: %s -> khôi phục giá trị cũ", name, e)
+            for name, value in _plan_settings(backup):
+                try:
+                    self._write_node(name, value, clamp=False)
+                except Exception as e2:
+                    logger.error("Không khôi phục được %s: %s", name, e2)
+        finally:
+            # Cập nhật converter trước khi grabbing lại để frame đầu tiên đã theo PixelFormat mới
+            if "PixelFormat" in settings_dict:
+                self._pixel_format_changed()
+            if need_restart:
+                self.camera.StartGrabbing(pylon.GrabStrategy_OneByOne)
+        if ok:
+            # Bỏ các bước trung gian (Offset = 0) khỏi kết quả
+            self.last_applied_settings = {k: applied[k] for k in settings_dict if k in applied}
+            self._desired_settings.update(self.last_applied_settings)
+            # Offset được ghi lại (có thể đã bị kẹp) cũng là trạng thái cần khôi phục khi kết nối lại
+            self._desired_settings.update({k: applied[k] for k in current if k in applied})
+            for name in self._frame_meta:
+                if name in applied:
+                    self._frame_meta[name] = applied[name]
+            logger.debug("Đã áp dụng %s setting.", len(self.last_applied_settings))
         return ok
 
+    def parse_settings(self, settings_dict):
+        """
+        Nhận 1 dict {setting: value} và áp dụng cả lô bằng apply_settings.
+        """
+        return self.apply_settings(settings_dict)
+
 # --------- Ví dụ sử dụng (Có thể xoá khi dùng import sang Streamlit) ----------
 if __name__ == "__main__":
     api = BaslerCameraAPI()
@@ -0,0 +1,1465 @@
+# Benchmark.py
+# Đo hiệu năng với camera giả lập (SimCamera), không cần camera thật.
+#   python Benchmark.py memory --width 2448 --height 2048 --fps 30 --frames 150
+#   python Benchmark.py multicam --cameras 1 2 4 8 --fps 60
+#   python Benchmark.py stream --width 1280 --height 720 --duration 3
+#   python Benchmark.py preview --width 2448 --height 2048 --display-width 960
+#   python Benchmark.py record --width 2448 --height 2048 --fps 60 --duration 5 --dir /tmp
+#   python Benchmark.py metrics --sizes 1280x720 2448x2048 4096x3000
+#   python Benchmark.py autotune --fps 60 --settle 0 2
+#   python Benchmark.py analysis --fps 30 --agent-delay 0.2 --duration 3
+#   python Benchmark.py viewers --viewers 1 4 16 --fps 30 --duration 3
+#   python Benchmark.py discovery --enumerate-delay 0.5 --reruns 20
+#   python Benchmark.py telemetry --fps 60 --duration 3
+#   python Benchmark.py convert --sizes 1280x720 2448x2048 --fps 30
+#   python Benchmark.py roi --regions 1920x1200 960x600 480x300 1920x1200/2
+#   python Benchmark.py dedup --frames 150 --motion 0.2
+#   python Benchmark.py recovery --cycles 3 --down 2
+#   python Benchmark.py startup --runs 3 --reruns 20 [--apps mainWebUI.py /duong/dan/ban_cu/mainWebUI.py]
+#   python Benchmark.py suite --json base.json ; python Benchmark.py suite --baseline base.json
+# Mức log của các module camera: --log-level INFO (mặc định WARNING để không lẫn với bảng kết quả)
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+from io import BytesIO
+import numpy as np
+from PIL import Image
+from BaslerAPI import BaslerCameraAPI
+from CameraArray import CameraArray
+from SimCamera import SimulatedCamera, SimTlFactory
+from StreamServer import JpegEncoder, MjpegStreamServer
+from Preview import PreviewPipeline
+from Recorder import RawReader
+from ImageMetrics import ImageMetrics
+from AutoTuner import AutoTuner
+from AnalysisWorker import AnalysisWorker, EchoAgent
+from CameraService import CameraService
+from DeviceRegistry import DeviceRegistry
+from Telemetry import Telemetry
+from PixelConverter import PixelConverter, cv2 as converter_cv2, pack, mosaic
+from ChangeDetector import ChangeDetector
+from FrameBuffer import FrameRingBuffer
+
+
+def _rss_mb():
+    """RSS hiện tại của process (MB)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _print_table(rows, columns):
+    widths = [max(len(str(c)), *(len(str(r.get(c, ""))) for r in rows)) for c in columns]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(w) for c, w in zip(columns, widths)))
+
+
+def _synthetic_frame(height, width, channels=3, seed=0):
+    """Ảnh giả lập có cấu trúc + nhiễu (nén gần giống ảnh thật hơn gradient trơn)."""
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width]
+    base = 128 + 60 * np.sin(xs / 37.0) * np.cos(ys / 23.0) + 40 * ((xs // 64 + ys // 64) % 2)
+    img = base + rng.normal(0, 6, size=(height, width))
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    if channels == 3:
+        img = np.stack([img, np.roll(img, 7, axis=1), img[::-1]], axis=-1)
+    return img
+
+
+def _make_api(args, **kwargs):
+    camera = SimulatedCamera(width=args.width, height=args.height, fps=args.fps, **kwargs)
+    api = BaslerCameraAPI(camera=camera)
+    api.connect()
+    return api
+
+
+# ------------------ memory: cấp phát/RSS mỗi frame ------------------
+def bench_memory(args):
+    """
+    So sánh 3 cách lấy frame ở trạng thái ổn định:
+      copy  : get_image() cũ, grab.Array cấp phát mảng mới mỗi frame
+      out   : get_image(out=buf) chép vào buffer cấp phát sẵn
+      lease : grab_frame() giữ buffer của driver, không copy
+      ring  : grab nền vào ring + get_next(out=buf)
+    """
+    rows = []
+    frame_bytes = args.width * args.height
+    for mode in ("copy", "out", "lease", "ring"):
+        api = _make_api(args)
+        out = np.empty((args.height, args.width), dtype=np.uint8)
+        if mode == "ring":
+            api.start_background_grab(buffer_size=4)
+        else:
+            api.start_stream()
+        last_seq = -1
+
+        def one_frame():
+            nonlocal last_seq
+            if mode == "copy":
+                return api.get_image(timeout=1000) is not None
+            if mode == "out":
+                return api.get_image(timeout=1000, out=out) is not None
+            if mode == "lease":
+                lease = api.grab_frame(timeout=1000)
+                if lease is None:
+                    return False
+                with lease:
+                    _ = int(lease.array[0, 0])
+                return True
+            frame = api.get_next(last_seq, timeout=1.0, out=out)
+            if frame is None:
+                return False
+            last_seq = frame.seq
+            return True
+
+        # Khởi động (cấp phát ring/buffer lần đầu) rồi mới đo
+        for _ in range(5):
+            one_frame()
+        tracemalloc.start()
+        base, _ = tracemalloc.get_traced_memory()
+        alloc_total = 0
+        ok = 0
+        rss_start = _rss_mb()
+        t0 = time.perf_counter()
+        for _ in range(args.frames):
+            tracemalloc.reset_peak()
+            cur_before, _ = tracemalloc.get_traced_memory()
+            ok += one_frame()
+            _, peak = tracemalloc.get_traced_memory()
+            alloc_total += max(peak - cur_before, 0)
+        elapsed = time.perf_counter() - t0
+        tracemalloc.stop()
+        rows.append({
+            "mode": mode,
+            "frames": ok,
+            "fps": f"{ok / elapsed:.1f}",
+            "alloc_per_frame_kB": f"{alloc_total / max(ok, 1) / 1e3:.1f}",
+            "alloc/frame_size": f"{alloc_total / max(ok, 1) / frame_bytes:.2f}",
+            "rss_MB": f"{_rss_mb():.1f}",
+            "rss_growth_MB": f"{_rss_mb() - rss_start:.1f}",
+        })
+        api.disconnect()
+    print(f"\n[memory] {args.width}x{args.height} mono8 @ {args.fps} fps, {args.frames} frames")
+    _print_table(rows, list(rows[0].keys()))
+
+
+# ------------------ multicam: thông lượng theo số camera ------------------
+def bench_multicam(args):
+    """
+    Thông lượng tổng (frame/s) khi stream N camera giả lập:
+      serial   : 1 vòng lặp Python gọi get_image() lần lượt từng camera
+      parallel : CameraArray, mỗi camera 1 luồng grab nền
+    """
+    rows = []
+    for n in args.cameras:
+        serials = [f"SIM{i:04d}" for i in range(n)]
+
+        def factory(serial):
+            return BaslerCameraAPI(camera=SimulatedCamera(
+                width=args.width, height=args.height, fps=args.fps, serial=serial))
+
+        # serial: vòng lặp đồng bộ
+        apis = [factory(s) for s in serials]
+        for api in apis:
+            api.connect()
+            api.start_stream()
+        count = 0
+        t0 = time.perf_counter()
+        while time.perf_counter() - t0 < args.duration:
+            for api in apis:
+                count += api.get_image(timeout=1000) is not None
+        serial_fps = count / (time.perf_counter() - t0)
+        for api in apis:
+            api.disconnect()
+
+        # parallel: CameraArray
+        array = CameraArray(api_factory=factory)
+        array.connect(serials)
+        array.start(buffer_size=8)
+        time.sleep(0.2)
+        start = {s: st["frames_written"] for s, st in array.stats().items()}
+        t0 = time.perf_counter()
+        sets = 0
+        last_reference = None
+        while time.perf_counter() - t0 < args.duration:
+            # Camera free-run lệch pha tối đa 1 chu kỳ frame
+            frame_set = array.get_frame_set(tolerance=1.0 / args.fps, timeout=0.1, copy=False)
+            if frame_set is not None and frame_set.reference != last_reference:
+                last_reference = frame_set.reference
+                sets += 1
+            time.sleep(0.2 / args.fps)
+        elapsed = time.perf_counter() - t0
+        stats = array.stats()
+        written = sum(st["frames_written"] - start[s] for s, st in stats.items())
+        dropped = sum(st["frames_dropped"] for st in stats.values())
+        array.disconnect()
+        rows.append({
+            "cameras": n,
+            "nominal_fps": f"{n * args.fps:.0f}",
+            "serial_fps": f"{serial_fps:.1f}",
+            "parallel_fps": f"{written / elapsed:.1f}",
+            "frame_sets/s": f"{sets / elapsed:.1f}",
+            "dropped": dropped,
+        })
+    print(f"\n[multicam] {args.width}x{args.height} @ {args.fps} fps mỗi camera, {args.duration}s")
+    _print_table(rows, list(rows[0].keys()))
+
+
+# ------------------ stream: encode + MJPEG end-to-end ------------------
+def bench_stream(args):
+    """
+    1) Chi phí encode từng frame: PNG (đường st.image hiện tại) so với JPEG ở các mức
+       quality / max_width.
+    2) End-to-end: SimulatedCamera -> grab nền -> MjpegStreamServer -> client HTTP,
+       đo FPS client nhận được và số byte mỗi frame.
+    """
+    frame = _synthetic_frame(args.height, args.width)
+    rows = []
+
+    def measure(name, fn):
+        fn()  # khởi động
+        t0 = time.perf_counter()
+        size = 0
+        for _ in range(args.frames):
+            size = len(fn())
+        ms = (time.perf_counter() - t0) * 1000.0 / args.frames
+        rows.append({"encoder": name, "encode_ms": f"{ms:.2f}", "kB/frame": f"{size / 1e3:.1f}",
+                     "max_fps(1 core)": f"{1000.0 / ms:.1f}"})
+
+    def png():
+        buf = BytesIO()
+        Image.fromarray(frame).save(buf, format="PNG")
+        return buf.getvalue()
+
+    measure("png (st.image)", png)
+    for quality in args.quality:
+        for max_width in args.max_width:
+            encoder = JpegEncoder(quality=quality, max_width=max_width)
+            measure(f"jpeg q={quality} w<={max_width}", lambda: encoder.encode(frame))
+    print(f"\n[stream] encode {args.width}x{args.height} RGB, {args.frames} frames")
+    _print_table(rows, list(rows[0].keys()))
+
+    # End-to-end qua HTTP
+    api = _make_api(args, mono=False)
+    api.start_background_grab(buffer_size=4)
+    server = MjpegStreamServer(api.get_next, host="127.0.0.1", port=0, quality=args.quality[0],
+                               max_width=args.max_width[0], max_fps=args.max_fps)
+    server.start()
+    received, total_bytes = 0, 0
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/stream.mjpg", timeout=5) as resp:
+            t0 = time.perf_counter()
+            while time.perf_counter() - t0 < args.duration:
+                line = resp.readline()
+                if line.startswith(b"Content-Length:"):
+                    length = int(line.split(b":")[1])
+                    resp.readline()
+                    resp.read(length)
+                    received += 1
+                    total_bytes += length
+            elapsed = time.perf_counter() - t0
+    finally:
+        server.stop()
+        api.disconnect()
+    print(f"\n[stream] MJPEG end-to-end: camera {args.fps} fps, cap {args.max_fps} fps")
+    _print_table([{
+        "client_fps": f"{received / elapsed:.1f}",
+        "kB/frame": f"{total_bytes / max(received, 1) / 1e3:.1f}",
+        "Mbit/s": f"{total_bytes * 8 / elapsed / 1e6:.2f}",
+        "server_encode_ms": server.stats()["encode_ms"],
+    }], ["client_fps", "kB/frame", "Mbit/s", "server_encode_ms"])
+
+
+# ------------------ preview: thu nhỏ + quality thích nghi ------------------
+def bench_preview(args):
+    """
+    So sánh encode full-res với PreviewPipeline (area downscale về display_width,
+    Bayer superpixel) và kiểm tra quality thích nghi bám bitrate mục tiêu.
+    """
+    rows = []
+    rgb = _synthetic_frame(args.height, args.width)
+    mono = rgb[..., 0].copy()
+    bayer = mono  # mosaic giả lập: cùng dữ liệu, khác cách diễn giải
+    cases = [
+        ("mono full-res", mono, None, JpegEncoder(quality=80, max_width=None)),
+        ("mono preview", mono, "Mono8", None),
+        ("bayer full-res", bayer, None, JpegEncoder(quality=80, max_width=None)),
+        ("bayer preview", bayer, "BayerRG8", None),
+        ("rgb full-res", rgb, None, JpegEncoder(quality=80, max_width=None)),
+        ("rgb preview", rgb, "RGB8", None),
+    ]
+    for name, frame, pixel_format, encoder in cases:
+        if encoder is None:
+            encoder = PreviewPipeline(display_width=args.display_width, pixel_format=pixel_format,
+                                      fmt=args.format, target_bitrate=args.bitrate, fps=args.fps)
+        for _ in range(10):
+            encoder.encode(frame)  # khởi động + để quality hội tụ
+        t0 = time.perf_counter()
+        sizes = [len(encoder.encode(frame)) for _ in range(args.frames)]
+        ms = (time.perf_counter() - t0) * 1000.0 / args.frames
+        size = sum(sizes) / len(sizes)
+        rows.append({
+            "case": name,
+            "ms/frame": f"{ms:.2f}",
+            "kB/frame": f"{size / 1e3:.1f}",
+            "Mbit/s@fps": f"{size * 8 * args.fps / 1e6:.2f}",
+            "quality": encoder.quality,
+        })
+    print(f"\n[preview] {args.width}x{args.height} -> {args.display_width}px {args.format}, "
+          f"target {args.bitrate / 1e6:.1f} Mbit/s @ {args.fps} fps")
+    _print_table(rows, list(rows[0].keys()))
+
+
+# ------------------ record: ghi liên tục xuống đĩa ------------------
+def bench_record(args):
+    """
+    Ghi stream từ camera giả lập ra file .bcraw trong `duration` giây, đo tốc độ ghi
+    bền vững (MB/s, frame/s, frame bị mất), sau đó đo thời gian đọc ngẫu nhiên frame k.
+    """
+    directory = args.dir or tempfile.mkdtemp(prefix="bcraw_")
+    path = os.path.join(directory, "bench.bcraw")
+    api = _make_api(args)
+    api.start_background_grab(buffer_size=args.buffers)
+    capacity = int(args.duration * args.fps * 1.2) + 10
+    recorder = api.start_recording(path, max_frames=capacity, workers=args.workers)
+    t0 = time.perf_counter()
+    time.sleep(args.duration)
+    stats = api.stop_recording()
+    elapsed = time.perf_counter() - t0
+    grab = api.get_grab_stats()
+    api.disconnect()
+    mb = stats["frames_written"] * recorder.frame_bytes / 1e6
+    print(f"\n[record] {args.width}x{args.height} mono8 @ {args.fps} fps, {args.duration}s, "
+          f"{args.workers} luồng ghi -> {path}")
+    _print_table([{
+        "frames_written": stats["frames_written"],
+        "frames_dropped": stats["frames_dropped"],
+        "camera_dropped": grab.get("frames_dropped", 0),
+        "fps": f"{stats['frames_written'] / elapsed:.1f}",
+        "MB/s": f"{mb / elapsed:.1f}",
+    }], ["frames_written", "frames_dropped", "camera_dropped", "fps", "MB/s"])
+
+    reader = RawReader(path)
+    indices = [random.randrange(len(reader)) for _ in range(50)] if len(reader) else []
+    t0 = time.perf_counter()
+    checksum = 0
+    for k in indices:
+        frame, meta = reader[k]
+        checksum += int(frame[::64, ::64].sum()) + int(meta["seq"])
+    ms = (time.perf_counter() - t0) * 1000.0 / max(len(indices), 1)
+    print(f"[record] đọc ngẫu nhiên {len(indices)} frame: {ms:.3f} ms/frame (checksum {checksum})")
+    reader.close()
+    if not args.keep:
+        os.remove(path)
+
+
+# ------------------ metrics: chỉ số chất lượng ảnh mỗi frame ------------------
+def bench_metrics(args):
+    """
+    Thời gian ImageMetrics.compute theo độ phân giải và PixelFormat, so với ngân sách
+    --budget-ms (mục tiêu chạy được trên mọi frame của get_image).
+    """
+    rows = []
+    for size in args.sizes:
+        width, height = (int(v) for v in size.lower().split("x"))
+        rgb = _synthetic_frame(height, width)
+        mono = rgb[..., 0].copy()
+        cases = [
+            ("Mono8", mono),
+            ("BayerRG8", mono),
+            ("RGB8", rgb),
+            ("Mono12", mono.astype(np.uint16) << 4),
+        ]
+        for pixel_format, frame in cases:
+            metrics = ImageMetrics(pixel_format, target_samples=args.samples)
+            metrics.compute(frame)  # khởi động
+            times = []
+            for _ in range(args.frames):
+                t0 = time.perf_counter()
+                result = metrics.compute(frame)
+                times.append((time.perf_counter() - t0) * 1000.0)
+            ms = float(np.median(times))
+            rows.append({
+                "size": f"{width}x{height}",
+                "format": pixel_format,
+                "samples": result["samples"],
+                "median ms": f"{ms:.2f}",
+                "p95 ms": f"{np.percentile(times, 95):.2f}",
+                "budget": "OK" if ms <= args.budget_ms else "OVER",
+                "mean": result["mean"],
+                "sharpness": result["sharpness"],
+                "noise": result["noise"],
+            })
+    print(f"\n[metrics] {args.frames} frame/case, target_samples={args.samples}, budget {args.budget_ms} ms")
+    _print_table(rows, list(rows[0].keys()))
+
+
+# ------------------ autotune: số frame tới khi hội tụ ------------------
+def bench_autotune(args):
+    """
+    AutoTuner trên camera giả lập có độ sáng theo ExposureTime/Gain (setting có hiệu lực
+    sau SimulatedCamera.settings_latency frame). settle=0 cho thấy hậu quả của việc đo
+    trên frame phơi sáng bằng setting cũ.
+    """
+    # (tên, ExposureTime ban đầu, Gain ban đầu, reference_exposure của cảnh, min_fps)
+    scenarios = [
+        ("dark start", 800.0, 0.0, 10000.0, None),
+        ("clipped start", 16000.0, 6.0, 4000.0, None),
+        ("low light -> gain", 300.0, 0.0, 200000.0, None),
+        ("low light -> fps", 300.0, 0.0, 200000.0, args.min_fps),
+    ]
+    api = _make_api(args)
+    camera = api.camera
+    api.start_background_grab()
+    rows = []
+    try:
+        for name, exposure, gain, reference, min_fps in scenarios:
+            for settle in args.settle:
+                camera.reference_exposure = reference
+                api.apply_settings({"ExposureTime": exposure, "Gain": gain, "AcquisitionFrameRate": args.fps})
+                time.sleep(0.2)  # để setting ban đầu có hiệu lực
+                tuner = AutoTuner(api, target=args.target, min_fps=min_fps, settle_frames=settle,
+                                  refine=args.refine)
+                r = tuner.run()
+                rows.append({
+                    "scenario": name,
+                    "settle": settle,
+                    "converged": r["converged"],
+                    "iterations": r["iterations"],
+                    "frames": r["frames"],
+                    "discarded": r["discarded"],
+                    "wall ms": f"{r['wall_time'] * 1e3:.0f}",
+                    "mean": r["metrics"]["mean"],
+                    "clipped": r["metrics"]["clipped_high"],
+                    "ExposureTime": f"{r['settings']['ExposureTime']:.0f}",
+                    "Gain": f"{r['settings']['Gain']:.2f}",
+                    "fps": f"{r['settings']['AcquisitionFrameRate']:.1f}",
+                })
+    finally:
+        api.disconnect()
+    print(f"\n[autotune] {args.width}x{args.height} @ {args.fps} fps, target mean {args.target}, "
+          f"latency {camera.settings_latency} frame, refine={args.refine}")
+    _print_table(rows, list(rows[0].keys()))
+
+
+# ------------------ analysis: worker phân tích/agent không chặn ------------------
+def bench_analysis(args):
+    """
+    Gửi frame + prompt vào AnalysisWorker (agent giả lập EchoAgent có độ trễ) với tốc độ
+    camera, đo thời gian submit ở phía gọi (phải ~0), độ trễ kết quả và số job bị gộp.
+    """
+    worker = AnalysisWorker(agent=EchoAgent(delay=args.agent_delay), processes=args.processes)
+    frame = _synthetic_frame(args.height, args.width, channels=1)
+    worker.submit(frame, "warmup").result(timeout=30)  # khởi động process con
+    submit_ms, futures = [], []
+    period = 1.0 / args.fps
+    t_end = time.perf_counter() + args.duration
+    seq = 0
+    while time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        array = frame.copy()  # giống UI: copy frame khỏi ring buffer trước khi submit
+        t1 = time.perf_counter()
+        futures.append(worker.submit(array, f"frame {seq}", key="stream", pixel_format="Mono8", seq=seq))
+        submit_ms.append((time.perf_counter() - t1) * 1000.0)
+        seq += 1
+        time.sleep(max(period - (time.perf_counter() - t0), 0))
+    results = [f.result(timeout=30) for f in futures if not f.cancelled()]
+    latency = [r["latency"] * 1000.0 for r in results]
+    lag = [seq - 1 - r["seq"] for r in results[-1:]]
+    stats = worker.stats()
+    worker.close()
+    print(f"\n[analysis] {args.width}x{args.height} @ {args.fps} fps, agent delay {args.agent_delay}s, "
+          f"{args.processes} process")
+    _print_table([{
+        "submitted": seq,
+        "processed": len(results),
+        "coalesced": stats["coalesced"],
+        "submit ms (max)": f"{max(submit_ms):.3f}",
+        "latency ms p50": f"{np.median(latency):.0f}",
+        "latency ms p95": f"{np.percentile(latency, 95):.0f}",
+        "last result lag (frames)": lag[0] if lag else "",
+    }], ["submitted", "processed", "coalesced", "submit ms (max)", "latency ms p50", "latency ms p95",
+         "last result lag (frames)"])
+
+
+# ------------------ viewers: nhiều phiên dùng chung 1 camera ------------------
+def bench_viewers(args):
+    """
+    Nhiều viewer (giống nhiều tab Streamlit) dùng chung 1 camera giả lập qua CameraService.
+    Kiểm tra camera chỉ được mở/grab 1 lần, tắt stream ở 1 viewer không ảnh hưởng viewer khác,
+    và độ trễ frame -> viewer vẫn bị chặn trên khi số viewer tăng (kể cả viewer chậm).
+    Trả về 1 (exit code) nếu có kiểm tra không đạt, kể cả p95 độ trễ vượt --max-latency-ms.
+    """
+    rows = []
+    failures = []
+    for n in args.viewers:
+        opened = []
+
+        def factory(serial):
+            camera = SimulatedCamera(width=args.width, height=args.height, fps=args.fps, serial=serial)
+            opened.append(camera)
+            return BaslerCameraAPI(camera=camera)
+
+        service = CameraService(api_factory=factory)
+        handles = [service.viewer() for _ in range(n)]
+        for h in handles:
+            assert h.connect("SIM0001")
+            h.start_stream()
+        stop = threading.Event()
+        latencies = [[] for _ in handles]
+
+        def view(i, handle, slow):
+            # Viewer chậm (vd. trình duyệt ở mạng yếu) chỉ lấy 5 frame/s
+            interval = 0.2 if slow else 0.0
+            while not stop.is_set():
+                frame = handle.next_frame(timeout=0.1)
+                if frame is not None:
+                    latencies[i].append((time.perf_counter() - frame.host_time) * 1e3)
+                if interval:
+                    time.sleep(interval)
+
+        threads = [threading.Thread(target=view, args=(i, h, i % 4 == 3), daemon=True)
+                   for i, h in enumerate(handles)]
+        for t in threads:
+            t.start()
+        time.sleep(args.duration)
+        # Viewer đầu tiên tắt stream: các viewer khác vẫn phải nhận frame
+        handles[0].stop_stream()
+        before = [h.frames for h in handles[1:]]
+        time.sleep(0.5)
+        still_streaming = all(h.frames > b for h, b in zip(handles[1:], before)) if n > 1 else True
+        stop.set()
+        for t in threads:
+            t.join()
+        service_stats = service.stats()
+        grab = service_stats["SIM0001"]
+        fast = [h.viewer_stats() for i, h in enumerate(handles) if i % 4 != 3]
+        for h in handles:
+            h.disconnect()
+        all_latency = np.concatenate([np.asarray(l) for l in latencies]) if any(latencies) else np.zeros(1)
+        p95 = float(np.percentile(all_latency, 95))
+        checks = {
+            "1 API/serial": len(service_stats) == 1 and len(opened) == 1,
+            "opened once": len(opened) == 1 and opened[0].open_count == 1,
+            "others kept streaming": still_streaming,
+            "closed after last": not opened[0].IsOpen(),
+            f"p95 <= {args.max_latency_ms:g} ms": p95 <= args.max_latency_ms,
+        }
+        failures += [f"{n} viewer: {name}" for name, ok in checks.items() if not ok]
+        rows.append({
+            "viewers": n,
+            "cameras opened": len(opened),
+            "device opens": sum(c.open_count for c in opened),
+            "camera frames": grab["frames_written"],
+            "per-viewer fps": f"{np.mean([s['frames'] for s in fast]) / (args.duration + 0.5):.1f}",
+            "latency avg ms": f"{np.mean([s['latency_avg_ms'] for s in fast]):.2f}",
+            "latency p95 ms": f"{p95:.2f}",
+            "latency max ms": f"{max(s['latency_max_ms'] for s in fast):.2f}",
+            "checks": "OK" if all(checks.values()) else "FAIL",
+        })
+    print(f"\n[viewers] {args.width}x{args.height} @ {args.fps} fps, {args.duration}s, mỗi viewer thứ 4 là viewer chậm")
+    _print_table(rows, list(rows[0].keys()))
+    for failure in failures:
+        print(f"[viewers] KHÔNG ĐẠT: {failure}")
+    return 1 if failures else 0
+
+
+def bench_discovery(args):
+    """
+    Độ trễ 1 lần rerun Streamlit (lấy danh sách camera) và lúc kết nối, khi EnumerateDevices
+    tốn --enumerate-delay giây (GigE): enumerate mỗi lần rerun so với DeviceRegistry có cache.
+    Sau đó đo độ trễ sự kiện cắm camera (enumerate nền) và rút camera (callback removal).
+    """
+    def run(mode):
+        tl = SimTlFactory(serials=("SIM0001", "SIM0002"), enumerate_delay=args.enumerate_delay,
+                          width=640, height=480, fps=30)
+        registry = None
+        if mode == "cached":
+            registry = DeviceRegistry(tl_factory=tl, ttl=args.ttl)
+            registry.start()
+        reruns = []
+        for _ in range(args.reruns):
+            t0 = time.perf_counter()
+            if registry is None:
+                [d.GetSerialNumber() for d in tl.EnumerateDevices()]
+            else:
+                registry.list_cameras()
+            reruns.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        if registry is None:
+            # Đường cũ: connect() enumerate lại để tìm DeviceInfo theo serial
+            api = BaslerCameraAPI(tl_factory=tl)
+        else:
+            api = BaslerCameraAPI(registry=registry)
+        assert api.connect("SIM0002")
+        connect_ms = (time.perf_counter() - t0) * 1e3
+        api.disconnect()
+        if registry is not None:
+            registry.stop()
+        reruns_ms = np.array(reruns) * 1e3
+        return {
+            "mode": mode,
+            "rerun avg ms": f"{reruns_ms.mean():.2f}",
+            "rerun first ms": f"{reruns_ms[0]:.2f}",
+            "rerun max ms": f"{reruns_ms.max():.2f}",
+            "connect ms": f"{connect_ms:.2f}",
+            "enumerations": tl.enumerations,
+        }
+
+    rows = [run("enumerate"), run("cached")]
+    print(f"\n[discovery] EnumerateDevices {args.enumerate_delay * 1e3:.0f} ms, {args.reruns} rerun, ttl {args.ttl}s")
+    _print_table(rows, list(rows[0].keys()))
+
+    # Sự kiện cắm/rút
+    tl = SimTlFactory(serials=("SIM0001",), enumerate_delay=args.enumerate_delay, width=640, height=480, fps=30)
+    registry = DeviceRegistry(tl_factory=tl, ttl=args.ttl, refresh_interval=args.refresh_interval)
+    registry.list_cameras()
+    registry.start()
+    events = {}
+    done = threading.Event()
+
+    def listener(event, serial, info):
+        events[(event, serial)] = time.perf_counter()
+        done.set()
+
+    registry.add_listener(listener)
+    api = BaslerCameraAPI(registry=registry)
+    assert api.connect("SIM0001")
+    api.start_background_grab()
+    rows = []
+    for event, serial, action in (("added", "SIM0002", lambda: tl.add_device("SIM0002")),
+                                  ("removed", "SIM0001", lambda: tl.remove_device("SIM0001"))):
+        done.clear()
+        t0 = time.perf_counter()
+        action()
+        done.wait(args.refresh_interval + args.enumerate_delay + 2.0)
+        t = events.get((event, serial))
+        rows.append({
+            "event": f"{event} {serial}",
+            "latency ms": "timeout" if t is None else f"{(t - t0) * 1e3:.1f}",
+            "source": "enumerate nền" if event == "added" else "callback removal",
+        })
+    api.stop_stream()
+    registry.stop()
+    print(f"\n[discovery] sự kiện cắm/rút, refresh_interval {args.refresh_interval}s")
+    _print_table(rows, list(rows[0].keys()))
+
+
+def bench_telemetry(args):
+    """
+    1) Chi phí mỗi lời gọi đo đạc (Timing.observe, Rate.tick, Counter.inc) và logger.debug khi đã tắt,
+       cộng lại thành chi phí thêm vào mỗi frame của luồng grab.
+    2) End-to-end: SimulatedCamera -> grab nền -> MjpegStreamServer -> client, rồi đọc /metrics.
+    """
+    telemetry = Telemetry(prefix="bench")
+    timing, rate, counter = telemetry.timing("t"), telemetry.rate("r"), telemetry.counter("c")
+    log = logging.getLogger("bench.disabled")
+    log.setLevel(logging.WARNING)
+    n = args.calls
+
+    def per_call(fn):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - t0) / n * 1e9
+
+    loop = per_call(lambda: None)
+    costs = {
+        "perf_counter()": per_call(time.perf_counter) - loop,
+        "Timing.observe": per_call(lambda: timing.observe(1.5)) - loop,
+        "Rate.tick": per_call(rate.tick) - loop,
+        "Counter.inc": per_call(counter.inc) - loop,
+        "logger.debug (tắt)": per_call(lambda: log.debug("frame %s", 1)) - loop,
+    }
+    # Mỗi frame luồng grab: 3 perf_counter, 4 observe, 1 tick
+    per_frame = 3 * costs["perf_counter()"] + 4 * costs["Timing.observe"] + costs["Rate.tick"]
+    rows = [{"call": k, "ns/call": f"{v:.0f}"} for k, v in costs.items()]
+    rows.append({"call": "tổng mỗi frame grab", "ns/call": f"{per_frame:.0f}"})
+    print(f"\n[telemetry] chi phí đo đạc ({n} lần gọi)")
+    _print_table(rows, ["call", "ns/call"])
+
+    telemetry = Telemetry()
+    camera = SimulatedCamera(width=args.width, height=args.height, fps=args.fps, mono=False)
+    api = BaslerCameraAPI(camera=camera, telemetry=telemetry)
+    api.connect()
+    api.start_background_grab(buffer_size=4)
+    server = MjpegStreamServer(api.get_next, host="127.0.0.1", port=0, max_fps=args.max_fps, telemetry=telemetry)
+    server.start()
+    received = 0
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/stream.mjpg", timeout=5) as resp:
+            t0 = time.perf_counter()
+            while time.perf_counter() - t0 < args.duration:
+                line = resp.readline()
+                if line.startswith(b"Content-Length:"):
+                    length = int(line.split(b":")[1])
+                    resp.readline()
+                    resp.read(length)
+                    received += 1
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as resp:
+            text = resp.read().decode()
+        rows = telemetry.snapshot()
+    finally:
+        server.stop()
+        api.disconnect()
+    samples = [l for l in text.splitlines() if l and not l.startswith("#")]
+    print(f"\n[telemetry] {args.width}x{args.height} @ {args.fps} fps, hiển thị tối đa {args.max_fps} fps, "
+          f"{args.duration}s, client nhận {received} frame; /metrics: {len(samples)} mẫu")
+    _print_table([r for r in rows if "avg_ms" in r], ["metric", "labels", "count", "avg_ms", "ewma_ms", "max_ms"])
+    print()
+    _print_table([{"metric": r["metric"], "labels": r["labels"],
+                   "value": r.get("value", r.get("count")), "per_second": r.get("per_second", "")}
+                  for r in rows if "avg_ms" not in r], ["metric", "labels", "value", "per_second"])
+
+
+def bench_convert(args):
+    """
+    1) Thời gian PixelConverter.convert mỗi frame vào buffer có sẵn, theo PixelFormat và độ phân giải,
+       so với 1 lần chép thuần (np.copyto).
+    2) Trong luồng grab: SimulatedCamera báo BayerRG8, so FPS grab và thời gian grab_copy khi tắt/bật chuyển đổi.
+    """
+    rows = []
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split("x"))
+        rgb = _synthetic_frame(height, width)
+        raw8 = mosaic(rgb, "RG")
+        raw12 = raw8.astype(np.uint16) << 4
+        sources = {
+            "Mono8": rgb[..., 0].copy(),
+            "Mono12": raw12,
+            "Mono10p": pack(raw12 >> 2, 10, "p"),
+            "Mono12p": pack(raw12, 12, "p"),
+            "BayerRG8": raw8,
+            "BayerRG12": raw12,
+            "BayerRG12p": pack(raw12, 12, "p"),
+        }
+        copy_src = sources["Mono8"]
+        copy_out = np.empty_like(copy_src)
+        t0 = time.perf_counter()
+        for _ in range(args.frames):
+            np.copyto(copy_out, copy_src)
+        copy_ms = (time.perf_counter() - t0) * 1e3 / args.frames
+        rows.append({"size": size, "format": "np.copyto (Mono8)", "out": "", "ms/frame": f"{copy_ms:.2f}",
+                     "MP/s": f"{width * height / copy_ms / 1e3:.0f}", "max fps": f"{1e3 / copy_ms:.0f}"})
+        for fmt, src in sources.items():
+            conv = PixelConverter(fmt)
+            out = conv.convert(src)  # cấp phát buffer đích 1 lần
+            t0 = time.perf_counter()
+            for _ in range(args.frames):
+                conv.convert(src, out)
+            ms = (time.perf_counter() - t0) * 1e3 / args.frames
+            rows.append({"size": size, "format": fmt, "out": f"{conv.output_format} {out.shape}",
+                         "ms/frame": f"{ms:.2f}", "MP/s": f"{width * height / ms / 1e3:.0f}",
+                         "max fps": f"{1e3 / ms:.0f}"})
+    backend = "OpenCV" if converter_cv2 is not None else "NumPy, không có OpenCV"
+    print(f"\n[convert] PixelConverter vào buffer có sẵn, {args.frames} frame (demosaic {backend})")
+    _print_table(rows, list(rows[0].keys()))
+
+    rows = []
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split("x"))
+        for convert in (False, True):
+            telemetry = Telemetry()
+            camera = SimulatedCamera(width=width, height=height, fps=args.fps)
+            camera.PixelFormat.Value = "BayerRG8"
+            api = BaslerCameraAPI(camera=camera, telemetry=telemetry, convert=convert)
+            api.connect()
+            api.start_background_grab()
+            time.sleep(args.duration)
+            frame = api.get_latest(copy=False)
+            stats = api.get_grab_stats()
+            api.disconnect()
+            tm = {r["metric"]: r for r in telemetry.snapshot()}
+            rows.append({
+                "size": size,
+                "convert": convert,
+                "frame_format": api.frame_format if convert else "BayerRG8",
+                "ring shape": None if frame is None else frame.array.shape,
+                "grab fps": f"{stats['frames_written'] / args.duration:.1f}",
+                "dropped": stats["frames_dropped"],
+                "grab_copy avg ms": tm["grab_copy"]["avg_ms"],
+                "grab_copy max ms": tm["grab_copy"]["max_ms"],
+            })
+    print(f"\n[convert] trong luồng grab, camera BayerRG8 @ {args.fps} fps, {args.duration}s")
+    _print_table(rows, list(rows[0].keys()))
+
+
+def _suite_open(args, telemetry, **camera_kwargs):
+    """Đường của mainWebUI: SimTlFactory -> DeviceRegistry -> CameraService (convert=True) -> CameraHandle."""
+    tl = SimTlFactory(serials=("SIM0001",), width=args.width, height=args.height, fps=args.fps,
+                      pixel_format="BayerRG8", **camera_kwargs)
+    registry = DeviceRegistry(tl_factory=tl, ttl=60.0)
+    service = CameraService(registry=registry, api_factory=lambda serial: BaslerCameraAPI(
+        registry=registry, telemetry=telemetry, convert=True))
+    handle = service.viewer()
+    assert handle.connect("SIM0001")
+    handle.start_stream()
+    return tl, service, handle
+
+
+def _suite_display(handle, preview, fps, duration, max_frames=None):
+    """
+    Vòng hiển thị như fragment live của VisionUI: mỗi 1/fps giây lấy frame mới nhất của viewer và encode.
+    fps <= 0: không giãn nhịp, chờ frame kế tiếp rồi encode ngay (đo năng lực tối đa của pipeline).
+    Trả về (độ trễ grab -> hiển thị ms, khoảng cách giữa 2 lần hiển thị ms, thời gian chạy s).
+    """
+    period = 1.0 / fps if fps > 0 else 0.0
+    latencies, gaps = [], []
+    last_shown = None
+    t_start = next_tick = time.perf_counter()
+    while time.perf_counter() - t_start < duration and (max_frames is None or len(latencies) < max_frames):
+        frame = handle.next_frame(timeout=0.0 if period else 0.5)
+        if frame is not None:
+            preview.pixel_format = handle.frame_format
+            preview.encode(frame.array)
+            now = time.perf_counter()
+            latencies.append(now - frame.host_time)
+            if last_shown is not None:
+                gaps.append(now - last_shown)
+            last_shown = now
+        if period:
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()
+    elapsed = time.perf_counter() - t_start
+    return np.array(latencies) * 1e3, np.array(gaps) * 1e3, elapsed
+
+
+def _timed_ms(fn, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - t0) * 1e3 / n
+
+
+def bench_suite(args):
+    """
+    Bộ đo hồi quy end-to-end cho vòng của mainWebUI với camera giả lập (BayerRG8, demosaic trong luồng grab):
+      live     - FPS grab/hiển thị bền vững và độ trễ grab -> hiển thị ở nhịp fragment (--display-fps),
+                 năng lực tối đa khi không giãn nhịp
+      settings - chi phí ghi setting khi đang stream: ExposureTime (apply_settings), Gain (update_setting),
+                 get_settings đọc cache, đổi ROI (dừng/chạy lại grab) và thời gian tới frame đầu theo ROI mới
+      memory   - tracemalloc: bộ nhớ tăng ròng và đỉnh mỗi frame của vòng hiển thị
+      faults   - có frame lỗi/mất/ngừng gửi (drop/lost/stall): FPS hiển thị và khoảng trống dài nhất
+    --json lưu kết quả; --baseline so với lần lưu trước, lệch quá --tolerance theo hướng xấu đi
+    thì báo REGRESSION và thoát mã 1.
+    """
+    import json
+    metrics = {}
+
+    def record(name, value, unit, better):
+        metrics[name] = {"value": round(float(value), 3), "unit": unit, "better": better}
+
+    def preview():
+        return PreviewPipeline(display_width=args.display_width, fps=args.display_fps)
+
+    # --- live ---
+    telemetry = Telemetry()
+    tl, service, handle = _suite_open(args, telemetry)
+    try:
+        _suite_display(handle, preview(), args.display_fps, args.warmup)
+        written0 = handle.get_grab_stats()["frames_written"]
+        latency, gaps, elapsed = _suite_display(handle, preview(), args.display_fps, args.duration)
+        grab_fps = (handle.get_grab_stats()["frames_written"] - written0) / elapsed
+        record("live.grab_fps", grab_fps, "fps", "higher")
+        record("live.display_fps", len(latency) / elapsed, "fps", "higher")
+        record("live.latency_p50_ms", np.percentile(latency, 50), "ms", "lower")
+        record("live.latency_p95_ms", np.percentile(latency, 95), "ms", "lower")
+        latency, _, elapsed = _suite_display(handle, preview(), 0, args.duration)
+        record("live.max_display_fps", len(latency) / elapsed, "fps", "higher")
+
+        # --- settings (đang stream) ---
+        api = handle.api
+        record("settings.apply_exposure_ms",
+               _timed_ms(lambda i: api.apply_settings({"ExposureTime": 5000.0 + 1000.0 * (i % 2)}), args.writes),
+               "ms", "lower")
+        record("settings.update_gain_ms", _timed_ms(lambda i: api.update_setting("Gain", float(i % 2)), args.writes),
+               "ms", "lower")
+        api.get_settings()
+        record("settings.get_cached_us", _timed_ms(lambda i: api.get_settings(), args.writes * 10) * 1e3,
+               "us", "lower")
+        restart, first_frame = [], []
+        for i in range(args.roi_changes):
+            width = args.width // 2 if i % 2 == 0 else args.width
+            height = args.height // 2 if i % 2 == 0 else args.height
+            t0 = time.perf_counter()
+            assert api.apply_settings({"Width": width, "Height": height})
+            restart.append(time.perf_counter() - t0)
+            deadline = t0 + 2.0
+            while time.perf_counter() < deadline:
+                frame = handle.next_frame(timeout=0.1, copy=False)
+                if frame is not None and frame.array.shape[:2] == (height, width):
+                    first_frame.append(time.perf_counter() - t0)
+                    break
+        record("settings.roi_restart_ms", np.mean(restart) * 1e3, "ms", "lower")
+        record("settings.roi_first_frame_ms", np.mean(first_frame) * 1e3 if first_frame else float("nan"),
+               "ms", "lower")
+
+        # --- memory ---
+        pipeline = preview()
+        _suite_display(handle, pipeline, 0, 1.0, max_frames=5)
+        tracemalloc.start()
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        latency, _, _ = _suite_display(handle, pipeline, 0, args.duration * 2, max_frames=args.memory_frames)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        n = max(len(latency), 1)
+        record("memory.growth_kb_per_frame", (current - start) / 1e3 / n, "KB", "lower")
+        record("memory.peak_kb", (peak - start) / 1e3, "KB", "lower")
+    finally:
+        handle.disconnect()
+
+    # --- faults ---
+    telemetry = Telemetry()
+    tl, service, handle = _suite_open(args, telemetry, drop_rate=args.drop_rate, lost_rate=args.lost_rate,
+                                      stall_rate=args.stall_rate, stall_ms=args.stall_ms, seed=args.seed)
+    try:
+        latency, gaps, elapsed = _suite_display(handle, preview(), args.display_fps, args.duration)
+        stats = handle.get_grab_stats()
+        camera = tl._cameras["SIM0001"]
+        injected = dict(camera.injected)
+        timeouts = telemetry.counter("grab_timeouts", camera="SIM0001").get()
+    finally:
+        handle.disconnect()
+    record("faults.display_fps", len(latency) / elapsed, "fps", "higher")
+    record("faults.max_gap_ms", gaps.max() if len(gaps) else float("nan"), "ms", "lower")
+    record("faults.latency_p95_ms", np.percentile(latency, 95), "ms", "lower")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("metrics", {})
+    rows = []
+    regressions = 0
+    for name, m in metrics.items():
+        row = {"metric": name, "value": m["value"], "unit": m["unit"], "baseline": "", "change": "", "status": ""}
+        base = baseline.get(name, {}).get("value")
+        if base is not None and base == base and m["value"] == m["value"]:  # bỏ qua NaN
+            change = (m["value"] - base) / abs(base) if base else 0.0
+            worse = change > args.tolerance if m["better"] == "lower" else change < -args.tolerance
+            regressions += worse
+            row.update(baseline=base, change=f"{change:+.1%}", status="REGRESSION" if worse else "ok")
+        rows.append(row)
+    print(f"\n[suite] BayerRG8 {args.width}x{args.height} @ {args.fps} fps -> demosaic -> hiển thị "
+          f"{args.display_fps} fps ({args.display_width}px), {args.duration}s mỗi phần")
+    _print_table(rows, ["metric", "value", "unit", "baseline", "change", "status"])
+    print(f"\n[suite] lỗi giả lập: {injected}; luồng grab đếm dropped={stats['frames_dropped']}, timeouts={timeouts}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k != "func"}, "metrics": metrics}, f,
+                      indent=2)
+        print(f"[suite] đã lưu {args.json}")
+    if args.baseline:
+        print(f"[suite] {regressions} chỉ số xấu đi quá {args.tolerance:.0%} so với {args.baseline}")
+    return 1 if regressions else 0
+
+
+def bench_roi(args):
+    """
+    Chế độ vùng kiểm tra: với camera giới hạn bởi tốc độ đọc sensor (--readout-fps ở full-frame),
+    thời gian set_inspect_region khi đang stream (1 lần restart), frame rate tối đa báo về,
+    FPS grab đo được và băng thông (MB/s) theo vùng/binning.
+    """
+    camera = SimulatedCamera(width=args.width, height=args.height, fps=args.readout_fps, readout_fps=args.readout_fps,
+                             pixel_format="BayerRG8")
+    camera.ExposureTime.Value = args.exposure
+    api = BaslerCameraAPI(camera=camera, convert=True)
+    api.connect()
+    api.start_background_grab()
+    rows = []
+    try:
+        for spec in args.regions:
+            size, _, binning = spec.partition("/")
+            w, h = (int(v) for v in size.split("x"))
+            region = None if (w, h) == (args.width, args.height) else ((args.width - w) // 2, (args.height - h) // 2, w, h)
+            t0 = time.perf_counter()
+            info = api.set_inspect_region(region, binning=int(binning or 1))
+            apply_ms = (time.perf_counter() - t0) * 1e3
+            time.sleep(0.2)
+            written0 = api.get_grab_stats()["frames_written"]
+            time.sleep(args.duration)
+            fps = (api.get_grab_stats()["frames_written"] - written0) / args.duration
+            frame = api.get_latest(copy=False)
+            rows.append({
+                "request": spec,
+                "sensor region": "%dx%d+%d+%d" % (info["region"][2], info["region"][3], *info["region"][:2]),
+                "binning": "%dx%d" % info["binning"],
+                "frame": "%dx%d" % (frame.array.shape[1], frame.array.shape[0]),
+                "apply ms": f"{apply_ms:.1f}",
+                "max fps": f"{info['max_fps']:.1f}",
+                "grab fps": f"{fps:.1f}",
+                "MB/s": f"{fps * frame.array.shape[0] * frame.array.shape[1] / 1e6:.1f}",
+            })
+    finally:
+        api.disconnect()
+    print(f"\n[roi] sensor {args.width}x{args.height}, đọc sensor {args.readout_fps} fps full-frame, "
+          f"exposure {args.exposure:.0f} µs, {args.duration}s mỗi vùng")
+    _print_table(rows, list(rows[0].keys()))
+
+
+def bench_dedup(args):
+    """
+    1) Chi phí ChangeDetector mỗi frame theo độ phân giải và phương pháp.
+    2) Stream gần như tĩnh (cảnh cố định + nhiễu sensor, vật thể di chuyển trong --motion phần frame):
+       ring buffer -> hiển thị (PreviewPipeline.encode) + phân tích (ImageMetrics) ở nhịp --fps, so CPU
+       khi xử lý mọi frame và khi bỏ qua frame trùng; kiểm tra mọi frame có chuyển động đều được xử lý.
+    """
+    rows = []
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split("x"))
+        frame = _synthetic_frame(height, width)
+        for method in ("blocks", "dhash"):
+            det = ChangeDetector(method=method, refresh_interval=0)
+            for _ in range(args.calls):
+                det.update(frame)
+            rows.append({"size": size, "method": method, "ms/frame": f"{det.time_ms / det.frames:.3f}"})
+    print(f"\n[dedup] chi phí ChangeDetector.update ({args.calls} lần)")
+    _print_table(rows, ["size", "method", "ms/frame"])
+
+    width, height = (int(v) for v in args.sizes[0].split("x"))
+    rng = np.random.default_rng(0)
+    scene = _synthetic_frame(height, width).astype(np.int16)
+    noises = [rng.normal(0, args.noise, scene.shape).astype(np.int16) for _ in range(8)]
+    n = args.frames
+    # Các đoạn chuyển động: vật thể 80x80 chạy ngang, tổng cộng ~args.motion số frame
+    motion = np.zeros(n, bool)
+    for start in (n // 4, 2 * n // 3):
+        motion[start:start + int(n * args.motion / 2)] = True
+
+    def make_frame(i):
+        img = scene + noises[i % len(noises)]
+        if motion[i]:
+            x = (i * 12) % (width - 80)
+            img[height // 2 - 40:height // 2 + 40, x:x + 80] = 250
+        return np.clip(img, 0, 255).astype(np.uint8)
+
+    frames = [make_frame(i) for i in range(n)]
+    # Frame có nội dung khác frame trước: đang chuyển động, vật thể vừa biến mất, hoặc frame đầu tiên
+    content_changed = motion | np.concatenate(([True], motion[:-1]))
+    rows = []
+    for mode in ("mọi frame", "bỏ qua frame trùng"):
+        ring = FrameRingBuffer(4)
+        detector = ChangeDetector(threshold=args.threshold, method=args.method, refresh_interval=args.refresh)
+        ring.change_detector = detector if mode != "mọi frame" else None
+        preview = PreviewPipeline(display_width=args.display_width, fps=args.fps)
+        metrics = ImageMetrics()
+        processed = np.zeros(n, bool)
+        last = -1
+        cpu0, wall0 = time.process_time(), time.perf_counter()
+        for i, img in enumerate(frames):
+            seq = ring.write(img)
+            frame = ring.read(seq, copy=False)
+            if not frame.unchanged_since(last):
+                preview.encode(frame.array)
+                metrics.compute(frame.array)
+                processed[i] = True
+                last = frame.seq
+            delay = wall0 + (i + 1) / args.fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        cpu_ms = (time.process_time() - cpu0) * 1e3
+        dedup = ring.change_detector is not None
+        rows.append({
+            "mode": mode,
+            "frames": n,
+            "processed": int(processed.sum()),
+            "skipped": f"{1 - processed.mean():.1%}",
+            "forced refresh": detector.forced if dedup else "",
+            "changed frames processed": f"{processed[content_changed].sum()}/{content_changed.sum()}",
+            "false positives": int((processed & ~content_changed).sum()) - detector.forced if dedup else "",
+            "CPU ms/frame": f"{cpu_ms / n:.2f}",
+            "CPU %": f"{cpu_ms / (n / args.fps * 1e3):.1%}",
+        })
+    saved = 1 - float(rows[1]["CPU ms/frame"]) / float(rows[0]["CPU ms/frame"])
+    print(f"\n[dedup] stream {width}x{height} @ {args.fps} fps gần như tĩnh (nhiễu σ={args.noise}, chuyển động "
+          f"{motion.mean():.0%} frame), {args.method} ngưỡng {args.threshold}, làm mới mỗi {args.refresh}s")
+    _print_table(rows, list(rows[0].keys()))
+    print(f"[dedup] CPU tiết kiệm: {saved:.1%}")
+
+
+def bench_recovery(args):
+    """
+    Rút rồi cắm lại camera giả lập (SimTlFactory.remove_device/add_device) khi đang grab nền, mỗi chế độ
+    --cycles lần, thiết bị vắng --down giây: thời gian phát hiện, từ lúc cắm lại tới frame đầu tiên,
+    số lần thử kết nối (backoff), lỗi/timeout grab trong lúc mất và setting có được ghi lại không.
+      callback: pylon báo OnCameraDeviceRemoved        silent: không callback, chỉ IsCameraDeviceRemoved
+      registry: như callback + DeviceRegistry đánh thức khi thấy thiết bị cắm lại
+      off: auto_reconnect tắt (hành vi cũ, không tự phục hồi)
+    Cuối cùng chạy camera chỉ ngừng gửi (stall) --down giây: không được coi là rút.
+    """
+    serial = "SIM0001"
+    settings = {"ExposureTime": 5000.0, "Gain": 6.0, "Width": args.width // 2, "OffsetX": args.width // 4}
+    backoff = (args.backoff_min, args.backoff_max)
+
+    def open_api(tl, registry, auto_reconnect, telemetry):
+        api = BaslerCameraAPI(tl_factory=tl, registry=registry, convert=True, telemetry=telemetry,
+                              auto_reconnect=auto_reconnect, reconnect_backoff=backoff)
+        assert api.connect(serial)
+        assert api.apply_settings(settings)
+        api.start_background_grab()
+        time.sleep(0.3)
+        return api
+
+    def run(mode):
+        tl = SimTlFactory(serials=(serial,), width=args.width, height=args.height, fps=args.fps,
+                          pixel_format="BayerRG8")
+        registry = None
+        if mode == "registry":
+            registry = DeviceRegistry(tl_factory=tl, ttl=args.refresh_interval, refresh_interval=args.refresh_interval)
+            registry.start()
+        telemetry = Telemetry()
+        api = open_api(tl, registry, mode != "off", telemetry)
+        detect, recover, outage, attempts = [], [], [], []
+        restored = True
+        try:
+            for _ in range(args.cycles):
+                t0 = time.perf_counter()
+                tl.remove_device(serial, notify=mode != "silent")
+                while api.connection_state == "connected" and time.perf_counter() - t0 < args.down:
+                    time.sleep(0.002)
+                detect.append(time.perf_counter() - t0)
+                time.sleep(max(args.down - (time.perf_counter() - t0), 0))
+                seq = api.get_grab_stats()["latest_seq"]
+                t1 = time.perf_counter()
+                tl.add_device(serial)
+                frame = api.get_next(seq, timeout=args.backoff_max * 2 + 1 if mode != "off" else 2.0)
+                if frame is None:
+                    recover.append(None)
+                    break
+                recover.append(frame.host_time - t1)
+                outage.append(frame.host_time - t0)
+                attempts.append(api.connection_stats()["attempts"])
+                camera = api.camera
+                restored &= (frame.array.shape[1] == settings["Width"]
+                             and camera.ExposureTime.Value == settings["ExposureTime"]
+                             and camera.Gain.Value == settings["Gain"])
+        finally:
+            stats = api.connection_stats()
+            errors = (telemetry.counter("grab_errors", camera=serial).get()
+                      + telemetry.counter("grab_timeouts", camera=serial).get())
+            api.disconnect()
+            if registry is not None:
+                registry.stop()
+        recovered = [r for r in recover if r is not None]
+        return {
+            "mode": mode,
+            "detect ms": f"{np.median(detect) * 1e3:.1f}",
+            "plug->frame ms": f"{np.median(recovered) * 1e3:.0f}" if len(recovered) == len(recover) else "never",
+            "outage ms": f"{np.median(outage) * 1e3:.0f}" if outage else "-",
+            "attempts/outage": f"{np.median(attempts):.0f}" if attempts else "-",
+            "reconnects": stats["reconnects"],
+            "grab err+timeout": errors,
+            "settings restored": "yes" if recovered and restored else "no",
+        }
+
+    rows = [run(mode) for mode in args.modes]
+    print(f"\n[recovery] {args.width}x{args.height} @ {args.fps} fps, thiết bị vắng {args.down}s x {args.cycles} lần, "
+          f"backoff {args.backoff_min}-{args.backoff_max}s, enumerate nền {args.refresh_interval}s (registry)")
+    _print_table(rows, list(rows[0].keys()))
+
+    # Camera ngừng gửi (vd. chờ trigger ngoài, mạng nghẽn) nhưng vẫn còn: chỉ là timeout, không kết nối lại
+    tl = SimTlFactory(serials=(serial,), width=args.width, height=args.height, fps=args.fps, pixel_format="BayerRG8",
+                      stall_rate=1.0 / (args.fps * args.down), stall_ms=args.down * 1000, seed=1)
+    telemetry = Telemetry()
+    api = open_api(tl, None, True, telemetry)
+    deadline = time.perf_counter() + args.down * args.cycles * 3
+    while api.camera.injected["stalls"] < args.cycles and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    time.sleep(args.down + 0.5)  # lần ngừng gửi cuối kết thúc, frame chạy lại
+    stats = api.connection_stats()
+    stalls = api.camera.injected["stalls"]
+    timeouts = telemetry.counter("grab_timeouts", camera=serial).get()
+    api.disconnect()
+    print(f"[recovery] stall {args.down}s: {stalls} lần ngừng gửi, {timeouts} timeout, "
+          f"lost={stats['lost']} reconnects={stats['reconnects']} (phải là 0)")
+    return 0 if stats["lost"] == 0 and all(r["plug->frame ms"] != "never" for r in rows if r["mode"] != "off") else 1
+
+
+# Chạy trong process con mới (cwd = thư mục app): chỉ import streamlit để module của app được import
+# "lạnh" và không lẫn với module Benchmark.py đã nạp; nhờ vậy đo được cả bản app khác (--apps)
+_STARTUP_CHILD = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+
+events = []
+_enqueue = ScriptRunContext.enqueue
+def enqueue(self, msg):
+    events.append((time.perf_counter(), msg.ByteSize(), msg.WhichOneof("type") == "delta"
+                   and msg.delta.WhichOneof("type") == "new_element"))
+    return _enqueue(self, msg)
+ScriptRunContext.enqueue = enqueue
+
+def run(at):
+    events.clear()
+    t0 = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - t0
+    paint = next((t for t, _, element in events if element), None)
+    return {"ms": elapsed * 1e3, "ttfp_ms": None if paint is None else (paint - t0) * 1e3,
+            "bytes": sum(size for _, size, _ in events)}
+
+app, reruns = sys.argv[1], int(sys.argv[2])
+at = AppTest.from_file(app, default_timeout=60)
+first = run(at)
+assert not at.exception, [e.value for e in at.exception]
+rest = [run(at) for _ in range(reruns)]
+phases = {}
+try:
+    from Telemetry import TELEMETRY
+    for row in TELEMETRY.snapshot():
+        if row["metric"] == "app_phase":
+            phases[row["labels"]] = row["avg_ms"]
+except ImportError:
+    pass
+print(json.dumps({"first": first, "reruns": rest, "phases": phases}))
+"""
+
+
+def bench_startup(args):
+    """
+    Khởi động lạnh và rerun của mainWebUI (AppTest, camera giả lập, không server MJPEG), mỗi lần trong
+    1 process mới: thời gian lần chạy đầu, time-to-first-paint (tới phần tử giao diện đầu tiên được gửi),
+    thời gian server và số byte ForwardMsg mỗi rerun. --apps nhận nhiều đường dẫn mainWebUI.py
+    (vd. 1 bản checkout cũ) để so sánh; các chặng của PhaseProfiler (PROFILE=1) in kèm nếu app có.
+    """
+    env = dict(os.environ, CAMERA_BACKEND="sim", MJPEG_PORT="0", PROFILE="1", LOG_LEVEL="WARNING",
+               SIM_ENUMERATE_DELAY=str(args.enumerate_delay))
+    rows = []
+    phases = {}
+    for app in args.apps:
+        app = os.path.abspath(app)
+        results = []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, "-c", _STARTUP_CHILD, app, str(args.reruns)], cwd=os.path.dirname(app),
+                                 env=env, capture_output=True, text=True, timeout=300)
+            if out.returncode != 0:
+                print(out.stderr[-2000:])
+                return 1
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        first = [r["first"] for r in results]
+        reruns = [x for r in results for x in r["reruns"]]
+        rerun_ms = np.array([x["ms"] for x in reruns])
+        rows.append({
+            "app": os.path.relpath(app),
+            "cold run ms": f"{np.median([f['ms'] for f in first]):.1f}",
+            "cold first paint ms": f"{np.median([f['ttfp_ms'] for f in first]):.1f}",
+            "cold KB": f"{np.median([f['bytes'] for f in first]) / 1e3:.1f}",
+            "rerun ms": f"{np.median(rerun_ms):.2f}",
+            "rerun p95 ms": f"{np.percentile(rerun_ms, 95):.2f}",
+            "rerun first paint ms": f"{np.median([x['ttfp_ms'] for x in reruns]):.2f}",
+            "rerun KB": f"{np.median([x['bytes'] for x in reruns]) / 1e3:.2f}",
+        })
+        phases[rows[-1]["app"]] = results[-1]["phases"]
+    print(f"\n[startup] {args.runs} process x (1 lần chạy lạnh + {args.reruns} rerun), "
+          f"EnumerateDevices giả lập {args.enumerate_delay * 1e3:.0f} ms")
+    _print_table(rows, list(rows[0].keys()))
+    for app, app_phases in phases.items():
+        if app_phases:
+            print(f"\n[startup] chặng (PROFILE=1, trung bình ms) - {app}")
+            prof_rows = [dict(zip(("kind", "phase"), (v.split("=")[1] for v in labels.split(", "))), avg_ms=ms)
+                         for labels, ms in sorted(app_phases.items())]
+            _print_table(prof_rows, ["kind", "phase", "avg_ms"])
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BaslerCam_Streamlit với camera giả lập")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("memory", help="Cấp phát bộ nhớ và RSS mỗi frame")
+    p.add_argument("--width", type=int, default=2448)
+    p.add_argument("--height", type=int, default=2048)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--frames", type=int, default=150)
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser("multicam", help="Thông lượng tổng theo số camera")
+    p.add_argument("--cameras", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--width", type=int, default=2448)
+    p.add_argument("--height", type=int, default=2048)
+    p.add_argument("--fps", type=float, default=60.0)
+    p.add_argument("--duration", type=float, default=2.0)
+    p.set_defaults(func=bench_multicam)
+
+    p = sub.add_parser("stream", help="Encode JPEG/PNG và MJPEG end-to-end")
+    p.add_argument("--width", type=int, default=1280)
+    p.add_argument("--height", type=int, default=720)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--frames", type=int, default=30)
+    p.add_argument("--quality", type=int, nargs="+", default=[80, 60])
+    p.add_argument("--max-width", type=int, nargs="+", default=[1280, 640])
+    p.add_argument("--max-fps", type=float, default=30.0)
+    p.add_argument("--duration", type=float, default=3.0)
+    p.set_defaults(func=bench_stream)
+
+    p = sub.add_parser("preview", help="Pipeline xem trước: downscale + quality thích nghi")
+    p.add_argument("--width", type=int, default=2448)
+    p.add_argument("--height", type=int, default=2048)
+    p.add_argument("--display-width", type=int, default=960)
+    p.add_argument("--format", default="JPEG")
+    p.add_argument("--bitrate", type=float, default=8e6)
+    p.add_argument("--fps", type=float, default=15.0)
+    p.add_argument("--frames", type=int, default=20)
+    p.set_defaults(func=bench_preview)
+
+    p = sub.add_parser("record", help="Tốc độ ghi raw memory-mapped bền vững")
+    p.add_argument("--width", type=int, default=2448)
+    p.add_argument("--height", type=int, default=2048)
+    p.add_argument("--fps", type=float, default=60.0)
+    p.add_argument("--duration", type=float, default=5.0)
+    p.add_argument("--workers", type=int, default=2)
+    p.add_argument("--buffers", type=int, default=16)
+    p.add_argument("--dir", default=None)
+    p.add_argument("--keep", action="store_true", help="Giữ lại file sau khi đo")
+    p.set_defaults(func=bench_record)
+
+    p = sub.add_parser("metrics", help="Thời gian tính chỉ số chất lượng ảnh theo độ phân giải")
+    p.add_argument("--sizes", nargs="+", default=["640x480", "1280x720", "1920x1200", "2448x2048", "4096x3000"])
+    p.add_argument("--frames", type=int, default=30)
+    p.add_argument("--samples", type=int, default=1 << 17)
+    p.add_argument("--budget-ms", type=float, default=5.0)
+    p.set_defaults(func=bench_metrics)
+
+    p = sub.add_parser("autotune", help="Số frame/thời gian để AutoTuner hội tụ exposure/gain")
+    p.add_argument("--width", type=int, default=1280)
+    p.add_argument("--height", type=int, default=720)
+    p.add_argument("--fps", type=float, default=60.0)
+    p.add_argument("--target", type=float, default=0.45)
+    p.add_argument("--settle", type=int, nargs="+", default=[0, 2])
+    p.add_argument("--min-fps", type=float, default=20.0)
+    p.add_argument("--refine", action="store_true", help="Thêm bước golden-section trên sharpness")
+    p.set_defaults(func=bench_autotune)
+
+    p = sub.add_parser("analysis", help="Worker phân tích/agent: submit không chặn, gộp job cũ")
+    p.add_argument("--width", type=int, default=2448)
+    p.add_argument("--height", type=int, default=2048)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--duration", type=float, default=3.0)
+    p.add_argument("--agent-delay", type=float, default=0.2)
+    p.add_argument("--processes", type=int, default=1)
+    p.set_defaults(func=bench_analysis)
+
+    p = sub.add_parser("viewers", help="Nhiều phiên xem chung 1 camera qua CameraService")
+    p.add_argument("--viewers", type=int, nargs="+", default=[1, 4, 16])
+    p.add_argument("--width", type=int, default=1280)
+    p.add_argument("--height", type=int, default=720)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--duration", type=float, default=3.0)
+    p.add_argument("--max-latency-ms", type=float, default=50.0, help="p95 độ trễ frame -> viewer tối đa")
+    p.set_defaults(func=bench_viewers)
+
+    p = sub.add_parser("discovery", help="Độ trễ rerun/kết nối khi enumerate chậm và sự kiện cắm/rút")
+    p.add_argument("--enumerate-delay", type=float, default=0.5)
+    p.add_argument("--reruns", type=int, default=20)
+    p.add_argument("--ttl", type=float, default=5.0)
+    p.add_argument("--refresh-interval", type=float, default=1.0)
+    p.set_defaults(func=bench_discovery)
+
+    p = sub.add_parser("telemetry", help="Chi phí đo đạc mỗi frame và số liệu /metrics end-to-end")
+    p.add_argument("--width", type=int, default=1280)
+    p.add_argument("--height", type=int, default=720)
+    p.add_argument("--fps", type=float, default=60.0)
+    p.add_argument("--max-fps", type=float, default=30.0)
+    p.add_argument("--duration", type=float, default=3.0)
+    p.add_argument("--calls", type=int, default=200000)
+    p.set_defaults(func=bench_telemetry)
+
+    p = sub.add_parser("convert", help="Thông lượng chuyển đổi PixelFormat (demosaic/giải nén) và trong luồng grab")
+    p.add_argument("--sizes", nargs="+", default=["1280x720", "2448x2048"])
+    p.add_argument("--frames", type=int, default=20)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--duration", type=float, default=2.0)
+    p.set_defaults(func=bench_convert)
+
+    p = sub.add_parser("roi", help="Vùng kiểm tra ROI/binning: frame rate tối đa, FPS grab và chi phí đổi vùng")
+    p.add_argument("--width", type=int, default=1920)
+    p.add_argument("--height", type=int, default=1200)
+    p.add_argument("--readout-fps", type=float, default=30.0)
+    p.add_argument("--exposure", type=float, default=2000.0)
+    p.add_argument("--regions", nargs="+", default=["1920x1200", "960x600", "480x300", "1920x1200/2", "960x600/2"],
+                   help="WxH[/binning], vùng đặt giữa sensor")
+    p.add_argument("--duration", type=float, default=1.0)
+    p.set_defaults(func=bench_roi)
+
+    p = sub.add_parser("dedup", help="ChangeDetector: chi phí và CPU tiết kiệm trên stream gần như tĩnh")
+    p.add_argument("--sizes", nargs="+", default=["1280x720", "2448x2048"])
+    p.add_argument("--calls", type=int, default=200)
+    p.add_argument("--frames", type=int, default=150)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--motion", type=float, default=0.2, help="Tỉ lệ frame có chuyển động")
+    p.add_argument("--noise", type=float, default=4.0)
+    p.add_argument("--method", default="blocks", choices=["blocks", "dhash"])
+    p.add_argument("--threshold", type=float, default=6.0)
+    p.add_argument("--refresh", type=float, default=2.0)
+    p.add_argument("--display-width", type=int, default=1280)
+    p.set_defaults(func=bench_dedup)
+
+    p = sub.add_parser("recovery", help="Rút/cắm lại camera khi đang stream: phát hiện, kết nối lại, ghi lại setting")
+    p.add_argument("--width", type=int, default=1280)
+    p.add_argument("--height", type=int, default=720)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--cycles", type=int, default=3)
+    p.add_argument("--down", type=float, default=2.0, help="Số giây thiết bị vắng mặt mỗi lần rút")
+    p.add_argument("--backoff-min", type=float, default=0.1)
+    p.add_argument("--backoff-max", type=float, default=5.0)
+    p.add_argument("--refresh-interval", type=float, default=0.2, help="Chu kỳ enumerate nền của DeviceRegistry")
+    p.add_argument("--modes", nargs="+", default=["callback", "silent", "registry", "off"],
+                   choices=["callback", "silent", "registry", "off"])
+    p.set_defaults(func=bench_recovery)
+
+    p = sub.add_parser("startup", help="Khởi động lạnh, time-to-first-paint và thời gian/byte mỗi rerun của mainWebUI")
+    p.add_argument("--apps", nargs="+", default=[os.path.join(os.path.dirname(os.path.abspath(__file__)), "mainWebUI.py")])
+    p.add_argument("--runs", type=int, default=3, help="Số process khởi động lạnh mỗi app")
+    p.add_argument("--reruns", type=int, default=20)
+    p.add_argument("--enumerate-delay", type=float, default=0.0)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("suite", help="Bộ đo hồi quy end-to-end vòng mainWebUI (JSON + so baseline)")
+    p.add_argument("--width", type=int, default=1280)
+    p.add_argument("--height", type=int, default=720)
+    p.add_argument("--fps", type=float, default=30.0)
+    p.add_argument("--display-fps", type=float, default=15.0)
+    p.add_argument("--display-width", type=int, default=1280)
+    p.add_argument("--duration", type=float, default=3.0)
+    p.add_argument("--warmup", type=float, default=0.5)
+    p.add_argument("--writes", type=int, default=50)
+    p.add_argument("--roi-changes", type=int, default=6)
+    p.add_argument("--memory-frames", type=int, default=30)
+    p.add_argument("--drop-rate", type=float, default=0.02)
+    p.add_argument("--lost-rate", type=float, default=0.02)
+    p.add_argument("--stall-rate", type=float, default=0.02)
+    p.add_argument("--stall-ms", type=float, default=250.0)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", default=None, help="Lưu kết quả ra file JSON")
+    p.add_argument("--baseline", default=None, help="File JSON của lần chạy trước để so sánh")
+    p.add_argument("--tolerance", type=float, default=0.25, help="Lệch tương đối cho phép trước khi báo REGRESSION")
+    p.set_defaults(func=bench_suite)
+
+    for p in sub.choices.values():
+        p.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    raise SystemExit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
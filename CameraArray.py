@@ -0,0 +1,125 @@
+# CameraArray.py
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from BaslerAPI import BaslerCameraAPI
+
+logger = logging.getLogger(__name__)
+
+
+class FrameSet:
+    """
+    Bộ frame đồng bộ của nhiều camera: {serial: Frame}, kèm mốc thời gian tham chiếu
+    và độ lệch lớn nhất giữa các frame (giây).
+    """
+    def __init__(self, frames, reference, spread):
+        self.frames = frames
+        self.reference = reference
+        self.spread = spread
+
+    def __getitem__(self, serial):
+        return self.frames[serial]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __repr__(self):
+        return f"FrameSet(serials={list(self.frames)}, spread={self.spread * 1000:.2f} ms)"
+
+
+class CameraArray:
+    """
+    Quản lý N camera Basler stream song song.
+
+    Mỗi camera có 1 BaslerCameraAPI với luồng grab nền và ring buffer riêng.
+    pypylon nhả GIL trong lúc RetrieveResult/copy buffer nên thông lượng tổng
+    tăng theo số camera thay vì dồn qua 1 vòng lặp Python.
+    """
+    def __init__(self, api_factory=None):
+        """
+        api_factory: hàm nhận serial, trả về BaslerCameraAPI (mặc định BaslerCameraAPI()).
+        Dùng để gắn camera giả lập khi chạy thử.
+        """
+        self._api_factory = api_factory or (lambda serial: BaslerCameraAPI())
+        self.cameras = {}
+
+    @property
+    def serials(self):
+        return list(self.cameras.keys())
+
+    def connect(self, serials):
+        """
+        Kết nối song song tới danh sách serial. Trả về dict {serial: True/False}.
+        Camera kết nối lỗi không được giữ lại trong mảng.
+        """
+        serials = [str(s) for s in serials]
+
+        def _connect(serial):
+            api = self.cameras.get(serial) or self._api_factory(serial)
+            return serial, api, api.connect(serial=serial)
+
+        result = {}
+        with ThreadPoolExecutor(max_workers=max(len(serials), 1)) as pool:
+            for serial, api, ok in pool.map(_connect, serials):
+                result[serial] = ok
+                if ok:
+                    self.cameras[serial] = api
+                else:
+                    logger.warning("Không kết nối được camera %s", serial)
+        return result
+
+    def disconnect(self):
+        for api in self.cameras.values():
+            api.disconnect()
+        self.cameras = {}
+
+    def start(self, buffer_size=8, timeout=100):
+        """Bắt đầu grab nền trên tất cả camera."""
+        for api in self.cameras.values():
+            api.start_background_grab(buffer_size=buffer_size, timeout=timeout)
+
+    def stop(self):
+        for api in self.cameras.values():
+            api.stop_background_grab()
+            api.stop_stream()
+
+    def get_latest(self, serial=None, copy=True):
+        """
+        Frame mới nhất của 1 camera (nếu có serial) hoặc dict {serial: Frame|None} của tất cả.
+        """
+        if serial is not None:
+            return self.cameras[str(serial)].get_latest(copy=copy)
+        return {s: api.get_latest(copy=copy) for s, api in self.cameras.items()}
+
+    def get_frame_set(self, tolerance=0.010, clock="host", tick_rate=1e9, timeout=0.5, copy=True):
+        """
+        Lấy 1 bộ frame đồng bộ: mỗi camera 1 frame, lệch nhau không quá `tolerance` giây.
+
+        clock="host"  : ghép theo thời điểm host nhận frame (mặc định, không cần đồng bộ đồng hồ)
+        clock="camera": ghép theo TimeStamp của camera (chỉ đúng khi các camera đã đồng bộ PTP),
+                        `tick_rate` là số tick/giây của TimeStamp.
+        Thử lại tới khi hết `timeout`; trả về FrameSet hoặc None.
+        """
+        key = "host_time" if clock == "host" else "timestamp"
+        scale = 1.0 if clock == "host" else 1.0 / tick_rate
+        deadline = time.perf_counter() + timeout
+        while True:
+            latest = self.get_latest(copy=False)
+            if latest and all(f is not None for f in latest.values()):
+                # Mốc tham chiếu = frame mới nhất của camera chậm nhất
+                reference = min(getattr(f, key) for f in latest.values())
+                frames = {}
+                for serial, api in self.cameras.items():
+                    frames[serial] = api.get_nearest(reference, key=key, copy=copy)
+                if all(f is not None for f in frames.values()):
+                    values = [getattr(f, key) * scale for f in frames.values()]
+                    spread = max(values) - min(values)
+                    if spread <= tolerance:
+                        return FrameSet(frames, reference * scale, spread)
+            if time.perf_counter() >= deadline:
+                return None
+            time.sleep(0.001)
+
+    def stats(self):
+        """Thống kê grab nền của từng camera: {serial: dict}."""
+        return {s: api.get_grab_stats() for s, api in self.cameras.items()}
@@ -0,0 +1,243 @@
+# CameraService.py
+# Dịch vụ camera dùng chung cho cả process Streamlit (tạo 1 lần qua st.cache_resource):
+# mỗi camera vật lý chỉ được mở 1 lần dù có nhiều tab/phiên trình duyệt.
+import threading
+import time
+import uuid
+import weakref
+from BaslerAPI import BaslerCameraAPI
+from ChangeDetector import ChangeDetector
+
+
+class CameraService:
+    """
+    Giữ 1 BaslerCameraAPI cho mỗi serial. Kết nối và stream được đếm theo viewer:
+    camera chỉ bị ngắt/dừng grab khi viewer cuối cùng rời đi, nên phiên này tắt stream
+    không làm mất hình của phiên khác. Frame được phát cho mọi viewer qua ring buffer
+    của luồng grab nền; mỗi viewer giữ con trỏ seq riêng (CameraHandle) nên viewer chậm
+    không làm chậm camera hay viewer khác.
+    """
+    def __init__(self, api_factory=None, registry=None, change_detector_factory=ChangeDetector, stream_server=None):
+        # api_factory(serial) -> BaslerCameraAPI chưa kết nối (vd. dùng SimulatedCamera khi thử).
+        # Mặc định bật chuyển đổi PixelFormat trong luồng grab: mọi viewer dùng chung frame 8-bit đã demosaic,
+        # và đánh dấu frame trùng (cảnh tĩnh, change_detector_factory() -> ChangeDetector|None cho mỗi camera)
+        # để viewer bỏ qua encode/phân tích lại. Camera bị rút thì tự kết nối lại, viewer giữ nguyên handle.
+        self._api_factory = api_factory or (lambda serial: BaslerCameraAPI(
+            registry=registry, convert=True, auto_reconnect=True,
+            change_detection=change_detector_factory() if change_detector_factory is not None else None))
+        # DeviceRegistry.DeviceRegistry: danh sách camera cache, None = enumerate mỗi lần gọi
+        self.registry = registry
+        # StreamServer.MjpegStreamServer: mỗi camera đang mở có 1 luồng /stream.mjpg?serial=<serial> riêng
+        self.stream_server = stream_server
+        self._lock = threading.RLock()
+        self._cameras = {}  # serial -> {"api", "viewers": set, "streamers": set, "ready": Event, "ok": bool}
+
+    def list_cameras(self):
+        if self.registry is not None:
+            return self.registry.list_cameras()
+        return BaslerCameraAPI.list_cameras()
+
+    def cameras_version(self):
+        """Tăng mỗi khi danh sách camera đổi (DeviceRegistry.version); None = không theo dõi được."""
+        return self.registry.version if self.registry is not None else None
+
+    def viewer(self, viewer_id=None):
+        """Tạo handle cho 1 phiên (lưu trong st.session_state)."""
+        return CameraHandle(self, viewer_id)
+
+    def get_api(self, serial):
+        entry = self._cameras.get(serial)
+        return None if entry is None else entry["api"]
+
+    def open(self, serial, viewer_id):
+        """
+        Kết nối camera `serial` cho viewer (chỉ mở thiết bị ở viewer đầu tiên). Trả về api hoặc None.
+        Mở thiết bị (GigE: vài giây) diễn ra ngoài khoá của service: chỉ giữ chỗ rồi công bố kết quả
+        dưới khoá, nên phiên khác vẫn tạo/gỡ viewer và dùng các camera đã mở trong lúc chờ.
+        Viewer khác mở cùng serial trong lúc đó chờ lần kết nối đang chạy thay vì mở lại.
+        """
+        with self._lock:
+            entry = self._cameras.get(serial)
+            opener = entry is None
+            if opener:
+                entry = {"api": self._api_factory(serial), "viewers": set(), "streamers": set(),
+                         "ready": threading.Event(), "ok": False}
+                self._cameras[serial] = entry
+            entry["viewers"].add(viewer_id)
+        api = entry["api"]
+        if opener:
+            connected = ok = api.connect(serial=serial)
+            with self._lock:
+                if ok and not entry["viewers"]:
+                    ok = False  # mọi viewer đã rời đi trong lúc kết nối
+                entry["ok"] = ok
+                if ok:
+                    if self.stream_server is not None:
+                        self.stream_server.add_source(serial, api.get_next, pixel_format=lambda: api.frame_format)
+                elif self._cameras.get(serial) is entry:
+                    del self._cameras[serial]
+                entry["ready"].set()
+            if connected and not ok:
+                api.disconnect()
+        else:
+            entry["ready"].wait()
+        if not entry["ok"]:
+            with self._lock:
+                entry["viewers"].discard(viewer_id)
+            return None
+        return api
+
+    def close(self, serial, viewer_id):
+        """Viewer rời camera; viewer cuối cùng thì ngắt kết nối thiết bị."""
+        with self._lock:
+            entry = self._cameras.get(serial)
+            if entry is None:
+                return
+            if not entry["ready"].is_set():
+                # Đang kết nối: open() tự ngắt nếu không còn viewer nào khi kết nối xong
+                entry["viewers"].discard(viewer_id)
+                return
+            self.stop_stream(serial, viewer_id)
+            entry["viewers"].discard(viewer_id)
+            if not entry["viewers"]:
+                if self.stream_server is not None:
+                    self.stream_server.remove_source(serial)
+                entry["api"].disconnect()
+                del self._cameras[serial]
+
+    def start_stream(self, serial, viewer_id):
+        """Bắt đầu grab nền (1 lần cho mọi viewer) và ghi nhận viewer đang xem stream."""
+        with self._lock:
+            entry = self._cameras[serial]
+            api = entry["api"]
+            if not api.is_background_grabbing:
+                # Stream dùng freerun; nếu trước đó Capture đã bật software trigger thì tắt đi
+                if api.trigger_source is not None:
+                    api.set_trigger_mode(None)
+                api.start_background_grab()
+            entry["streamers"].add(viewer_id)
+
+    def stop_stream(self, serial, viewer_id):
+        """Viewer thôi xem stream; chỉ dừng grab nền khi không còn ai xem."""
+        with self._lock:
+            entry = self._cameras.get(serial)
+            if entry is None or viewer_id not in entry["streamers"]:
+                return
+            entry["streamers"].discard(viewer_id)
+            if not entry["streamers"]:
+                entry["api"].stop_stream()
+
+    def release_viewer(self, viewer_id):
+        """Gỡ viewer khỏi mọi camera (gọi khi phiên trình duyệt kết thúc)."""
+        with self._lock:
+            for serial in [s for s, e in self._cameras.items() if viewer_id in e["viewers"]]:
+                self.close(serial, viewer_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                serial: {
+                    "viewers": len(entry["viewers"]),
+                    "streamers": len(entry["streamers"]),
+                    "connection": entry["api"].connection_state,
+                    **entry["api"].get_grab_stats(),
+                }
+                for serial, entry in self._cameras.items() if entry["ready"].is_set()
+            }
+
+
+class CameraHandle:
+    """
+    Góc nhìn của 1 phiên lên camera dùng chung. connect/disconnect/start_stream/stop_stream
+    đi qua CameraService (đếm tham chiếu); mọi thuộc tính khác chuyển thẳng tới
+    BaslerCameraAPI của camera đang chọn, nên VisionUI dùng handle như 1 camera_api.
+    Khi phiên bị huỷ (handle bị thu gom) viewer tự được gỡ khỏi service.
+    """
+    def __init__(self, service, viewer_id=None):
+        self.service = service
+        self.viewer_id = viewer_id or uuid.uuid4().hex
+        self.serial = None
+        self._idle_api = None
+        self._last_seq = -1
+        # Thống kê phía viewer
+        self.frames = 0
+        self.frames_skipped = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        weakref.finalize(self, service.release_viewer, self.viewer_id)
+
+    @property
+    def api(self):
+        api = self.service.get_api(self.serial) if self.serial is not None else None
+        if api is None:
+            # Chưa kết nối: API rỗng để các lời gọi như frame_format/get_next() trả về None
+            if self._idle_api is None:
+                self._idle_api = BaslerCameraAPI()
+            api = self._idle_api
+        return api
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.api, name)
+
+    @property
+    def is_connected(self):
+        return self.serial is not None and self.api.is_connected
+
+    def list_cameras(self):
+        return self.service.list_cameras()
+
+    @property
+    def cameras_version(self):
+        return self.service.cameras_version()
+
+    def connect(self, serial=None):
+        if self.serial is not None:
+            if self.serial == serial or serial is None:
+                return True
+            self.disconnect()
+        if self.service.open(serial, self.viewer_id) is None:
+            return False
+        self.serial = serial
+        self._last_seq = -1
+        return True
+
+    def disconnect(self):
+        if self.serial is not None:
+            self.service.close(self.serial, self.viewer_id)
+            self.serial = None
+
+    def start_stream(self):
+        if self.serial is None:
+            raise RuntimeError("Camera chưa kết nối!")
+        self.service.start_stream(self.serial, self.viewer_id)
+
+    def stop_stream(self):
+        if self.serial is not None:
+            self.service.stop_stream(self.serial, self.viewer_id)
+
+    def next_frame(self, timeout=0.0, copy=True, out=None):
+        """
+        Frame mới nhất mà viewer này chưa xem (con trỏ seq riêng), None nếu chưa có frame mới.
+        Viewer chậm chỉ bỏ qua frame cũ, không giữ lại camera hay viewer khác.
+        """
+        frame = self.api.get_next(self._last_seq, timeout=timeout, copy=copy, out=out, newest=True)
+        if frame is None:
+            return None
+        if self._last_seq >= 0:
+            self.frames_skipped += max(frame.seq - self._last_seq - 1, 0)
+        self._last_seq = frame.seq
+        latency = time.perf_counter() - frame.host_time
+        self.frames += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        return frame
+
+    def viewer_stats(self):
+        return {
+            "frames": self.frames,
+            "frames_skipped": self.frames_skipped,
+            "latency_avg_ms": round(self.latency_total / self.frames * 1e3, 3) if self.frames else 0.0,
+            "latency_max_ms": round(self.latency_max * 1e3, 3),
+        }
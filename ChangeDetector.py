@@ -0,0 +1,137 @@
+# ChangeDetector.py
+# Phát hiện frame không đổi (cảnh tĩnh) để hiển thị/encode/phân tích bỏ qua việc lặp lại.
+# Chạy trong luồng grab trên lưới lấy mẫu thưa của frame (không copy), < 0.5 ms/frame mọi độ phân giải.
+import time
+import numpy as np
+from PixelConverter import bit_depth, sample_step
+
+
+class ChangeDetector:
+    """
+    So frame mới với frame tham chiếu (frame thay đổi gần nhất) qua chữ ký rẻ tiền:
+      - "blocks": lấy mẫu cách đều ~target_samples điểm, chia lưới grid ô và lấy trung bình
+        từng ô; thay đổi khi có ô lệch quá `threshold` mức xám (thang 8-bit). Trung bình nhiều
+        điểm nên nhiễu sensor gần như không vượt ngưỡng, còn vật thể cỡ 1 ô vẫn bắt được.
+      - "dhash": difference hash 8x8 (ô sáng hơn ô bên phải hay không); thay đổi khi khoảng cách
+        Hamming > `hash_bits`. Bền với đổi sáng toàn cục, kém nhạy với thay đổi nhỏ.
+    refresh_interval: quá số giây này kể từ lần thay đổi gần nhất thì coi như thay đổi (làm mới
+    tham chiếu, bắt trôi chậm); 0 = không ép.
+    """
+    def __init__(self, threshold=6.0, grid=(24, 32), method="blocks", hash_bits=3, refresh_interval=2.0,
+                 target_samples=1 << 16, pixel_format=None):
+        if method not in ("blocks", "dhash"):
+            raise ValueError("method phải là 'blocks' hoặc 'dhash'")
+        self.threshold = float(threshold)
+        self.grid = tuple(grid)
+        self.method = method
+        self.hash_bits = int(hash_bits)
+        self.refresh_interval = float(refresh_interval)
+        self.target_samples = int(target_samples)
+        self.pixel_format = pixel_format
+        self._reference = None
+        self._reference_time = 0.0
+        # Thống kê
+        self.frames = 0
+        self.changed = 0
+        self.forced = 0
+        self.time_ms = 0.0
+
+    def reset(self):
+        """Bỏ tham chiếu: frame kế tiếp luôn được coi là thay đổi (vd. sau khi đổi ROI/PixelFormat)."""
+        self._reference = None
+
+    def _plane(self, array):
+        """Lưới lấy mẫu 1 kênh (kênh G với ảnh màu), float32 thang 8-bit."""
+        h, w = array.shape[:2]
+        step = sample_step(h, w, self.target_samples, even=array.ndim == 2)
+        plane = array[::step, ::step, 1] if array.ndim == 3 else array[::step, ::step]
+        plane = plane.astype(np.float32)
+        if array.dtype != np.uint8:
+            plane *= 255.0 / ((1 << bit_depth(self.pixel_format)) - 1)
+        return plane
+
+    @staticmethod
+    def _block_means(plane, rows, cols):
+        rows, cols = min(rows, plane.shape[0]), min(cols, plane.shape[1])
+        bh, bw = plane.shape[0] // rows, plane.shape[1] // cols
+        return plane[:rows * bh, :cols * bw].reshape(rows, bh, cols, bw).mean(axis=(1, 3))
+
+    def signature(self, array):
+        """Chữ ký của frame: trung bình các ô (blocks) hoặc 64 bit dhash (mảng bool)."""
+        plane = self._plane(array)
+        if self.method == "blocks":
+            return self._block_means(plane, *self.grid)
+        means = self._block_means(plane, 8, 9)
+        return (means[:, 1:] > means[:, :-1]).ravel()
+
+    def distance(self, a, b):
+        """Lệch giữa 2 chữ ký: mức xám lớn nhất của 1 ô (blocks) hoặc số bit khác nhau (dhash)."""
+        if a.shape != b.shape:
+            return float("inf")
+        if self.method == "blocks":
+            return float(np.abs(a - b).max())
+        return float(np.count_nonzero(a != b))
+
+    def update(self, array, now=None):
+        """
+        Kiểm tra frame mới. Trả về True nếu frame khác tham chiếu (hoặc tới hạn refresh_interval),
+        khi đó frame này thành tham chiếu mới; False nếu coi như trùng frame trước.
+        """
+        t0 = time.perf_counter()
+        now = t0 if now is None else now
+        sig = self.signature(array)
+        ref = self._reference
+        limit = self.threshold if self.method == "blocks" else self.hash_bits
+        changed = ref is None or self.distance(sig, ref) > limit
+        if not changed and self.refresh_interval and now - self._reference_time >= self.refresh_interval:
+            changed = True
+            self.forced += 1
+        if changed:
+            self._reference = sig
+            self._reference_time = now
+            self.changed += 1
+        self.frames += 1
+        self.time_ms += (time.perf_counter() - t0) * 1e3
+        return changed
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "changed": self.changed,
+            "forced": self.forced,
+            "unchanged": self.frames - self.changed,
+            "skipped_fraction": round((self.frames - self.changed) / self.frames, 4) if self.frames else 0.0,
+            "avg_ms": round(self.time_ms / self.frames, 4) if self.frames else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    # Tự kiểm tra: python ChangeDetector.py
+    rng = np.random.default_rng(0)
+    h, w = 720, 1280
+    yy, xx = np.mgrid[0:h, 0:w]
+    scene = (128 + 60 * np.sin(xx / 37.0) * np.cos(yy / 23.0)).astype(np.float32)
+
+    def noisy(img):
+        return np.clip(img + rng.normal(0, 6, img.shape), 0, 255).astype(np.uint8)
+
+    for method in ("blocks", "dhash"):
+        det = ChangeDetector(method=method, refresh_interval=0)
+        assert det.update(noisy(scene), now=0.0)
+        static = [det.update(noisy(scene), now=i * 0.03) for i in range(1, 30)]
+        assert not any(static), (method, "nhiễu sensor bị coi là thay đổi")
+        moved = scene.copy()
+        moved[300:400, 600:720] = 255  # vật thể 120x100 px xuất hiện
+        detected = det.update(noisy(moved), now=1.0)
+        assert detected or method == "dhash", method  # dhash chỉ bắt thay đổi đủ lớn để đảo thứ tự sáng các ô
+        print(f"{method:6s} OK  vật thể nhỏ: {'có' if detected else 'không'} phát hiện, {det.stats()}")
+
+    det = ChangeDetector(refresh_interval=0.5)
+    det.update(noisy(scene), now=0.0)
+    assert not det.update(noisy(scene), now=0.2) and det.update(noisy(scene), now=0.6)
+    print("refresh OK  ép thay đổi sau refresh_interval")
+
+    det = ChangeDetector(pixel_format="Mono12")
+    det.update(noisy(scene).astype(np.uint16) << 4, now=0.0)
+    assert not det.update(noisy(scene).astype(np.uint16) << 4, now=0.1)
+    print("Mono12 OK  ngưỡng theo thang 8-bit")
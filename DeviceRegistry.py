@@ -0,0 +1,196 @@
+# DeviceRegistry.py
+# Cache kết quả EnumerateDevices (GigE có thể mất vài giây) và phát sự kiện cắm/rút camera.
+import logging
+import threading
+import time
+from pypylon import pylon
+from BaslerAPI import CameraInfo, create_instant_camera
+
+logger = logging.getLogger(__name__)
+
+
+class _RemovalHandler(pylon.ConfigurationEventHandler):
+    """Nhận callback OnCameraDeviceRemoved của pylon và báo cho DeviceRegistry."""
+    def __init__(self, registry, serial):
+        super().__init__()
+        self._registry = registry
+        self._serial = serial
+
+    def OnCameraDeviceRemoved(self, camera):
+        self._registry._on_device_removed(self._serial)
+
+
+class DeviceRegistry:
+    """
+    Danh sách camera dùng chung cho cả process:
+      - devices()/list_cameras() trả về kết quả enumerate đã cache; quá `ttl` giây thì
+        làm mới (ở luồng nền nếu đã start(), phía gọi vẫn nhận ngay danh sách cũ)
+      - luồng nền enumerate lại mỗi `refresh_interval` giây và phát sự kiện
+        listener("added" | "removed", serial, device_info) khi danh sách thay đổi
+      - camera đang mở được theo dõi bằng callback rút thiết bị của pylon (watch), báo
+        "removed" ngay không phải chờ lần enumerate kế tiếp
+      - create_camera(serial) tạo camera thẳng từ DeviceInfo đã cache, không enumerate lại
+    tl_factory: mặc định pylon.TlFactory; có thể thay bằng SimCamera.SimTlFactory để thử.
+    """
+    def __init__(self, tl_factory=None, ttl=5.0, refresh_interval=None, camera_factory=None):
+        self._tl = tl_factory if tl_factory is not None else pylon.TlFactory.GetInstance()
+        self._camera_factory = camera_factory or create_instant_camera
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval if refresh_interval is not None else ttl
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.RLock()
+        self._devices = {}  # serial -> DeviceInfo, theo thứ tự enumerate
+        self._updated = None  # perf_counter() lần enumerate gần nhất
+        self._listeners = []
+        self._handlers = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        # Thống kê
+        self.enumerations = 0
+        self.cache_hits = 0
+        self.last_enumerate_ms = 0.0
+        self.version = 0  # tăng mỗi khi danh sách thay đổi
+
+    # ---------------- Enumerate ----------------
+    def refresh(self):
+        """Enumerate lại ngay. Trả về (serial được thêm, serial bị rút)."""
+        with self._refresh_lock:
+            t0 = time.perf_counter()
+            found = {}
+            for info in self._tl.EnumerateDevices():
+                found[info.GetSerialNumber()] = info
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                added = [s for s in found if s not in self._devices]
+                removed = [s for s in self._devices if s not in found]
+                old = self._devices
+                self._devices = found
+                self._updated = time.perf_counter()
+                self.enumerations += 1
+                self.last_enumerate_ms = elapsed * 1e3
+                if added or removed:
+                    self.version += 1
+        for serial in added:
+            self._emit("added", serial, found[serial])
+        for serial in removed:
+            self._emit("removed", serial, old[serial])
+        return added, removed
+
+    def _is_stale(self):
+        return self._updated is None or time.perf_counter() - self._updated > self.ttl
+
+    def devices(self):
+        """list[DeviceInfo] đã cache. Lần đầu (chưa có cache) thì enumerate đồng bộ."""
+        if self._updated is None:
+            with self._refresh_lock:
+                if self._updated is None:  # luồng nền có thể vừa enumerate xong
+                    self.refresh()
+        elif self._is_stale():
+            if self.is_running:
+                self._wake.set()  # trả về danh sách cũ, luồng nền làm mới
+            else:
+                self.refresh()
+        else:
+            self.cache_hits += 1
+        with self._lock:
+            return list(self._devices.values())
+
+    def list_cameras(self):
+        """Giống BaslerCameraAPI.list_cameras() nhưng lấy từ cache."""
+        return [CameraInfo(dev.GetFriendlyName(), dev.GetSerialNumber(), str(dev)) for dev in self.devices()]
+
+    def get(self, serial):
+        """DeviceInfo của `serial` (None nếu không thấy kể cả sau khi enumerate lại)."""
+        with self._lock:
+            info = self._devices.get(str(serial))
+        if info is None:
+            self.refresh()
+            with self._lock:
+                info = self._devices.get(str(serial))
+        return info
+
+    def create_camera(self, serial=None):
+        """Tạo camera (chưa Open) từ DeviceInfo đã cache; serial=None -> camera đầu tiên. None nếu không có."""
+        if serial is None:
+            devices = self.devices()
+            info = devices[0] if devices else None
+        else:
+            info = self.get(serial)
+        if info is None:
+            return None
+        return self._camera_factory(self._tl, info)
+
+    # ---------------- Sự kiện ----------------
+    def add_listener(self, listener):
+        """listener(event, serial, device_info), event là "added" hoặc "removed" (gọi từ luồng nền)."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners = [l for l in self._listeners if l != listener]
+
+    def _emit(self, event, serial, info):
+        for listener in list(self._listeners):
+            try:
+                listener(event, serial, info)
+            except Exception as e:
+                logger.error("Lỗi listener %s %s: %s", event, serial, e)
+
+    def watch(self, camera, serial):
+        """Đăng ký callback rút thiết bị của pylon cho camera đang mở."""
+        handler = _RemovalHandler(self, str(serial))
+        try:
+            camera.RegisterConfiguration(handler, pylon.RegistrationMode_Append, pylon.Cleanup_None)
+        except Exception:
+            return  # camera không hỗ trợ, dựa vào enumerate định kỳ
+        self._handlers[str(serial)] = handler
+
+    def _on_device_removed(self, serial):
+        self._handlers.pop(serial, None)
+        with self._lock:
+            info = self._devices.pop(serial, None)
+            if info is not None:
+                self.version += 1
+        if info is not None:
+            self._emit("removed", serial, info)
+        self._wake.set()
+
+    # ---------------- Luồng làm mới nền ----------------
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="DeviceRegistry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Lỗi enumerate: %s", e)
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def stats(self):
+        with self._lock:
+            age = time.perf_counter() - self._updated if self._updated is not None else None
+            return {
+                "devices": len(self._devices),
+                "enumerations": self.enumerations,
+                "cache_hits": self.cache_hits,
+                "last_enumerate_ms": round(self.last_enumerate_ms, 3),
+                "age_s": None if age is None else round(age, 3),
+                "version": self.version,
+            }
@@ -0,0 +1,198 @@
+# EventClip.py
+# Bộ đệm "event clip": luôn giữ vài giây frame gần nhất, khi có sự kiện (inspection lỗi)
+# thì đóng băng cửa sổ [sự kiện - pre, sự kiện + post] và ghi ra đĩa ở luồng riêng.
+import itertools
+import logging
+import os
+import threading
+import time
+import numpy as np
+from Recorder import RawRecorder
+
+logger = logging.getLogger(__name__)
+
+
+class EventClipBuffer:
+    """
+    Ring cấp phát trước, giới hạn theo số byte (không theo số frame) vì Width/Height có thể
+    đổi qua update_setting: số slot = byte_budget // kích thước frame. Ngân sách không chứa nổi
+    2 frame thì bộ đệm tự tắt (cảnh báo 1 lần, frame bị bỏ qua) chứ không vượt ngân sách.
+
+    Gắn vào BaslerCameraAPI bằng add_frame_listener(buffer.on_frame). Khi trigger(), các slot
+    thuộc cửa sổ sự kiện được "ghim" lại để luồng grab bỏ qua, luồng dump ghi chúng ra file
+    .bcraw rồi bỏ ghim; acquisition không bao giờ phải dừng chờ ghi đĩa.
+    """
+    def __init__(self, pre_seconds=2.0, post_seconds=1.0, byte_budget=256 * 2**20,
+                 out_dir="clips", pixel_format="", frame_meta=None):
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.byte_budget = int(byte_budget)
+        self.out_dir = out_dir
+        self.pixel_format = pixel_format
+        # dict {"ExposureTime": ..., "Gain": ...} dùng chung với BaslerCameraAPI
+        self._frame_meta = frame_meta if frame_meta is not None else {}
+        self._lock = threading.Lock()
+        self._slots = None
+        self._rejected = None  # (shape, dtype) không vừa ngân sách
+        self.capacity = 0
+        self._next = 0
+        self._pending = []
+        self._dumps = []
+        # Thống kê
+        self.frames_buffered = 0
+        self.frames_dropped = 0  # hết slot trống (đều đang bị ghim) hoặc đổi shape khi đang dump
+        self.clips_saved = 0
+        self._clip_ids = itertools.count(1)
+
+    def _allocate(self, shape, dtype):
+        frame_bytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        capacity = self.byte_budget // frame_bytes
+        if capacity < 2:
+            logger.warning("Ngân sách event clip %.1f MB không đủ 2 frame %s (%.1f MB/frame): tắt bộ đệm clip",
+                           self.byte_budget / 2**20, tuple(shape), frame_bytes / 2**20)
+            self._slots = None
+            self._rejected = (tuple(shape), np.dtype(dtype))
+            self.capacity = 0
+            return False
+        self._rejected = None
+        self._slots = np.empty((capacity,) + tuple(shape), dtype=dtype)
+        self.capacity = capacity
+        self._seq = np.full(capacity, -1, dtype=np.int64)
+        self._ts = np.zeros(capacity, dtype=np.int64)
+        self._host = np.zeros(capacity, dtype=np.float64)
+        self._exposure = np.full(capacity, np.nan)
+        self._gain = np.full(capacity, np.nan)
+        self._pinned = np.zeros(capacity, dtype=np.int32)
+        self._next = 0
+        return True
+
+    def on_frame(self, ring, seq):
+        """Frame listener: chép frame mới vào slot trống kế tiếp (chạy trong luồng grab)."""
+        frame = ring.read(seq, copy=False)
+        if frame is None:
+            return
+        array = frame.array
+        ready = []
+        with self._lock:
+            if self._rejected == (array.shape, array.dtype):
+                self.frames_dropped += 1
+                return
+            slots = self._slots
+            if slots is None or slots.shape[1:] != array.shape or slots.dtype != array.dtype:
+                if slots is not None and self._pinned.any():
+                    # Đang dump clip cũ: không cấp phát thêm để giữ đúng ngân sách bộ nhớ
+                    self.frames_dropped += 1
+                    return
+                if not self._allocate(array.shape, array.dtype):
+                    self.frames_dropped += 1
+                    return
+            idx = self._next
+            for _ in range(self.capacity):
+                if not self._pinned[idx]:
+                    break
+                idx = (idx + 1) % self.capacity
+            else:
+                self.frames_dropped += 1
+                return
+            self._seq[idx] = -1
+            np.copyto(self._slots[idx], array)
+            self._seq[idx] = frame.seq
+            self._ts[idx] = frame.timestamp
+            self._host[idx] = frame.host_time
+            # Gain 0 dB / giá trị 0 là hợp lệ: chỉ None (chưa đọc được) mới thành NaN
+            exposure, gain = self._frame_meta.get("ExposureTime"), self._frame_meta.get("Gain")
+            self._exposure[idx] = np.nan if exposure is None else exposure
+            self._gain[idx] = np.nan if gain is None else gain
+            self._next = (idx + 1) % self.capacity
+            self.frames_buffered += 1
+            if self._pending:
+                ready = [e for e in self._pending if frame.host_time >= e["time"] + self.post_seconds]
+                self._pending = [e for e in self._pending if e not in ready]
+        for event in ready:
+            self._start_dump(event)
+
+    def trigger(self, path=None, callback=None):
+        """
+        Đánh dấu sự kiện tại thời điểm hiện tại. Clip [t - pre, t + post] được ghi ra `path`
+        (mặc định out_dir/clip_<thời gian, ms>_<số thứ tự>.bcraw, không trùng dù trigger nhiều lần
+        trong cùng 1 giây) sau khi đủ post_seconds.
+        callback(path, stats) được gọi ở luồng dump khi ghi xong. Trả về đường dẫn file.
+        """
+        if path is None:
+            os.makedirs(self.out_dir, exist_ok=True)
+            now = time.time()
+            name = f"clip_{time.strftime('%Y%m%d_%H%M%S', time.localtime(now))}_{int(now * 1000) % 1000:03d}"
+            path = os.path.join(self.out_dir, f"{name}_{next(self._clip_ids)}.bcraw")
+        event = {"time": time.perf_counter(), "path": path, "callback": callback}
+        with self._lock:
+            self._pending.append(event)
+        logger.info("Sự kiện -> %s", path)
+        return path
+
+    def flush(self):
+        """Ghi ngay các sự kiện còn chờ (vd. khi dừng stream trước khi đủ post_seconds)."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for event in pending:
+            self._start_dump(event)
+
+    def _start_dump(self, event):
+        t = event["time"]
+        with self._lock:
+            if self._slots is None:
+                return
+            mask = (self._seq >= 0) & (self._host >= t - self.pre_seconds) & (self._host <= t + self.post_seconds)
+            indices = np.flatnonzero(mask)
+            indices = indices[np.argsort(self._host[indices])]
+            self._pinned[indices] += 1
+            slots = self._slots
+            meta = [(int(self._seq[i]), int(self._ts[i]), float(self._host[i]),
+                     float(self._exposure[i]), float(self._gain[i])) for i in indices]
+        thread = threading.Thread(target=self._dump, args=(event, slots, indices, meta),
+                                  name="EventClipDump", daemon=True)
+        self._dumps = [d for d in self._dumps if d.is_alive()] + [thread]
+        thread.start()
+
+    def _dump(self, event, slots, indices, meta):
+        stats = {"path": event["path"], "frames": 0}
+        try:
+            if len(indices):
+                recorder = RawRecorder(event["path"], slots.shape[1:], slots.dtype, capacity=len(indices),
+                                       pixel_format=self.pixel_format, workers=1)
+                for i, (seq, ts, host, exposure, gain) in zip(indices, meta):
+                    recorder.submit(slots[i], seq, ts, host, exposure, gain)
+                recorder.close()
+                stats = recorder.stats()
+                stats["frames"] = stats["frames_written"]
+                stats["window"] = (meta[0][2] - event["time"], meta[-1][2] - event["time"])
+            with self._lock:
+                self.clips_saved += 1
+            logger.info("Đã ghi clip %s (%s frame)", event['path'], stats['frames'])
+        except Exception as e:
+            stats["error"] = str(e)
+            logger.error("Lỗi ghi clip %s: %s", event['path'], e)
+        finally:
+            with self._lock:
+                if slots is self._slots:
+                    self._pinned[indices] -= 1
+        if event["callback"] is not None:
+            event["callback"](event["path"], stats)
+
+    def wait(self, timeout=None):
+        """Chờ các luồng dump đang chạy ghi xong."""
+        for thread in list(self._dumps):
+            thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            valid = self._host[self._seq >= 0] if self._slots is not None else np.empty(0)
+            span = float(valid.max() - valid.min()) if len(valid) > 1 else 0.0
+            return {
+                "capacity": self.capacity,
+                "byte_budget": self.byte_budget,
+                "buffered_seconds": round(span, 3),
+                "pending_events": len(self._pending),
+                "frames_buffered": self.frames_buffered,
+                "frames_dropped": self.frames_dropped,
+                "clips_saved": self.clips_saved,
+            }
@@ -0,0 +1,237 @@
+# FrameBuffer.py
+import threading
+import time
+import numpy as np
+
+
+class Frame:
+    """
+    Một frame đã grab: số thứ tự trong ring, timestamp của camera,
+    thời điểm host nhận được (time.perf_counter) và dữ liệu ảnh (numpy array).
+    change_seq: seq của frame thay đổi gần nhất tính tới frame này (ChangeDetector); phía hiển thị/
+    phân tích đã xử lý frame seq >= change_seq thì frame này coi như trùng, bỏ qua được.
+    Không có ChangeDetector thì change_seq = seq (mọi frame đều mới).
+    """
+    __slots__ = ("seq", "timestamp", "host_time", "array", "change_seq")
+
+    def __init__(self, seq, timestamp, host_time, array, change_seq=None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.host_time = host_time
+        self.array = array
+        self.change_seq = seq if change_seq is None else change_seq
+
+    def unchanged_since(self, seq):
+        """True nếu frame không khác frame `seq` đã xử lý trước đó (cùng ring)."""
+        return 0 <= self.change_seq <= seq <= self.seq
+
+    def __repr__(self):
+        shape = None if self.array is None else self.array.shape
+        return f"Frame(seq={self.seq}, timestamp={self.timestamp}, shape={shape})"
+
+
+class FrameRingBuffer:
+    """
+    Ring buffer cấp phát sẵn N slot numpy để giữ các frame mới nhất.
+
+    Chỉ có 1 luồng ghi (grab thread). Luồng đọc không khoá luồng ghi:
+    mỗi slot mang số thứ tự (kiểu seqlock), nếu slot bị ghi đè trong lúc
+    đang đọc thì lần đọc đó bị huỷ và đọc lại.
+    """
+    def __init__(self, capacity=8):
+        if capacity < 2:
+            raise ValueError("capacity phải >= 2")
+        self.capacity = int(capacity)
+        self._slots = None
+        self._slot_seq = [-1] * self.capacity
+        self._slot_ts = [0] * self.capacity
+        self._slot_host = [0.0] * self.capacity
+        self._slot_read = [True] * self.capacity
+        self._slot_change = [-1] * self.capacity
+        self._latest_seq = -1
+        # ChangeDetector.ChangeDetector (tuỳ chọn): đánh dấu frame trùng ngay trong luồng ghi
+        self.change_detector = None
+        self._change_seq = -1
+        self._cond = threading.Condition()
+        self._waiters = 0
+        # Thống kê
+        self.frames_written = 0
+        self.frames_overwritten = 0  # frame bị ghi đè khi chưa ai đọc
+        self.frames_dropped = 0      # frame camera báo lỗi hoặc bị mất (BlockID nhảy cóc)
+        self.frames_unchanged = 0    # frame ChangeDetector coi là trùng frame trước
+
+    @property
+    def latest_seq(self):
+        return self._latest_seq
+
+    def _allocate(self, shape, dtype):
+        """Cấp phát (lại) toàn bộ slot. Chỉ xảy ra ở frame đầu tiên hoặc khi ROI/PixelFormat đổi."""
+        for i in range(self.capacity):
+            self._slot_seq[i] = -1
+            self._slot_read[i] = True
+        # Kích thước đổi: frame đầu tiên sau đó luôn là frame thay đổi
+        self._change_seq = -1
+        if self.change_detector is not None:
+            self.change_detector.reset()
+        self._slots = np.empty((self.capacity,) + tuple(shape), dtype=dtype)
+
+    def write(self, array, timestamp=0, converter=None):
+        """
+        Chép 1 frame vào slot kế tiếp (không cấp phát bộ nhớ mới ở trạng thái ổn định).
+        converter: (tuỳ chọn) PixelConverter.PixelConverter, chuyển đổi ghi thẳng vào slot thay vì chép.
+        Trả về seq của frame vừa ghi.
+        """
+        if converter is None:
+            shape, dtype = array.shape, array.dtype
+        else:
+            shape, dtype = converter.output_spec(array)
+        slots = self._slots
+        if slots is None or slots.shape[1:] != shape or slots.dtype != dtype:
+            self._allocate(shape, dtype)
+            slots = self._slots
+        seq = self._latest_seq + 1
+        idx = seq % self.capacity
+        if self._slot_seq[idx] >= 0 and not self._slot_read[idx]:
+            self.frames_overwritten += 1
+        # Đánh dấu slot đang ghi để luồng đọc bỏ qua
+        self._slot_seq[idx] = -1
+        if converter is None:
+            np.copyto(slots[idx], array)
+        else:
+            converter.convert(array, slots[idx])
+        self._slot_ts[idx] = timestamp
+        self._slot_host[idx] = now = time.perf_counter()
+        detector = self.change_detector
+        if detector is None or detector.update(slots[idx], now) or self._change_seq < 0:
+            self._change_seq = seq
+        else:
+            self.frames_unchanged += 1
+        self._slot_change[idx] = self._change_seq
+        self._slot_read[idx] = False
+        self._slot_seq[idx] = seq
+        self._latest_seq = seq
+        self.frames_written += 1
+        if self._waiters:
+            with self._cond:
+                self._cond.notify_all()
+        return seq
+
+    def _read_slot(self, seq, copy=True, out=None):
+        slots = self._slots
+        if slots is None or seq < 0:
+            return None
+        idx = seq % self.capacity
+        if self._slot_seq[idx] != seq:
+            return None
+        ts = self._slot_ts[idx]
+        host_time = self._slot_host[idx]
+        change_seq = self._slot_change[idx]
+        if out is not None and out.shape == slots.shape[1:] and out.dtype == slots.dtype:
+            # Chép vào buffer của phía đọc, không cấp phát mới
+            np.copyto(out, slots[idx])
+            data = out
+        else:
+            data = slots[idx].copy() if copy else slots[idx]
+        # Slot bị ghi đè trong lúc copy -> kết quả không hợp lệ
+        if self._slot_seq[idx] != seq:
+            return None
+        self._slot_read[idx] = True
+        return Frame(seq, ts, host_time, data, change_seq)
+
+    def read(self, seq, copy=True, out=None):
+        """
+        Đọc đúng frame `seq` nếu còn trong ring (chưa bị ghi đè), ngược lại trả về None.
+        """
+        return self._read_slot(seq, copy, out)
+
+    def read_into(self, seq, out):
+        """
+        Chép frame `seq` vào buffer `out` của phía gọi (vd. slot của file ghi hình) qua đường đọc seqlock.
+        Trả về Frame (array là `out`) hoặc None nếu frame đã bị ghi đè / đang ghi, hoặc `out` không
+        cùng shape/dtype với slot (không bao giờ cấp phát bản copy thay thế).
+        """
+        slots = self._slots
+        if slots is None or out.shape != slots.shape[1:] or out.dtype != slots.dtype:
+            return None
+        frame = self._read_slot(seq, out=out)
+        return frame if frame is not None and frame.array is out else None
+
+    def frame_spec(self):
+        """(shape, dtype) của frame trong ring, None nếu chưa có frame nào."""
+        slots = self._slots
+        return None if slots is None else (slots.shape[1:], slots.dtype)
+
+    def get_latest(self, copy=True, out=None):
+        """
+        Lấy frame mới nhất, không bao giờ chờ camera. Trả về Frame hoặc None.
+        copy=False trả về view vào slot: nhanh hơn nhưng có thể bị ghi đè sau đó.
+        out: buffer cấp phát sẵn (cùng shape/dtype) để nhận dữ liệu, tránh cấp phát mỗi frame.
+        """
+        for _ in range(self.capacity):
+            seq = self._latest_seq
+            if seq < 0:
+                return None
+            frame = self._read_slot(seq, copy, out)
+            if frame is not None:
+                return frame
+        return None
+
+    def get_next(self, after_seq=-1, timeout=0.0, copy=True, out=None, newest=False):
+        """
+        Lấy frame cũ nhất còn trong ring có seq > after_seq
+        (newest=True: lấy frame mới nhất, bỏ qua các frame ở giữa - dùng cho hiển thị).
+        Nếu chưa có frame mới thì chờ tối đa `timeout` giây (0 = không chờ).
+        Trả về Frame hoặc None.
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            latest = self._latest_seq
+            if latest > after_seq:
+                if newest:
+                    seq = latest
+                else:
+                    seq = max(after_seq + 1, latest - self.capacity + 1)
+                frame = self._read_slot(seq, copy, out)
+                if frame is not None:
+                    return frame
+                # Slot đã bị ghi đè, thử frame kế tiếp
+                after_seq = seq
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            with self._cond:
+                self._waiters += 1
+                try:
+                    if self._latest_seq <= after_seq:
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+    def get_nearest(self, value, key="host_time", copy=True):
+        """
+        Lấy frame còn trong ring có `key` ("host_time" hoặc "timestamp") gần `value` nhất.
+        Trả về Frame hoặc None. Dùng để ghép frame giữa nhiều camera.
+        """
+        values = self._slot_host if key == "host_time" else self._slot_ts
+        latest = self._latest_seq
+        best_seq, best_diff = -1, None
+        for seq in range(max(latest - self.capacity + 1, 0), latest + 1):
+            idx = seq % self.capacity
+            if self._slot_seq[idx] != seq:
+                continue
+            diff = abs(values[idx] - value)
+            if best_diff is None or diff < best_diff:
+                best_seq, best_diff = seq, diff
+        return self._read_slot(best_seq, copy)
+
+    def stats(self):
+        """Thống kê của ring (dict)."""
+        return {
+            "capacity": self.capacity,
+            "latest_seq": self._latest_seq,
+            "frames_written": self.frames_written,
+            "frames_overwritten": self.frames_overwritten,
+            "frames_dropped": self.frames_dropped,
+            "frames_unchanged": self.frames_unchanged,
+        }
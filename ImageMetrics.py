@@ -0,0 +1,156 @@
+# ImageMetrics.py
+# Thống kê chất lượng ảnh (độ sáng, cháy sáng, độ nét, nhiễu, cân bằng trắng) để agent/auto-tune
+# chỉnh ExposureTime/Gain. Toàn bộ tính trên lưới lấy mẫu cách đều bằng NumPy vectorized,
+# không copy frame full-res nên chạy được trên mọi frame (~vài ms ở 5 MP).
+import math
+import time
+import numpy as np
+from PixelConverter import BAYER_OFFSETS, bayer_pattern, bit_depth, sample_step
+
+# Hệ số luma BT.601 dạng số nguyên (tổng = 256) để tính bằng phép dịch bit
+_LUMA_WEIGHTS = (77, 150, 29)
+
+
+def _laplacian(plane, step, d):
+    """
+    Laplacian 5 điểm tại các điểm lưới (cách nhau `step`), láng giềng cách `d` pixel
+    trên ảnh gốc (d=2 với Bayer để chỉ so cùng kênh màu). Trả về float32.
+    """
+    h, w = plane.shape[:2]
+    ys = slice(d, h - d, step)
+    xs = slice(d, w - d, step)
+    center = plane[ys, xs].astype(np.float32)
+    lap = center * 4.0
+    lap -= plane[0:h - 2 * d:step, xs]
+    lap -= plane[2 * d:h:step, xs]
+    lap -= plane[ys, 0:w - 2 * d:step]
+    lap -= plane[ys, 2 * d:w:step]
+    return lap
+
+
+def _percentile_from_hist(cumulative, q):
+    """Phân vị q (0..1) từ histogram tích lũy, trả về chỉ số bin."""
+    return int(np.searchsorted(cumulative, q * cumulative[-1]))
+
+
+class ImageMetrics:
+    """
+    Tính các chỉ số chất lượng của 1 frame (mono, RGB hoặc Bayer thô):
+
+      mean, p01, p50, p99    độ sáng (luma) chuẩn hoá 0..1 theo white level của PixelFormat
+      clipped_high           tỉ lệ điểm có kênh nào đó chạm white level (cháy sáng)
+      clipped_low            tỉ lệ điểm luma = 0 (mất chi tiết vùng tối)
+      sharpness              phương sai Laplacian (đơn vị 8-bit), lớn = nét
+      noise                  sigma nhiễu ước lượng (đơn vị 8-bit) từ median |Laplacian| (bền với cạnh)
+      wb_r_g, wb_b_g         tỉ lệ trung bình R/G, B/G (gray world), None với ảnh mono
+      histogram              np.ndarray `bins` phần tử, đếm luma trên thang 8-bit
+
+    Mọi phép tính dùng view cách `step` pixel của frame gốc (không copy cả frame);
+    step tự chọn để lưới có khoảng target_samples điểm.
+    """
+    def __init__(self, pixel_format=None, target_samples=1 << 17, bins=256):
+        if 256 % bins:
+            raise ValueError("bins phải là ước của 256")
+        self.pixel_format = pixel_format
+        self.target_samples = int(target_samples)
+        self.bins = int(bins)
+
+    def _channels(self, img, step):
+        """Trả về (luma, rgb, plane, d): luma và rgb lấy mẫu trên lưới, plane/d dùng cho Laplacian."""
+        pattern = bayer_pattern(self.pixel_format) if img.ndim == 2 else None
+        if pattern is not None:
+            (ry, rx), (by, bx) = BAYER_OFFSETS[pattern]
+            h, w = img.shape[0] // 2 * 2, img.shape[1] // 2 * 2
+            r = img[ry:h:step, rx:w:step]
+            b = img[by:h:step, bx:w:step]
+            g = (img[ry:h:step, bx:w:step].astype(np.uint16 if img.dtype == np.uint8 else np.uint32)
+                 + img[by:h:step, rx:w:step]) >> 1
+            rgb = (r, g, b)
+            return self._luma(rgb), rgb, img, 2
+        if img.ndim == 3 and img.shape[2] >= 3:
+            sub = np.ascontiguousarray(img[::step, ::step])  # gom 1 lần, các phép sau đọc liền mạch
+            rgb = (sub[..., 0], sub[..., 1], sub[..., 2])
+            # Độ nét/nhiễu tính trên kênh G (gần với luma, không phải tính luma full-res)
+            return self._luma(rgb), rgb, img[..., 1], 1
+        plane = img if img.ndim == 2 else img[..., 0]
+        return plane[::step, ::step], None, plane, 1
+
+    @staticmethod
+    def _luma(rgb):
+        r, g, b = rgb
+        # 8-bit: 255 * 256 vừa uint16, nhanh hơn uint32
+        dtype = np.uint16 if r.dtype == np.uint8 else np.uint32
+        wr, wg, wb = (dtype(w) for w in _LUMA_WEIGHTS)
+        luma = r.astype(dtype) * wr
+        luma += g * wg
+        luma += b * wb
+        luma >>= 8
+        return luma
+
+    def compute(self, array):
+        """Tính chỉ số cho `array` (frame từ get_image / ring buffer). Trả về dict."""
+        t0 = time.perf_counter()
+        img = np.asarray(array)
+        height, width = img.shape[:2]
+        fmt = self.pixel_format or ""
+        is_bayer = img.ndim == 2 and bayer_pattern(fmt) is not None
+        bits = bit_depth(fmt) if img.dtype != np.uint8 else 8
+        white = (1 << bits) - 1
+        shift = bits - 8
+        step = sample_step(height, width, self.target_samples, even=is_bayer)
+
+        luma, rgb, plane, d = self._channels(img, step)
+        samples = luma.size
+
+        # Histogram trên thang 8-bit; phân vị suy ra từ histogram tích lũy (không phải sort)
+        luma8 = np.minimum(luma >> shift, 255) if shift > 0 else luma
+        hist256 = np.bincount(luma8.ravel().astype(np.intp, copy=False), minlength=256)[:256]
+        cumulative = np.cumsum(hist256)
+        mean = float(luma.mean()) / white
+
+        if rgb is None:
+            clipped_high = np.count_nonzero(luma >= white) / samples
+            wb_r_g = wb_b_g = None
+        else:
+            r, g, b = rgb
+            saturated = (r >= white) | (g >= white) | (b >= white)
+            clipped_high = np.count_nonzero(saturated) / samples
+            # Gray world trên các điểm chưa cháy sáng (điểm cháy làm lệch tỉ lệ về 1)
+            keep = ~saturated
+            g_sum = float(g[keep].sum())
+            wb_r_g = round(float(r[keep].sum()) / g_sum, 4) if g_sum else None
+            wb_b_g = round(float(b[keep].sum()) / g_sum, 4) if g_sum else None
+        clipped_low = int(hist256[0]) / samples if shift <= 0 else np.count_nonzero(luma == 0) / samples
+
+        lap = _laplacian(plane, step, d)
+        scale = float(1 << shift) if shift > 0 else 1.0  # đưa về đơn vị 8-bit
+        sharpness = float(lap.var()) / (scale * scale)
+        abs_lap = np.abs(lap.ravel()[::4])
+        median = float(np.partition(abs_lap, abs_lap.size // 2)[abs_lap.size // 2]) if abs_lap.size else 0.0
+        # Nhiễu Gauss sigma -> Laplacian 5 điểm có sigma*sqrt(20); median|x| = 0.6745 sigma
+        noise = 1.4826 * median / math.sqrt(20.0) / scale
+
+        histogram = hist256.reshape(self.bins, -1).sum(axis=1) if self.bins != 256 else hist256
+        return {
+            "width": width,
+            "height": height,
+            "step": step,
+            "samples": samples,
+            "mean": round(mean, 4),
+            "p01": round(_percentile_from_hist(cumulative, 0.01) / 255.0, 4),
+            "p50": round(_percentile_from_hist(cumulative, 0.50) / 255.0, 4),
+            "p99": round(_percentile_from_hist(cumulative, 0.99) / 255.0, 4),
+            "clipped_high": round(float(clipped_high), 5),
+            "clipped_low": round(float(clipped_low), 5),
+            "sharpness": round(sharpness, 2),
+            "noise": round(noise, 3),
+            "wb_r_g": wb_r_g,
+            "wb_b_g": wb_b_g,
+            "histogram": histogram,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1e3, 3),
+        }
+
+
+def compute_metrics(array, pixel_format=None, target_samples=1 << 17):
+    """Hàm tiện dụng: ImageMetrics(pixel_format).compute(array)."""
+    return ImageMetrics(pixel_format, target_samples=target_samples).compute(array)
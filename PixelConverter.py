@@ -0,0 +1,300 @@
+# PixelConverter.py
+# Chuyển frame thô theo PixelFormat (Mono/Bayer/RGB/BGR, 8-16 bit, packed) về ảnh 8-bit
+# hiển thị/phân tích được, ghi thẳng vào buffer của phía gọi (vd. slot của ring buffer).
+import math
+import re
+import numpy as np
+
+try:
+    import cv2  # Không bắt buộc, có thì demosaic bằng OpenCV (nhanh hơn NumPy nhiều lần)
+except ImportError:
+    cv2 = None
+
+# Vị trí (hàng, cột) của R và B trong ô Bayer 2x2, G là 2 vị trí còn lại (dùng chung với Preview, ImageMetrics)
+BAYER_OFFSETS = {
+    "RG": ((0, 0), (1, 1)),
+    "BG": ((1, 1), (0, 0)),
+    "GR": ((0, 1), (1, 0)),
+    "GB": ((1, 0), (0, 1)),
+}
+# OpenCV đặt tên mẫu Bayer theo ô 2x2 bắt đầu ở (1, 1), pylon theo ô bắt đầu ở (0, 0)
+_CV2_BAYER = {} if cv2 is None else {
+    "RG": cv2.COLOR_BayerBG2RGB,
+    "BG": cv2.COLOR_BayerRG2RGB,
+    "GR": cv2.COLOR_BayerGB2RGB,
+    "GB": cv2.COLOR_BayerGR2RGB,
+}
+_FORMAT_RE = re.compile(r"^(Mono|Bayer(?:RG|BG|GR|GB)|RGB|BGR)(\d+)(p|Packed)?$")
+
+
+def parse_pixel_format(pixel_format):
+    """
+    Tách tên PixelFormat: "BayerRG12p" -> ("Bayer", "RG", 12, "p"), "Mono8" -> ("Mono", None, 8, None).
+    "RGB8Packed"/"BGR8Packed" (tên cũ của GigE) chỉ là RGB xen kẽ, không phải packed theo bit.
+    ValueError nếu chưa hỗ trợ (YUV, ...).
+    """
+    m = _FORMAT_RE.match(pixel_format or "")
+    if m is None:
+        raise ValueError(f"PixelFormat chưa hỗ trợ: {pixel_format}")
+    family, bits, packing = m.group(1), int(m.group(2)), m.group(3)
+    pattern = None
+    if family.startswith("Bayer"):
+        family, pattern = "Bayer", family[5:]
+    if bits == 8:
+        packing = None
+    return family, pattern, bits, packing
+
+
+def bit_depth(pixel_format):
+    """Số bit hiệu dụng theo tên PixelFormat (Mono12 -> 12), mặc định 8; không cần PixelFormat được hỗ trợ."""
+    if not pixel_format:
+        return 8
+    digits = "".join(ch for ch in pixel_format if ch.isdigit())
+    return int(digits[:2]) if digits else 8
+
+
+def sample_step(height, width, target_samples, even=False):
+    """Bước lấy mẫu để lưới có tối đa ~target_samples điểm (Bayer: bước chẵn để giữ đúng kênh màu)."""
+    step = max(math.ceil(math.sqrt(height * width / max(target_samples, 1))), 1)
+    if even and step % 2:
+        step += 1
+    return step
+
+
+def bayer_pattern(pixel_format):
+    """Mẫu Bayer ("RG", "BG", "GR", "GB") theo parse_pixel_format, None nếu không phải Bayer hoặc chưa hỗ trợ."""
+    try:
+        return parse_pixel_format(pixel_format)[1]
+    except ValueError:
+        return None
+
+
+def unpack_to_uint8(packed, width, bits, packing, out):
+    """
+    Giải nén dòng packed (uint8, shape (H, width * bits / 8)) thẳng về 8-bit (bỏ các bit thấp), ghi vào out (H, width).
+      "p" (GenICam, LSB trước): Mono10p 4 pixel / 5 byte, Mono12p 2 pixel / 3 byte
+      "Packed" (GigE cũ)      : 2 pixel / 3 byte, byte 0 và 2 là các bit cao của 2 pixel
+    """
+    if packing == "p" and bits == 10:
+        g = packed.reshape(packed.shape[0], width // 4, 5)
+        o = out.reshape(out.shape[0], width // 4, 4)
+        b1, b2, b3 = g[..., 1], g[..., 2], g[..., 3]
+        # p0 = b0 | b1[1:0] << 8 -> 8 bit cao = b0 >> 2 | b1[1:0] << 6, tương tự cho p1..p3
+        np.bitwise_or(g[..., 0] >> 2, (b1 & 0x03) << 6, out=o[..., 0])
+        np.bitwise_or(b1 >> 4, (b2 & 0x0F) << 4, out=o[..., 1])
+        np.bitwise_or(b2 >> 6, (b3 & 0x3F) << 2, out=o[..., 2])
+        o[..., 3] = g[..., 4]
+    elif packing == "p" and bits == 12:
+        g = packed.reshape(packed.shape[0], width // 2, 3)
+        o = out.reshape(out.shape[0], width // 2, 2)
+        np.bitwise_or(g[..., 0] >> 4, (g[..., 1] & 0x0F) << 4, out=o[..., 0])
+        o[..., 1] = g[..., 2]
+    elif packing == "Packed" and bits in (10, 12):
+        g = packed.reshape(packed.shape[0], width // 2, 3)
+        o = out.reshape(out.shape[0], width // 2, 2)
+        o[..., 0] = g[..., 0]
+        o[..., 1] = g[..., 2]
+    else:
+        raise ValueError(f"Kiểu packed chưa hỗ trợ: {bits} bit {packing}")
+    return out
+
+
+class PixelConverter:
+    """
+    Frame thô -> ảnh uint8: mono (H, W) hoặc RGB (H, W, 3), theo `pixel_format` (đọc lại mỗi lần convert,
+    nên đổi PixelFormat giữa chừng chỉ cần gán lại thuộc tính này):
+      - Mono8 / RGB8: chép ; BGR8: đảo kênh
+      - 10/12/16 bit (uint16): dịch bit về 8-bit trong 1 lượt
+      - Mono10p/12p, Mono10Packed/12Packed (mảng uint8 chưa giải nén): giải nén vectorized
+      - Bayer: demosaic bilinear full-res (OpenCV nếu có, ngược lại NumPy trên 4 lưới con 2x2)
+    convert(src, out) ghi vào `out` cấp phát sẵn (vd. slot của FrameRingBuffer); ảnh đệm viền của demosaic
+    được giữ lại giữa các frame (demosaic NumPy vẫn tạo vài mảng tạm cỡ 1/4 ảnh mỗi frame).
+    """
+    def __init__(self, pixel_format=None):
+        self.pixel_format = pixel_format
+        self._pad = None      # uint16 (H+2, W+2): mặt Bayer đã đệm viền
+        self._plane8 = None   # uint8 (H, W): mặt Bayer 8-bit cho OpenCV / packed
+
+    def _parse(self, src):
+        if self.pixel_format:
+            return parse_pixel_format(self.pixel_format)
+        # Không biết PixelFormat: đoán theo shape/dtype
+        bits = 8 if src.dtype == np.uint8 else 16
+        return ("RGB" if src.ndim == 3 else "Mono"), None, bits, None
+
+    @property
+    def output_format(self):
+        """PixelFormat của ảnh sau khi chuyển: "RGB8" (Bayer/RGB/BGR) hoặc "Mono8"."""
+        try:
+            family = parse_pixel_format(self.pixel_format)[0] if self.pixel_format else None
+        except ValueError:
+            return None
+        return "Mono8" if family in ("Mono", None) else "RGB8"
+
+    def output_spec(self, src):
+        """(shape, dtype) của ảnh sau khi chuyển `src` (để cấp phát buffer đích)."""
+        family, _, bits, packing = self._parse(src)
+        h = src.shape[0]
+        if packing:
+            # "Packed" (GigE cũ) luôn 2 pixel / 3 byte, kể cả Mono10Packed
+            w = src.shape[1] * 8 // (12 if packing == "Packed" else bits)
+        else:
+            w = src.shape[1]
+        if family == "Mono":
+            return (h, w), np.uint8
+        return (h, w, 3), np.uint8
+
+    def convert(self, src, out=None):
+        """Chuyển `src` (numpy, view zero-copy cũng được) vào `out` (hoặc mảng mới nếu out=None). Trả về out."""
+        family, pattern, bits, packing = self._parse(src)
+        shape, dtype = self.output_spec(src)
+        if out is None or out.shape != shape or out.dtype != dtype:
+            out = np.empty(shape, dtype)
+        shift = max(bits - 8, 0)
+        if family == "Bayer":
+            return self._demosaic(src, pattern, shift, packing, bits, out)
+        if packing:
+            return unpack_to_uint8(src, shape[1], bits, packing, out)
+        if family == "BGR":
+            src = src[..., ::-1]
+        if src.dtype == np.uint8:
+            np.copyto(out, src)
+        else:
+            np.right_shift(src, shift, out=out, casting="unsafe")
+        return out
+
+    # ---------------- Demosaic ----------------
+    def _bayer_plane8(self, src, shift, packing, bits, width):
+        """Mặt Bayer 8-bit (dùng buffer giữ lại), src uint8 thì trả về luôn src."""
+        if src.dtype == np.uint8 and not packing:
+            return src
+        shape = (src.shape[0], width)
+        if self._plane8 is None or self._plane8.shape != shape:
+            self._plane8 = np.empty(shape, np.uint8)
+        if packing:
+            return unpack_to_uint8(src, width, bits, packing, self._plane8)
+        return np.right_shift(src, shift, out=self._plane8, casting="unsafe")
+
+    def _demosaic(self, src, pattern, shift, packing, bits, out):
+        h, w = out.shape[:2]
+        if cv2 is not None:
+            plane = self._bayer_plane8(src, shift, packing, bits, w)
+            cv2.cvtColor(plane, _CV2_BAYER[pattern], dst=out)
+            return out
+        pad = self._pad
+        if pad is None or pad.shape != (h + 2, w + 2):
+            pad = self._pad = np.empty((h + 2, w + 2), np.uint16)
+        inner = pad[1:-1, 1:-1]
+        if packing:
+            np.copyto(inner, self._bayer_plane8(src, shift, packing, bits, w))
+        elif src.dtype == np.uint8:
+            np.copyto(inner, src)
+        else:
+            np.right_shift(src, shift, out=inner)
+        # Đệm viền kiểu phản xạ (hàng -1 = hàng 1) giữ nguyên tính chẵn lẻ của lưới Bayer
+        pad[0, 1:-1] = pad[2, 1:-1]
+        pad[-1, 1:-1] = pad[-3, 1:-1]
+        pad[:, 0] = pad[:, 2]
+        pad[:, -1] = pad[:, -3]
+        (ry, rx), (by, bx) = BAYER_OFFSETS[pattern]
+        for py in (0, 1):
+            ny = len(range(py, h, 2))
+            for px in (0, 1):
+                nx = len(range(px, w, 2))
+
+                def at(dy, dx):
+                    # Lưới con của pixel (py, px) dịch (dy, dx) trong ảnh đã đệm viền
+                    y0, x0 = py + 1 + dy, px + 1 + dx
+                    return pad[y0:y0 + 2 * ny:2, x0:x0 + 2 * nx:2]
+
+                site = out[py::2, px::2]
+                horiz = at(0, -1) + at(0, 1)
+                vert = at(-1, 0) + at(1, 0)
+                if (py, px) in ((ry, rx), (by, bx)):
+                    own, other = (0, 2) if (py, px) == (ry, rx) else (2, 0)
+                    site[..., own] = at(0, 0)
+                    site[..., 1] = (horiz + vert + 2) >> 2
+                    site[..., other] = (at(-1, -1) + at(-1, 1) + at(1, -1) + at(1, 1) + 2) >> 2
+                else:
+                    # G: hàng chứa R thì R ở trái/phải, B ở trên/dưới; hàng chứa B thì ngược lại
+                    h_ch, v_ch = (0, 2) if py == ry else (2, 0)
+                    site[..., 1] = at(0, 0)
+                    site[..., h_ch] = (horiz + 1) >> 1
+                    site[..., v_ch] = (vert + 1) >> 1
+        return out
+
+
+def pack(values, bits, packing):
+    """Ngược với unpack_to_uint8 (giữ đủ bit): đóng gói mảng uint16 (H, W) thành dòng packed uint8. Dùng để tự kiểm tra."""
+    v = values.astype(np.uint16)
+    h, w = v.shape
+    if packing == "p" and bits == 10:
+        p = v.reshape(h, w // 4, 4)
+        b = np.empty((h, w // 4, 5), np.uint8)
+        b[..., 0] = p[..., 0] & 0xFF
+        b[..., 1] = (p[..., 0] >> 8) | ((p[..., 1] & 0x3F) << 2)
+        b[..., 2] = (p[..., 1] >> 6) | ((p[..., 2] & 0x0F) << 4)
+        b[..., 3] = (p[..., 2] >> 4) | ((p[..., 3] & 0x03) << 6)
+        b[..., 4] = p[..., 3] >> 2
+    elif packing == "p" and bits == 12:
+        p = v.reshape(h, w // 2, 2)
+        b = np.empty((h, w // 2, 3), np.uint8)
+        b[..., 0] = p[..., 0] & 0xFF
+        b[..., 1] = (p[..., 0] >> 8) | ((p[..., 1] & 0x0F) << 4)
+        b[..., 2] = p[..., 1] >> 4
+    else:
+        low = bits - 8
+        p = v.reshape(h, w // 2, 2)
+        b = np.empty((h, w // 2, 3), np.uint8)
+        b[..., 0] = p[..., 0] >> low
+        b[..., 1] = (p[..., 0] & ((1 << low) - 1)) | ((p[..., 1] & ((1 << low) - 1)) << 4)
+        b[..., 2] = p[..., 1] >> low
+    return b.reshape(h, -1)
+
+
+def mosaic(rgb, pattern):
+    """Lấy mẫu ảnh RGB thành mặt Bayer theo `pattern` (dùng để tự kiểm tra demosaic)."""
+    (ry, rx), (by, bx) = BAYER_OFFSETS[pattern]
+    raw = rgb[..., 1].copy()
+    raw[ry::2, rx::2] = rgb[ry::2, rx::2, 0]
+    raw[by::2, bx::2] = rgb[by::2, bx::2, 2]
+    return raw
+
+
+if __name__ == "__main__":
+    # Tự kiểm tra trên dữ liệu tổng hợp: python PixelConverter.py
+    rng = np.random.default_rng(0)
+    h, w = 64, 96
+    for fmt in ("Mono10p", "Mono12p", "Mono10Packed", "Mono12Packed"):
+        _, _, bits, packing = parse_pixel_format(fmt)
+        values = rng.integers(0, 1 << bits, size=(h, w), dtype=np.uint16)
+        raw = pack(values, bits, packing)
+        out = PixelConverter(fmt).convert(raw)
+        assert out.shape == (h, w) and np.array_equal(out, (values >> (bits - 8)).astype(np.uint8)), fmt
+        print(f"{fmt:14s} OK  {raw.shape} -> {out.shape}")
+
+    values = rng.integers(0, 4096, size=(h, w), dtype=np.uint16)
+    out = np.empty((h, w), np.uint8)
+    assert PixelConverter("Mono12").convert(values, out) is out and np.array_equal(out, values >> 4)
+    print("Mono12         OK  dịch bit vào buffer có sẵn")
+
+    bgr = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+    assert np.array_equal(PixelConverter("BGR8").convert(bgr), bgr[..., ::-1])
+    print("BGR8           OK  đảo kênh")
+
+    # Demosaic: ảnh mượt (gradient) -> nội suy tuyến tính gần như chính xác ở vùng trong
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float64)
+    scene = np.stack([40 + 2 * xx, 60 + yy + xx, 220 - 2 * yy], axis=-1).clip(0, 255).astype(np.uint8)
+    for pattern in BAYER_OFFSETS:
+        conv = PixelConverter(f"Bayer{pattern}8")
+        raw = mosaic(scene, pattern)
+        rgb = np.empty((h, w, 3), np.uint8)
+        conv.convert(raw, rgb)
+        err = np.abs(rgb[2:-2, 2:-2].astype(int) - scene[2:-2, 2:-2]).max()
+        assert err <= 2, (pattern, err)
+        # 12-bit packed cùng cảnh -> cùng kết quả 8-bit
+        raw12 = raw.astype(np.uint16) << 4
+        rgb12 = PixelConverter(f"Bayer{pattern}12p").convert(pack(raw12, 12, "p"))
+        assert np.array_equal(rgb12, rgb), pattern
+        print(f"Bayer{pattern}8/12p  OK  sai số vùng trong {err} (lớn nhất 2)")
+    print("Tất cả kiểm tra đều đạt" + ("" if cv2 is None else " (demosaic bằng OpenCV)"))
@@ -0,0 +1,131 @@
+# Preview.py
+# Pipeline ảnh xem trước: thu nhỏ về đúng độ rộng hiển thị, chuyển Bayer/mono -> RGB 1 lần,
+# rồi encode JPEG/WebP với chất lượng tự điều chỉnh theo bitrate mục tiêu.
+# Chỉ dùng cho hiển thị; frame full-res trong ring buffer vẫn giữ nguyên cho capture/phân tích.
+import math
+from io import BytesIO
+import numpy as np
+from PIL import Image
+from PixelConverter import BAYER_OFFSETS, bayer_pattern, bit_depth
+
+try:
+    import cv2  # Không bắt buộc, có thì resize INTER_AREA nhanh hơn
+except ImportError:
+    cv2 = None
+
+def to_uint8(img, pixel_format=None):
+    """Đưa ảnh 10/12/16-bit về 8-bit bằng dịch bit (không dùng float)."""
+    if img.dtype == np.uint8:
+        return img
+    shift = max(bit_depth(pixel_format) - 8, 0)
+    return (img >> shift).astype(np.uint8)
+
+
+def bayer_to_rgb_half(raw, pattern="RG"):
+    """
+    Demosaic kiểu superpixel: mỗi ô 2x2 -> 1 pixel RGB (R, trung bình 2 G, B).
+    Kết quả có kích thước H/2 x W/2, đủ cho xem trước và nhanh hơn nhiều so với demosaic đầy đủ.
+    """
+    (ry, rx), (by, bx) = BAYER_OFFSETS[pattern]
+    h, w = raw.shape[0] // 2 * 2, raw.shape[1] // 2 * 2
+    raw = raw[:h, :w]
+    r = raw[ry::2, rx::2]
+    b = raw[by::2, bx::2]
+    g = (raw[ry::2, bx::2].astype(np.uint16) + raw[by::2, rx::2]) >> 1
+    return np.stack([r, g.astype(raw.dtype), b], axis=-1)
+
+
+def area_downscale(img, target_width):
+    """
+    Thu nhỏ kiểu area (trung bình khối) về độ rộng <= target_width, vectorized NumPy.
+    Có OpenCV thì dùng cv2.INTER_AREA để ra đúng độ rộng.
+    """
+    h, w = img.shape[:2]
+    if not target_width or w <= target_width:
+        return img
+    if cv2 is not None:
+        target_height = max(int(round(h * target_width / w)), 1)
+        return cv2.resize(img, (int(target_width), target_height), interpolation=cv2.INTER_AREA)
+    f = -(-w // int(target_width))  # hệ số nguyên, làm tròn lên để không vượt target_width
+    hh, ww = h // f, w // f
+    # Cộng dồn f*f ảnh con lấy mẫu cách f (nhanh hơn reshape+sum nhiều lần vì truy cập liền mạch hơn)
+    acc = np.zeros((hh, ww) + img.shape[2:], dtype=np.uint32 if img.dtype != np.uint8 or f > 16 else np.uint16)
+    for dy in range(f):
+        for dx in range(f):
+            acc += img[dy:hh * f:f, dx:ww * f:f]
+    acc //= f * f
+    return acc.astype(img.dtype)
+
+
+class AdaptiveQuality:
+    """
+    Điều chỉnh quality JPEG/WebP để số byte mỗi frame bám theo bitrate mục tiêu.
+    Kích thước file tăng gần theo hàm mũ của quality nên bước chỉnh tỉ lệ với log(mục tiêu/thực tế).
+    """
+    def __init__(self, target_bitrate=8e6, fps=15.0, quality=80, min_quality=30, max_quality=95, gain=12.0):
+        self.target_bitrate = target_bitrate
+        self.fps = fps
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.gain = gain
+        self._q = float(quality)
+
+    @property
+    def quality(self):
+        return int(round(self._q))
+
+    @property
+    def target_bytes(self):
+        return self.target_bitrate / 8.0 / max(self.fps, 1e-3)
+
+    def update(self, size_bytes):
+        """Cập nhật sau mỗi frame đã encode, trả về quality dùng cho frame kế tiếp."""
+        if size_bytes > 0 and self.target_bitrate:
+            step = self.gain * math.log2(self.target_bytes / size_bytes)
+            step = max(min(step, 10.0), -10.0)
+            self._q = min(max(self._q + step, self.min_quality), self.max_quality)
+        return self.quality
+
+
+class PreviewPipeline:
+    """
+    Frame full-res -> ảnh xem trước đã encode (bytes).
+      1. đưa về 8-bit (10/12-bit)
+      2. Bayer: demosaic superpixel (đã giảm 2x) ; mono giữ 1 kênh (JPEG mono nhỏ hơn RGB)
+      3. area downscale về display_width
+      4. encode JPEG/WebP, quality chỉnh theo bitrate mục tiêu
+    Có hàm encode(array) giống StreamServer.JpegEncoder nên dùng thay thế trực tiếp được.
+    """
+    def __init__(self, display_width=960, pixel_format=None, fmt="JPEG",
+                 target_bitrate=8e6, fps=15.0, quality=80):
+        self.display_width = display_width
+        self.pixel_format = pixel_format
+        self.fmt = fmt.upper()
+        self.rate = AdaptiveQuality(target_bitrate=target_bitrate, fps=fps, quality=quality)
+        self._buffer = BytesIO()
+
+    @property
+    def quality(self):
+        return self.rate.quality
+
+    @property
+    def max_width(self):
+        return self.display_width
+
+    def prepare(self, array):
+        """Trả về ảnh uint8 đã thu nhỏ và ở dạng hiển thị được (mono hoặc RGB)."""
+        img = to_uint8(array, self.pixel_format)
+        pattern = bayer_pattern(self.pixel_format) if img.ndim == 2 else None
+        if pattern is not None:
+            img = bayer_to_rgb_half(img, pattern)
+        return area_downscale(img, self.display_width)
+
+    def encode(self, array):
+        img = Image.fromarray(self.prepare(array))
+        buf = self._buffer
+        buf.seek(0)
+        buf.truncate()
+        img.save(buf, format=self.fmt, quality=self.rate.quality)
+        data = buf.getvalue()
+        self.rate.update(len(data))
+        return data
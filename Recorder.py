@@ -0,0 +1,222 @@
+# Recorder.py
+# Ghi stream ra đĩa dạng raw, memory-mapped, cấp phát trước dung lượng.
+#
+# Cấu trúc file .bcraw:
+#   [header 4096 byte][bảng metadata: capacity x META_DTYPE][căn 4096][frame 0][frame 1]...
+# Frame k nằm ở data_offset + k * frame_bytes nên đọc ngẫu nhiên frame k không cần quét file.
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+MAGIC = b"BCRAW01\0"
+VERSION = 1
+HEADER_SIZE = 4096
+PAGE = 4096
+# magic, version, header_size, width, height, channels, dtype, pixel_format,
+# capacity, frame_bytes, frame_count, meta_offset, data_offset
+_HEADER = struct.Struct("<8sIIIII8s32sQQQQQ")
+META_DTYPE = np.dtype([
+    ("seq", "<i8"),
+    ("timestamp", "<i8"),     # TimeStamp của camera (tick)
+    ("host_time", "<f8"),     # time.perf_counter() lúc host nhận frame
+    ("exposure", "<f8"),      # ExposureTime (us)
+    ("gain", "<f8"),          # Gain (dB)
+    ("valid", "<u4"),         # 1 = frame đã ghi xong
+    ("_pad", "<u4"),
+])
+
+
+def _align(n, a=PAGE):
+    return (n + a - 1) // a * a
+
+
+class RawRecorder:
+    """
+    Ghi frame vào file raw memory-mapped cấp phát trước cho `capacity` frame.
+
+    submit()/submit_from_ring() chỉ giữ chỗ (slot k) rồi giao việc chép dữ liệu cho
+    pool luồng ghi, nên luồng grab không bị chặn bởi I/O.
+    """
+    def __init__(self, path, shape, dtype=np.uint8, capacity=1000, pixel_format="", workers=2):
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.capacity = int(capacity)
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        height, width = self.shape[:2]
+        channels = self.shape[2] if len(self.shape) > 2 else 1
+        self.meta_offset = HEADER_SIZE
+        self.data_offset = _align(self.meta_offset + self.capacity * META_DTYPE.itemsize)
+        total = self.data_offset + self.capacity * self.frame_bytes
+        with open(path, "wb") as f:
+            f.truncate(total)
+            try:
+                os.posix_fallocate(f.fileno(), 0, total)  # giữ chỗ trên đĩa, tránh phân mảnh khi ghi
+            except (AttributeError, OSError):
+                pass
+        self._header_values = [MAGIC, VERSION, HEADER_SIZE, width, height, channels,
+                               self.dtype.str.encode(), pixel_format.encode()[:32],
+                               self.capacity, self.frame_bytes, 0, self.meta_offset, self.data_offset]
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r+", shape=(total,))
+        self._mm[:_HEADER.size] = np.frombuffer(_HEADER.pack(*self._header_values), dtype=np.uint8)
+        self.meta = np.ndarray((self.capacity,), dtype=META_DTYPE, buffer=self._mm,
+                               offset=self.meta_offset)
+        self.frames = np.ndarray((self.capacity,) + self.shape, dtype=self.dtype, buffer=self._mm,
+                                 offset=self.data_offset)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="RawWriter")
+        self._lock = threading.Lock()
+        self._count = 0
+        self._closed = False
+        # Thống kê
+        self.frames_written = 0
+        self.frames_dropped = 0  # hết chỗ, sai shape hoặc bị ghi đè trong ring trước khi kịp ghi
+
+    @property
+    def is_full(self):
+        return self._count >= self.capacity
+
+    def _reserve(self, shape, dtype):
+        with self._lock:
+            if self._closed or self._count >= self.capacity or shape != self.shape or dtype != self.dtype:
+                self.frames_dropped += 1
+                return -1
+            k = self._count
+            self._count += 1
+            return k
+
+    def _finish(self, k, seq, timestamp, host_time, exposure, gain, ok):
+        self.meta[k] = (seq, timestamp, host_time,
+                        np.nan if exposure is None else exposure,
+                        np.nan if gain is None else gain,
+                        1 if ok else 0, 0)
+        with self._lock:
+            if ok:
+                self.frames_written += 1
+            else:
+                self.frames_dropped += 1
+
+    def submit(self, array, seq, timestamp=0, host_time=0.0, exposure=None, gain=None):
+        """
+        Ghi 1 frame (array phải còn hợp lệ tới khi ghi xong, ví dụ bản copy riêng).
+        Trả về chỉ số slot k hoặc -1 nếu bị bỏ.
+        """
+        k = self._reserve(array.shape, array.dtype)
+        if k < 0:
+            return k
+
+        def job():
+            np.copyto(self.frames[k], array)
+            self._finish(k, seq, timestamp, host_time, exposure, gain, True)
+        self._pool.submit(job)
+        return k
+
+    def submit_from_ring(self, ring, seq, exposure=None, gain=None):
+        """
+        Ghi frame `seq` lấy thẳng từ FrameRingBuffer: luồng ghi chép từ slot của ring vào
+        file qua ring.read_into (1 lần copy, không qua bộ nhớ tạm, có kiểm tra seqlock).
+        Nếu slot đã bị ghi đè (hoặc ROI/PixelFormat vừa đổi) thì frame bị tính là mất.
+        """
+        spec = ring.frame_spec()
+        if spec is None:
+            return -1
+        k = self._reserve(*spec)
+        if k < 0:
+            return k
+
+        def job():
+            frame = ring.read_into(seq, self.frames[k])
+            if frame is None:
+                self._finish(k, seq, 0, 0.0, exposure, gain, False)
+            else:
+                self._finish(k, seq, frame.timestamp, frame.host_time, exposure, gain, True)
+        self._pool.submit(job)
+        return k
+
+    def close(self):
+        """Chờ luồng ghi xong, cập nhật số frame trong header và flush xuống đĩa."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._pool.shutdown(wait=True)
+        self._header_values[10] = self._count
+        self._mm[:_HEADER.size] = np.frombuffer(_HEADER.pack(*self._header_values), dtype=np.uint8)
+        self._mm.flush()
+        # Bỏ tham chiếu để mmap được đóng khi không còn view nào dùng tới
+        self.frames = self.meta = self._mm = None
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "capacity": self.capacity,
+            "reserved": self._count,
+            "frames_written": self.frames_written,
+            "frames_dropped": self.frames_dropped,
+        }
+
+
+class RawReader:
+    """
+    Đọc file .bcraw: reader[k] trả về (frame, metadata) của frame k, truy cập trực tiếp
+    theo offset nên không phải quét file. Frame là view memory-mapped (chỉ đọc).
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            values = _HEADER.unpack(f.read(_HEADER.size))
+        (magic, version, _, width, height, channels, dtype, pixel_format,
+         capacity, frame_bytes, frame_count, meta_offset, data_offset) = values
+        if magic != MAGIC:
+            raise ValueError(f"{path} không phải file BCRAW")
+        if version != VERSION:
+            raise ValueError(f"Không hỗ trợ BCRAW version {version}")
+        self.width, self.height, self.channels = width, height, channels
+        self.dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        self.pixel_format = pixel_format.rstrip(b"\0").decode()
+        self.capacity = capacity
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        self.meta = np.ndarray((capacity,), dtype=META_DTYPE, buffer=self._mm, offset=meta_offset)
+        self._frames = np.ndarray((capacity,) + shape, dtype=self.dtype, buffer=self._mm, offset=data_offset)
+        # frame_count = 0 khi recorder chưa close (vd. bị ngắt giữa chừng): dựa vào cờ valid
+        if frame_count == 0:
+            valid = np.flatnonzero(self.meta["valid"])
+            frame_count = int(valid[-1]) + 1 if len(valid) else 0
+        self.frame_count = frame_count
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += self.frame_count
+        if not 0 <= k < self.frame_count:
+            raise IndexError(k)
+        return self._frames[k], self.meta[k]
+
+    def export(self, out_dir, fmt="PNG", start=0, stop=None, workers=4):
+        """
+        Xuất các frame hợp lệ ra ảnh nén lossless (PNG hoặc TIFF) bằng pool luồng.
+        Trả về danh sách đường dẫn đã ghi.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        fmt = fmt.upper()
+        ext = {"PNG": "png", "TIFF": "tiff"}[fmt]
+        options = {"compression": "tiff_deflate"} if fmt == "TIFF" else {"compress_level": 1}
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+
+        def job(k):
+            frame, meta = self[k]
+            path = os.path.join(out_dir, f"frame_{k:06d}_seq{int(meta['seq'])}.{ext}")
+            Image.fromarray(np.ascontiguousarray(frame)).save(path, format=fmt, **options)
+            return path
+
+        indices = [k for k in range(start, stop) if self.meta[k]["valid"]]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(job, indices))
+
+    def close(self):
+        self._frames = self.meta = self._mm = None
@@ -1,23 +0,0 @@
-# Resource.py
-LOGO_BASE64 = """
-iVBORw0KGgoAAAANSUhEUgAAAdgAAAF5CAYAAAA8mTvSAAAACXBIWXMAAC4jAAAuIwF4pT92AAAAGXRFWHRTb2Z0d2FyZQBBZG9iZSBJbWFnZVJlYWR5ccllPAAAHl5JREFUeNrs3b9vJGlex/GaYe64AyQbcRIgreReUiTGt4jYvYgf4XgTMnBPQkAyPonohLS9Epp0eyUSCJi2RIZgPeIP2HaIhPY8AYiIbSdIJ11gE4AA6czzjJ++9Znxj656quvX6y3Vtc873e7+Vj3P53lXPfX0o8vLywLD5NHLL7fDw27a4s/j9J/i/99SIWB4fPfnf/TDf/yN3/9llajOEyUYVKDuphAdpxDdURUA1/nrX/tL4ZqHMwHbf0PdT9uYlQK4z15//Rf+XsDmYSpg+xmskxSqz1QDAHvdvL1+48PLuYDtT6iO4ogpBStTBcBeG7TX+D8CtvvBOk47c081ALDXdtirgBWsAMBea7BXAStYAYC91mCvArZbwTpKwXqgGgDYa7vtNfJYPToRrofh4VS4AmCv3bBXBtsNa407zOlgAOy13Uxu/oLBtjdcJ8lahSsA9tpuToK9Lm7+ksG2L1i3k7VaJAIAe+0G03f9ksG2K1zj+sAL4QqAvXbbXgVsu8J1nML1qWoAqJM/2D77UbBXhajRXt/2676urhXhOgkPr1QCwCb499/8o+I73/xnhchjr+Pb/iODFa4ABsSf/NK//lC41m+vDLb5cJ0X7m0FwF57Z68MVrgCYK+owV4ZbHPhGldm+lQlALDXftorg20mXCfCFQB77be9MtjNh2v8MvTPVQIAe+23vTLYzYZrXERirhIA2Gv/7ZXBbi5c4/KHcV3hHdUAwF77b68MdnPMhSsA9joce2Wwm7FXM4YBsNeB2SuDrT9cd4UrAPbaCybrPkHA1stcCQA0xZ+NXvrGnDwcBXtdCtj22Ou08M04ANhrH5iWygHXYGsJ11F4+EolADSFa69Z7XVS5okMth7mSgCgMd36lX/6kXBt1l4ZbD32arUmAA12Qj/+r4vf+t1vf/tnztWiQXtlsPUwUwIATfEX7538j3Bt3l4FbH57jSMdC0oAaMxe//BX/3xLIbLZ61LA9mS0AwDstT/9uYBlrwDYKzLbq4BlrwDYK2rqzwUsewXAXpHZXgUsewXAXlFTfy5g2SsA9orM9ipg2SsA9oqa+nMBy14BsFdktlcBWy1ctwurNgFgr33gImyHuV9UwJYn7gwjRwDstfvMgr1mH6kI2PL2eqgSANhrL+y1lrORApa9AmCv7FXAslcAYK/tt1cBy14BdIyfffLfF3/83p/qg1purwKWvQLoGH/3/t9+UxXab68Clr0C6Ji9/t53Pv22SrTfXgUsewXAXtmrgGWvANirSnTDXgUsewXAXtmrgGWvANgrumGvApa9AmCv7FXAslcA7BXdsFcBy14BsFf2KmDZKwD2im7Yq4BlrwDY6xA4Kxr4/m4Be8doh70CYK+9YLppexWwt9vrKDwcqAQA9tp9ew3hOm/iDwvYW0Y7SgCAverPq/BE7dlrD4mzBU/Tz4trvz+/9nugtfzNzj/8XHj4T5WoTrDXhYA12kE53qTQfLtdfv+DhZKg+3wQtpfK0HVhu7y8VIWfttevVKLVxNmAx8lMFyFQz5UEQBthsOy1K5Y6j8EaAnWpHAAYLHtFeS5SqM5DqLpuCoDBsldksNVZCNW5UgBgsOwV1TmJgxyTlAAwWPYKwQoADJa9to6zFKxzpQDAYNkr8vBJcXWd1S02ABgse0UG4gSmiVnBABgse0VGaw3Bqt4AGOwA7HU3PPzAIVA7Z8laF0oBgMEOg5ndXztxhvC+a60ABOxw7HUcHvbs/lr5LATroTIAELDDYmrX18pzt98AELDsFfmI6wfH663HSgFAwLJX5AvXsVtwAOCKx+wVwhUABCx7Fa4A0A2pG8p9sMlev7DLs/Nd4QoAwzZY9pqf58IVAAYcsK691sL33IoDAAyWveblKISrlbAAYMgBy16zE78RxwpNAMBg2WtGVgtJWFsYAIYcsOw1O4cmNQGAgGWveXltUhMACNhor/vsNRtvTw0rAwAI2IhZrvk4dN0VAARstNdoWzt2bxZOnBoGAAG7YmrX5rNXJQAAActe83Jk1jAACFj2qpYAIGDZayfsdakMACBgGZdaAoCAZa/sFQAELOMaEhdqCQAClr3mZ8ZeAUDAstf89moFLAAQsOy1Bnu1JCIACFj2yl4BQMCyV/YKAAKWvbJXAMAAAzbY65S9slcAELB5w3W78C0v7BUABGx2Yrhu2X3sFQAELHtlrwAgYNkrewUADCZg2St7BQABy17ZKwAIWPbKXgEAQzVY9speAUDAslf2CgAClr0OiSl7BYANyOHl5WUX7HUpYLNwFsJ1pAwAwGDZa2Z7VQIAYLDslb0CAINlr+wVANABg2Wv7BUAGGx9xiVc2SsAMNiM9hpt6yu7h70CQFd5wrgGMIp6+eVCFQbDJAyolsrQTf73i0fj9ONu2Lbf8XMXmX7jw8tB9kGtM1j2CpTmJITrWBk6EaQxMMcpPONj7Pd2evhRz0K4jhgsewW6jrbT7lDdT2Eat6eOSQbLXgH2ivKWup+2ZwMswaDttY0GawQOaDtdD9Y40JmkYN1yTDJY9gqwV1QL1kkKlR3VYK9tM1gjcEDb6Vqorr5K06pzjsl2Gix7BdhrB8N1KljZaxcM1mgH0Ha6Eqzx2uqscCrYMdl2g2WvAHvtSLDGvmoetj3VYK8PoQ1rERvtAOU4VIKNhes0iYBw1Z93w2DZK1Cao2CvE2XYiLUeF8NZGIK99shgjXYAbaet4RoHMKfC1THZOYNlrwB7bXG4zsPDgUo8mDfBXneV4adpchax0Q6g7bQtWON9rQvWujbmA7yDRk4RB3vdNToEStvrUhlqCdfYLzklvD4nQ/06urYa7EzpAfbasnCNIWHRCMdkdw022Ou4MNUdYK/tCdd94cpeexGwRjuAttOicJ2Eh8+Fq2Oy8wHLXgH22qJwjf3RK5Vgr30xWKMdQNtpQ7jGa67HKuGY7EXAsleAvbYoXKN5OS3MXntjsEY7gLbTdLhuJ3MVro7JfgQsewXYa0uI4epr5thrrwzWaAfQdpq215mBvmOyVwHLXgH22oJwjfe6vlAJ9to3gzXaAdbnQtvJFq7xuutcJfTnvQpY9gqUZsZes2FSE3vtpcEa7QDl7NV63Xns9dAgX3/eu4Blr0Alez1XhsrhOhIK7LWvBuvABthrk8wLp4ZzMVGClgQsewXYa8P2qg/Kx1Gw16UytMdg50oLsNcGmSqBWvYuYIO9TgorpQDslb2yVwFrtAOwV8YFtWx1wLJXgL2yV/aKegzWaAdgr00yVwL9ee8Clr0C7LVhe9UHsdfeGqzRDsBeGZdaImfAsleAvbJX9op6DNZoB2CvjEstkTNg2SvAXtkre0U9BruvjMDanLFXxqWWAvY+xsoIrN+RsVf2yl77zaPLy8vyT3755Sg8fKWMwHr2GsJ1pAxZAnYpYLPxvoBtl8HqJIAS9qoE7JW9ClgA+e11rgwGKi0izmY/VAYBCwgFsNe8zIK9mg8gYAH2CgOVzPZqNntLA9aoBxAK7JW94h1UmkX89gVefnmpjMCD7HWkDFkCdilgs9nrSMC212Ajr5URYK/slb0if8AeKyNwr73OlaFyuG4XrhfmtFe17EjAXiglwF5rJt5KsqUM7HUwAZuWezMSAthr3fbqXk32OjiDLdLOOlNOgL2yV/aKKyrPIv7JC738chwevlBS4KfsdaQMWex1KWCz2auZwx0z2HiqeBEenispwF7ZK3tFRoO9ZrKT8PBKaTFw3oRB564ysFf2ymCzkSZ0PC/MLAbrAntlrwy2hhe++q7YGLZ7yoyBcRIGmmNlYK/slcHWQuhglqmT+TBsR0qNATFVAvbKXlGbwb7DaONoNAbubtq2q77me9/6j/e+8ejHT+xGtIVvPfrxv/3L4e/8tkqw1xYRb6HcFbCbZ2PhlBakOC4yLa0YGmAMa7cFoW1MwtGuCuy1TUyFa88NtoYR7qJwfRft4iR0ZGNlYK9tstdwTI6UoRked7QBjoUr2mgKSsBeHZPotMGyV7BX9gr2ymDZK5gC2KtjksF2ImBPw8NTuw7stXf2Gm3rVMCyVwbbTAOcCFcwhV7XUbg6JhlsQwG7DA87dhvYay/t9SuVYK8Mtjl7Fa5gCuoItWSw7BXsFeyVvTJY9gowBXVUSwzLYNkrWsjrYAr7ysBe2Ss6a7DsFS3F970yLrVEtw2WvaKFHAVTmCgDe2Wv6KzBslcwBXWEWjJY9gr2CvbaBG/CMbmrDAyWvYIpQB3zYj6AgNUA0Qt7XSpDFns9UIksxHuxF8ogYNkrWBfUUS0FrIMGYK/slb2iRwHLXmHQp45QSwHroAF7xcMHz7vslb0K2OYa4JS9wqCvt8yUwDEpYJsJ1+3CdHOw177a6zg87KkEexWwzRDDdcsuAVNQR6ilgGWvYK9gr+wVrTZY9gqmoI5QSwHLXjEAPmOv7JW9ousGy17RNi6YAuNSS3Q6YNkrWsosmMK5MrBX9oouGyx7RRvt1f2ajEst0d2AZa9gr+wV7FXAslewVzCuppgogYBlr2CvYK95cS+2gGWvYK9gr2qJRgOWvYK9slewVwHLXsFewbjUEu0PWPYK9spewV4FbH0jMvYK9tpP5krAXtFAwIbR7Sg8vFBysNde2uskPOyoBHtFMwZrRAb2yriglgK2Bns9UG6wV/YK9ipgjcjAXqF9qyXaG7DsFeyVvYK9ClgjMgyDs9CROS61b7VEdwOWvUJHxl7BXgWsjgzDsde5MmjfaonOBix7hY6MvYK9ClgdGdgrtO8miLPZLR8rYNkrhALYa2bMZhewOjKwV2jfNdire7EFLHuFUAB7Za9o2mB1ZGCvBipgrwKWvUIogL2yV+Tn0eXlZc4GeBwenikrWmavI2Wo3La3w8Oy8H3Ouex1JGAZ7DoNcCxcwV57y6FwZa9oyGBDwC7Cw56Sgr2yV7BXZDLYZK/CFeyVvYK9IqfBslewV/YK9orMBstewV7ZK9grajBY9ooWchI6srEysFf2is4aLHsFe2WvYK+owWDZK9hrb+11FB5OBWwWzAdgsOwV7BVfG5dwzcZECQSsjgx9sNeFMlS21/3CojG5eO2YFLDsFewVq4lNc5XIwgV7FbA6MrBXrIjh6tRwHiYmNglY9gr2itW35Tg1nIfPQrgeK4OA1ZGBvQrX3cL3k+bijX4SawcsewV77WW4xuuu0bacGq5OvO6679QwyhisjgzstX/EcPVF6nmI4bpUBqwVsOn6DHsFe+2Xvc6162w8N9hDWYPVkYG99itcY5s+UIksxElNc2XA2gGb7NUpJLDX/oRrbNMfq0QWjkK4HioDyhqsjgzstV/h+kolsoXrRBlQKmDZK9ircIVwRT0GqyND27C+a7lwnQpX4YrN8YS9ooO43rV+uM4LE5py8b0QrhblQLWAZa9oqTksleHBwbpaRMKtONWJi0gcmi2MygHLXtFSDPoeHq5x+cMYBk9VozJnxdUiEqdKgYfyWEcG9trLcI0D5IVwzcJJ2HaFK7IYLHsFe+1ssK6+z9W34uTB9VbkDVgdGdhrJ8N1nMLV4Lg68RtxJqwVWQOWvYK9staB80kIVscbajFYBxbYa3fC9TC1WV81V52TZK2ONeQPWPYK9tqZYJ2kumiv1Ymngw8tXoK6DVZHBvYqWIdCvPVm6r5W1B6waRk1jRbstX2hGq+x7gvWbMRTwXPBio0EbGrAlp8De21XsO6mdhnD1TXWDMdT2GZmBmPTBnuoAYO9tiJURylQJ4VFIrLZatiOQ7CeKwc2GrDsFey18VAdp1AdC9UsvC6u1l9euH6Ppg2WvYK9bi5M42nf65tF+KsRF+CPp3wXKVAXSoK2BSzQJj7pmnkkC71ODM/ttK1+ZqflOUmPMUzPU6AuGSrazKPLy0tVANCmQcq5iUgQsAAA4J08VgIAAAQsAAACFgAAAQsAAAQsAAACFgAAAQsAAAQsAAACFgAAAQsAAAQsAAACFgAAAQsAAAQsAAACFgAAAQsAAAQsAAACFgAAAQsAAAQsAAACFgAAAQsAAAQsAAACFgAAAQsAAAQsAAACFgAAAQsAAAQsAAB18KTuP/Do5Zfb4WE3bfHncfpP8eendzz1LGzL9PMibOdhO43b5fc/OLfrADRB6tP20xb7tZ1b/ulF6Ku2VWzAx8rl5WUdB984HXzjOw6+Kpyl0I3bscAFsKFgPUzb1gOechL6prHKCdgcB98kheqzBj7H6xi0whZATeG6m/qYdYThk9AfTVVvuDypeNCtRnSTmkz1oTxL26T4+hQ0AOQK18UDrRWoHrDhoIvBOnXQoccd6yg8xG01j6Aovp5LEH8/CYayUKneHwPCFZsJ2DSamxd3T1ACutB5riar3AzRPdVB4q+EKzYSsMlaP1U29IQYqK/KPpm9DoJvKgFqDdg00p+F7aDG93JRXN2Gc9/tOwAAdD9gU7guModeDNPj9LrxvtbTW/72OFlGfHxmdwEAehGwNYTrRTLh2UNup0mn4OI2S+9lUlzNWt6x6wAAXTbYecZwPYrhWPY+1fS8WQrbafHwm70BANg4j++w1xhiuU7LPg8BOcm1CES6eXtUXC0wAQBANww2Xfv8OGO4znO/8RTW++G97ifTbsRmr621PE6/Gt/xz1frKS+LO64994l0LI3TgGh0yz9bpJosQk2WmmWt++H67UjzOtrmHe9hVHy9LvnN4yHeGnV9/fHVcXGejotTexGdD9gUGLka3fO6G3B4/ePUcI832FHEDmKSOqx1T6E/u/Y6P5nstcmO7trfn9wRevexvO09p0HPpHj4GZC9a899U1xdCsi27OUdn3NU8XWnd/znxbq38VwLwbJtYfqO14ufff+WAehig20lvof75k7s3Pg3e+9oK/G4OC6AjhrstMgziehoU6GROuJx6tjrtoBpkW8hgtjpxVufDsJrz4o1JoBlYrvCmYqTmwOxVP9ZxeMnDljivanTeN91ps50UtSzeMR9tVvU8Jp3Mb0xSG5s5n0a1BwW+eZwXG8rZ+nzzaw9jjbz+EajiCP6Fxle9yw1ro1S18g2jsLDFjvLL4r6VvnZSp3r8h4zyslppvpshy3W/vMi3wzv+Dqfh9edD6Ux5li44trM/0bCNQ5Cw3aaBkl13c++k9rKad2DaiBbwK5GwBk47MvIMq1e9YNic8vnvQ3a2EmlAU/b61N3h36QOmw8fF88bejvz9IgdFN/fzUIm9n7aHXAps48x0pNJ325RpLsqamlIZ+mEfpYh148HZLJVhnYNhGu6QxGHAS9aOhzv4hnmNLxCLTSYCeZXnPah8KkDr3qgCNO2LmoaLNfpOtZbeR4gx36gdOBDwrYQVnzNeIZJiGLXgfsmz4sgF4xXOP15zh7+lHYdsMWG/z7Yfukwlt6lWZjtom9YvPfOuNU4P0Dsq6E60VqE99NbeVR+PnD4mpBmrI8dYygTTxJDSV23jkmp3T+4E4TjMqGa5w5/f8GKunezmmaCDQv2SHF0fl44PcD7kSLLXEJYl68e0bvqOJZirsGTYs+74iK4RrP7IxvztNYLY2arqkel+yT3l6zD68laNGOgC2u7lHLwXHHO41Yh7K3SbwzXG90IKtrqssSthH//TyF7JBvTdhf9zi7437dcZWAvXnf6cCY5QzXd7ST3ZLtpFgNZi1agqZZnSIeZ3itky53/BUX2Di7L1yvdR7nFQY0sUPrUqf+pobXHGu2rRiIlhmYxNPC+w/8oo8q7WSryLdYDlA5YHNcS1v0YERe9hrWWqGXToWdlPxbL1o8szheP/todU0tXYOO19ZW16AvMvwN36RUbqDzWdoH8TrnR+nntdtsxYHobB2rTO2k7DXZvTbPwMcweJJx8kxnA7biqcKLkitWzSsMbKYtM7mVmSxu6ShjpzpNk8cqzzyOx6y1aR884JneEmrHFY69sgPRWcnnlG2bh0XPr4Wj/Qaba1p7lzu8aYXnlhrNp1Aua3RtGp3HzzB+yOzx1NFPMvxNt2Lcv09W32C1zPWiFVd6e13mElIaSJ2V/JvPurBYC/odsFk66q5ef00NsMop8uOGnnvYkhJO17HJ9G+PNL1aOaxpHfDDho71Khbq3mk0GrA5OOlwDSoFVcX7fqs8tw2j87OSt0MsNL3aOKnxSzYmDR3ry4beM9CKgO0yVUa4VQcWiwbfew7KWsnSYVffGYU6XjStJlb22utZxVPVVdrJU6s7ocmAzTHJqaunh6susFEpIFOnU2VmbdMBe7rh5+FuLmpcSW3ckIE2/d6BSgGbY3TX1Q6zasNbNly7vYbrV+rz+w7P2ljU+Nr7DR3jOb7Gb9ehgaYCdsi0IWArvYZ7/VD3QDdd66+yzvF5x9s5UIonA//8o64HbIbPANRtgKOGB4LaCARsA1Ra8KAla53qPND2gD0o8nzXdFms/oVGMIu4eRYNd35A7wdxFpxAUwG7yPA6ux1scOOe7EO3IEDADuMzYKAGO8RO/szhAwCoO2CHyFIJAAB3BWyOqf17Sgn0lj5c53cpBRsnziLOco9aXI7MAgJAL9mq+Pw2rFUuYNFIwOa6OT2OchcDqt3I4YOBEOcblL7VJQy8x0qIIfI4WedFhtfq2mmkZcXnu7cOQ6FSW7HaGAYbsOkxh8V2qhG1ZJEIAEDPA3YxtIBtEVXN3zfTAEDPDXarg6eCKk2+yPQ9k1Vfw8Qy1E3V/mGkhBhswF5+/4PjTK836djnXzZsn23o/IC624mAxaANNvI6w+vtZ7K6IYXTuAefAQy27QNRoNGAzWGx8X65/Q59/qodxzjDe6gyILkwWQsCFuhGwOa4XWfaFYsN4bSo+JlHGd5Gla/MWziEsYF2Eq/zv6nwEju+zQaDDtjUiHJYbLw/9LBDNagSUpU6jdDpVB3ZHzuEsSGqHmv7SoghG+xb+8z0uocZwqMLHUfVNZgFLLrCvOLzJ0qIQQdsup53lOF147XY+SZPFce/Fba1BwjhM8eO46LC3x1XeNtVnvva2s/YFKlvqHJb21OniTF0g81psfHa4mxD4bpaB7lsYFV5n/sNPXfm8EXHLHa6of5gu2N3M2AoAZtGqp9kev2DcKDPa25MkxSuVSYLVbHY/ZLve78o/y0lJ2mCFrBJi43t5KxifzCuuT/YTv3BxB5DGw02NqQ40nyT6W+8DdncI8o0So3XIF8VFb9OKw0qyhrhTslOo4q9Th26aIiqwVXbpaPUDpdpsD2yq9DKgL3WkC4y/Z2DOKrMNfEpWWtsSM8y1mJWYXQ+XfP9j1JNyvCavbaDDk3ky2mx8dirsijNTuoLcg+4Yxv84tpg2723aG/AhoYUby7PebtNHFX+INnsqGQjmoRtmcNa3/F5zyt83r0U+g8exZf8OxeFU1+tt7l4fPf8K9omRbVTxU9TyFa2zHipJfUJH99skw5PNM2Te0InhmGRAi0X0dziaeM3KWgWKcxvM704Et1P21adxYhrMoe/+Vn48UWJp7+KtUrXqe7qEOYVGv/EzOFW8SK1j9XtUtvpOI3HeJzH0MszDfEYTHMIFhXaZAzZ02Se83WP6zSgPSzumHsRzzDc1rcAjQdsjSG7amCfpoawsrPTax3V04Y6j9U9vGVC8FV67vRmh5GMZlbhc30v45cy4IpljpAtOSDresieppD7vMLLbKU+YJrmU8Tt9F3Lf6Z2FbfxGoPt3cJa3WhzwN4I2VmNFrlVtOe0zmp0XiYMXySzeZ0a93bqFKoMGI7CPnBbTv6QWIb9FE917qhGqfrFMz4fFVdnorYqtv2DtK0G3JGTin2C67BolMdrNKZ5Coo3fS9Kss+qnzVOwPo4BW6VcP0svJ+JQ7U25kpQLWRTWzmr4eWbXikN2EzApsYUT9/EgzZeX7roc2FiyKbP+llDbyHW93k8Ze0wrZVZ34/lDbSV0xRmr1v21iw2ge4E7LUGNU0N6qhFnyV2ktmvUaaA+6imEfptxFNju/dNmEKegVRhZnauAWm8tPLhhtvKbe3nwzRABroVsKlBLdOpy19MRttUo4qj5o/Ce9mu6zplOg22CXM/S9Y67vP3vLZtTdq0f5/rDrLUMt4VMEr13OTlpNgu49mm91P7WdgbaJonGRpUNIBotNM00y+G7riobxZwDKFF2o43ddvK6nOGzxhDfD99zr1MHUPs4OcNdApVT6GNNvy8Fau1p3Pu3ziRL57qnFXcr6/Tcbn22YcMiy+05pRo+vzzmvuEVds5bukMewYtYLM2qp8sTpE6i9W0+tXP695+s/r2jtiZRqNbNG12KWhXncdqhvA4fb4YHPfNSH2TPstp+jxNjrTHGZ4/L/G8qh3Pbk37Nu6TcQqF/Wv7deuODv50tS/T/jxveH+0zWiv9wmjVM/da+/1oYOZ2G7Or9X7tAP3uI4LDJr/E2AAWFQaSHgQsl4AAAAASUVORK5CYII=
-"""  # This is a placeholder for the actual base64 encoded logo data.
-
-import base64
-def get_logo_base64():
-    """Returns the base64 encoded logo."""
-    return LOGO_BASE64
-
-def convert_logo_to_base64():
-    """Converts a logo image to base64 encoded string."""
-    with open('src\logo1.png', 'rb') as f:
-        data = base64.b64encode(f.read()).decode('utf-8')
-    print("Logo converted to base64:")
-    print(data)
-
-if __name__ == "__main__":
-    convert_logo_to_base64()
-    print("Logo base64 string has been printed.")
-    # You can also call get_logo_base64() to retrieve the logo base64 string.
-    logo_base64 = get_logo_base64()
-    print("Logo Base64:", logo_base64)
\ No newline at end of file
@@ -0,0 +1,126 @@
+# SettingsCache.py
+# Cache giá trị/giới hạn node GenICam để get_settings không phải đọc lại thiết bị mỗi lần rerun.
+import threading
+from pypylon import genicam
+
+_MISSING = object()
+LIMIT_ATTRS = ("Min", "Max", "Inc")
+# Ghi các node hình học thì giá trị (không chỉ giới hạn) của các node sau cũng có thể đổi theo:
+# camera tự kẹp Width/Height/Offset khi đổi binning/PixelFormat, frame rate tối đa đổi theo ROI
+_GEOMETRY_NODES = {"PixelFormat", "BinningHorizontal", "BinningVertical", "DecimationHorizontal",
+                   "DecimationVertical", "Width", "Height", "OffsetX", "OffsetY"}
+_GEOMETRY_DEPENDENTS = {"Width", "Height", "OffsetX", "OffsetY", "AcquisitionFrameRate", "ResultingFrameRate"}
+
+
+class SettingsCache:
+    """
+    Cache (node, thuộc tính) -> giá trị. Lần đầu đọc từ camera (miss), các lần sau lấy từ cache (hit).
+
+    Entry bị xoá khi:
+      - ghi node qua BaslerCameraAPI (invalidate_after_write): xoá giá trị node đó và mọi Min/Max/Inc,
+        vì giới hạn của node khác thường phụ thuộc vào nó (Width -> OffsetX.Max, ExposureTime -> FrameRate.Max);
+        ghi Binning/Decimation/PixelFormat/Width/Height/Offset còn xoá giá trị Width/Height/Offset và
+        frame rate (camera tự kẹp lại, không phải camera nào cũng báo qua callback)
+      - GenICam báo node thay đổi (genicam.Register callback) nếu camera có node map thật
+    Node có chế độ Auto đang bật (ExposureAuto/GainAuto != Off) luôn được đọc trực tiếp.
+    """
+    _AUTO_NODES = {"ExposureAuto": "ExposureTime", "GainAuto": "Gain"}
+
+    def __init__(self):
+        self._camera = None
+        self._entries = {}
+        self._callbacks = {}
+        self._volatile = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def bind(self, camera):
+        """Gắn cache với camera mới (xoá toàn bộ entry và callback cũ)."""
+        self.unbind()
+        self._camera = camera
+
+    def unbind(self):
+        for handle in self._callbacks.values():
+            try:
+                genicam.Deregister(handle)
+            except Exception:
+                pass
+        with self._lock:
+            self._callbacks = {}
+            self._entries = {}
+            self._volatile = set()
+        self._camera = None
+
+    def _register_callback(self, name):
+        """Đăng ký callback GenICam để biết khi node đổi giá trị (bỏ qua nếu không hỗ trợ)."""
+        if name in self._callbacks:
+            return
+        self._callbacks[name] = None
+        try:
+            node = self._camera.GetNodeMap().GetNode(name)
+            if node is not None:
+                self._callbacks[name] = genicam.Register(node, self._on_node_changed)
+        except Exception:
+            pass
+
+    def _on_node_changed(self, node):
+        try:
+            self.invalidate([node.GetName()])
+        except Exception:
+            self.invalidate()
+
+    def get(self, name, attr="Value", default=None):
+        key = (name, attr)
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING and name not in self._volatile:
+                self.hits += 1
+                return default if value is None else value
+            self.misses += 1
+        try:
+            value = getattr(getattr(self._camera, name), attr)
+        except Exception:
+            value = None  # node không tồn tại cũng được cache để không hỏi lại thiết bị
+        with self._lock:
+            self._entries[key] = value
+        self._register_callback(name)
+        return default if value is None else value
+
+    def get_many(self, names, attrs=("Value",)):
+        """Đọc nhiều node: {name: {attr: value}}."""
+        return {name: {attr: self.get(name, attr) for attr in attrs} for name in names}
+
+    def invalidate(self, names=None):
+        """Xoá entry của các node `names` (None = xoá hết)."""
+        with self._lock:
+            if names is None:
+                self._entries = {}
+                return
+            names = set(names)
+            self._entries = {k: v for k, v in self._entries.items() if k[0] not in names}
+
+    def invalidate_after_write(self, name, value=None):
+        """
+        Gọi sau khi ghi node `name`: xoá giá trị của nó, giá trị các node phụ thuộc (node hình học)
+        và toàn bộ giới hạn Min/Max/Inc.
+        """
+        names = {name} | (_GEOMETRY_DEPENDENTS if name in _GEOMETRY_NODES else set())
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items()
+                             if k[0] not in names and k[1] not in LIMIT_ATTRS}
+            if name in self._AUTO_NODES:
+                target = self._AUTO_NODES[name]
+                if value is None or str(value) == "Off":
+                    self._volatile.discard(target)
+                else:
+                    self._volatile.add(target)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
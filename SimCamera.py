@@ -0,0 +1,493 @@
+# SimCamera.py
+# Camera giả lập thay cho pylon.InstantCamera, dùng để chạy thử / benchmark khi không có camera thật.
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from pypylon import pylon, genicam
+
+
+class SimNode:
+    """
+    Node giả lập có Value/Min/Max/Inc giống GenICam node của pypylon.
+    Min/Max có thể là hàm (giới hạn phụ thuộc node khác, vd. Width.Max = sensor - OffsetX).
+    locked: hàm trả về True khi node không ghi được (vd. ROI lúc đang grabbing).
+    on_change: hàm được gọi sau mỗi lần ghi Value thành công.
+    """
+    def __init__(self, value, min_value=None, max_value=None, inc=None, locked=None, on_change=None):
+        self._value = value
+        self._min = min_value
+        self._max = max_value
+        self.Inc = inc
+        self._locked = locked
+        self._on_change = on_change
+
+    @property
+    def Min(self):
+        return self._min() if callable(self._min) else self._min
+
+    @property
+    def Max(self):
+        return self._max() if callable(self._max) else self._max
+
+    @property
+    def Value(self):
+        return self._value
+
+    @Value.setter
+    def Value(self, value):
+        if self._locked is not None and self._locked():
+            raise genicam.AccessException("Node bị khoá trong lúc grabbing")
+        lo, hi = self.Min, self.Max
+        if lo is not None and value < lo:
+            raise genicam.OutOfRangeException(f"{value} < Min {lo}")
+        if hi is not None and value > hi:
+            raise genicam.OutOfRangeException(f"{value} > Max {hi}")
+        if self.Inc and lo is not None and (value - lo) % self.Inc:
+            raise genicam.OutOfRangeException(f"{value} không chia hết cho Inc {self.Inc}")
+        self._value = value
+        if self._on_change is not None:
+            self._on_change()
+
+
+class SimComputedNode:
+    """Node chỉ đọc, giá trị tính từ các node khác (vd. ResultingFrameRate)."""
+    def __init__(self, fn):
+        self._fn = fn
+        self.Min = None
+        self.Max = None
+        self.Inc = None
+
+    @property
+    def Value(self):
+        return self._fn()
+
+
+class SimDeviceInfo:
+    def __init__(self, serial="SIM0001", model="SimCam-1280"):
+        self._serial = serial
+        self._model = model
+
+    def GetSerialNumber(self):
+        return self._serial
+
+    def GetModelName(self):
+        return self._model
+
+    def GetFriendlyName(self):
+        return f"Basler {self._model} ({self._serial})"
+
+    def __str__(self):
+        return self.GetFriendlyName()
+
+
+class SimGrabResult:
+    """Kết quả grab giả lập (giống pylon.GrabResult ở các thuộc tính hay dùng)."""
+    def __init__(self, buffer=None, timestamp=0, block_id=0, skipped=0, ok=True, error=""):
+        self._buffer = buffer
+        self.TimeStamp = timestamp
+        self.BlockID = block_id
+        self.NumberOfSkippedImages = skipped
+        self._ok = ok
+        self.ErrorDescription = error
+
+    def GetErrorDescription(self):
+        return self.ErrorDescription
+
+    def IsValid(self):
+        return self._buffer is not None or not self._ok
+
+    def GrabSucceeded(self):
+        return self._ok and self._buffer is not None
+
+    @property
+    def Array(self):
+        # pypylon trả về bản copy ở Array
+        return self._buffer.copy()
+
+    @contextmanager
+    def GetArrayZeroCopy(self):
+        # View trực tiếp vào buffer, chỉ hợp lệ tới khi Release()
+        view = self._buffer.view()
+        view.flags.writeable = False
+        yield view
+
+    def Release(self):
+        self._buffer = None
+
+
+class SimulatedCamera:
+    """
+    Camera giả lập tối thiểu, duck-typing pylon.InstantCamera:
+    Open/Close/StartGrabbing/RetrieveResult/StopGrabbing và một số node cơ bản.
+    Frame được sinh theo đồng hồ sensor `fps`; nếu phía đọc chậm hơn thì frame cũ
+    bị bỏ (BlockID nhảy cóc) giống hàng đợi buffer của pylon.
+    Độ sáng ảnh tỉ lệ với ExposureTime/Gain và chỉ đổi sau settings_latency frame,
+    giống camera thật (dùng để thử AutoTuner).
+
+    Thời gian frame như camera thật: chu kỳ = 1 / ResultingFrameRate, tức nhỏ nhất của
+    AcquisitionFrameRate (nếu Enable), giới hạn đọc sensor (readout_fps ở full-frame, tăng khi giảm
+    Height) và 1e6 / ExposureTime.
+    Lỗi giả lập (theo seed, lặp lại được): drop_rate = tỉ lệ frame lỗi (GrabSucceeded False, như
+    frame GigE thiếu gói), lost_rate = tỉ lệ frame mất hẳn (BlockID nhảy cóc), stall_rate = xác
+    suất mỗi frame camera ngừng gửi stall_ms ms (RetrieveResult timeout).
+    pixel_format: PixelFormat báo ra (vd. "BayerRG8" với mono=True: dữ liệu 1 kênh coi như raw Bayer).
+    """
+    def __init__(self, width=1280, height=720, fps=30.0, serial="SIM0001", num_buffers=10, mono=True,
+                 readout_fps=None, drop_rate=0.0, lost_rate=0.0, stall_rate=0.0, stall_ms=200.0, seed=0,
+                 pixel_format=None):
+        self._info = SimDeviceInfo(serial)
+        self._open = False
+        self.open_count = 0  # số lần Open() thành công (kiểm tra thiết bị chỉ được mở 1 lần)
+        self._grabbing = False
+        self._max_frames = None
+        self._lock = threading.Lock()
+        self.num_buffers = num_buffers
+        self.mono = mono
+        self.sensor_width = int(width)
+        self.sensor_height = int(height)
+        locked = self.IsGrabbing
+        self.SensorWidth = SimNode(self.sensor_width)
+        self.SensorHeight = SimNode(self.sensor_height)
+        # Binning: Width/Height/Offset tính theo pixel sau binning (như camera Basler)
+        self.BinningHorizontal = SimNode(1, 1, 4, 1, locked, on_change=self._on_binning_changed)
+        self.BinningVertical = SimNode(1, 1, 4, 1, locked, on_change=self._on_binning_changed)
+        self.Width = SimNode(int(width), 16, lambda: self._binned_width() - self.OffsetX.Value, 16, locked)
+        self.Height = SimNode(int(height), 16, lambda: self._binned_height() - self.OffsetY.Value, 2, locked)
+        self.OffsetX = SimNode(0, 0, lambda: self._binned_width() - self.Width.Value, 16, locked)
+        self.OffsetY = SimNode(0, 0, lambda: self._binned_height() - self.Height.Value, 2, locked)
+        self.ExposureTime = SimNode(10000.0, 20.0, 1000000.0, None, on_change=self._on_response_changed)
+        self.Gain = SimNode(0.0, 0.0, 24.0, None, on_change=self._on_response_changed)
+        self.AcquisitionFrameRate = SimNode(float(fps), 1.0, 1000.0, None, on_change=self._on_frame_rate_changed)
+        self.AcquisitionFrameRateEnable = SimNode(True, on_change=self._on_frame_rate_changed)
+        self.ResultingFrameRate = SimComputedNode(self._resulting_frame_rate)
+        self.readout_fps = readout_fps
+        self.TriggerSelector = SimNode("FrameStart")
+        self.TriggerMode = SimNode("Off")
+        self.TriggerSource = SimNode("Software")
+        self.TriggerActivation = SimNode("RisingEdge")
+        self.ReverseX = SimNode(False)
+        self.ReverseY = SimNode(False)
+        self.BalanceWhiteAuto = SimNode("Off")
+        self.PixelFormat = SimNode(pixel_format or ("Mono8" if mono else "RGB8"))
+        self._patterns = None
+        # Đáp ứng sáng: ảnh tỉ lệ tuyến tính với ExposureTime * Gain (cháy ở 255);
+        # tại reference_exposure, Gain 0 dB ảnh giữ nguyên pattern gốc
+        self.reference_exposure = 10000.0
+        # Freerun: setting mới chỉ có hiệu lực sau vài frame (frame đang phơi sáng / đang đọc ra)
+        self.settings_latency = 2
+        self._response = 1.0
+        self._pending_response = []  # [(response, index frame đầu tiên có hiệu lực)], theo thứ tự ghi
+        self._rendered = None
+        self._t0 = 0.0
+        self._next_index = 0
+        self._pending_triggers = 0
+        self._trigger_cond = threading.Condition()
+        self._config_handlers = []
+        self._removed = False
+        # Lỗi giả lập
+        self.drop_rate = drop_rate
+        self.lost_rate = lost_rate
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self._rng = np.random.default_rng(seed)
+        self.injected = {"dropped": 0, "lost": 0, "stalls": 0}
+        self._stalled_s = 0.0
+
+    # --- Vòng đời ---
+    def GetDeviceInfo(self):
+        return self._info
+
+    def Open(self):
+        if self._removed:
+            raise genicam.RuntimeException("Thiết bị đã bị rút")
+        self._open = True
+        self.open_count += 1
+
+    def Close(self):
+        self.StopGrabbing()
+        self._open = False
+
+    def IsOpen(self):
+        return self._open
+
+    # --- Rút thiết bị ---
+    def RegisterConfiguration(self, handler, mode=pylon.RegistrationMode_Append, cleanup=pylon.Cleanup_None):
+        self._config_handlers.append(handler)
+
+    def IsCameraDeviceRemoved(self):
+        return self._removed
+
+    def simulate_removal(self, notify=True):
+        """
+        Giả lập rút cáp: dừng grab và gọi OnCameraDeviceRemoved của các handler đã đăng ký.
+        notify=False: như GigE trước heartbeat timeout, không có callback và RetrieveResult chỉ hết hạn,
+        chỉ IsCameraDeviceRemoved() báo thiết bị đã mất.
+        """
+        self._removed = True
+        if not notify:
+            return
+        self._grabbing = False
+        for handler in list(self._config_handlers):
+            handler.OnCameraDeviceRemoved(self)
+
+    def IsGrabbing(self):
+        return self._grabbing
+
+    def StartGrabbing(self, strategy=pylon.GrabStrategy_OneByOne):
+        self._start(strategy, None)
+
+    def StartGrabbingMax(self, count, strategy=pylon.GrabStrategy_OneByOne):
+        self._start(strategy, int(count))
+
+    def StopGrabbing(self):
+        self._grabbing = False
+
+    def _start(self, strategy, max_frames):
+        if not self._open:
+            raise genicam.RuntimeException("Camera chưa Open")
+        if self._removed:
+            raise genicam.RuntimeException("Thiết bị đã bị rút")
+        self._strategy = strategy
+        self._max_frames = max_frames
+        self._patterns = self._make_patterns()
+        self._response = self._target_response()
+        self._rendered = self._render(self._response)
+        self._pending_response = []
+        self._period = self._compute_period()
+        self._stalled_s = 0.0
+        self._t0 = time.perf_counter()
+        self._next_index = 0
+        self._pending_triggers = 0
+        self._grabbing = True
+
+    def _binned_width(self):
+        return self.sensor_width // int(self.BinningHorizontal.Value)
+
+    def _binned_height(self):
+        return self.sensor_height // int(self.BinningVertical.Value)
+
+    def _on_binning_changed(self):
+        """Đổi binning: thu ROI lại cho vừa sensor sau binning (camera thật tự giảm Width/Height)."""
+        for size, offset, limit in ((self.Width, self.OffsetX, self._binned_width()),
+                                    (self.Height, self.OffsetY, self._binned_height())):
+            size._value = min(size._value, limit - limit % size.Inc)
+            offset._value = min(offset._value, limit - size._value)
+
+    def _make_patterns(self, count=4):
+        """
+        Sinh sẵn vài frame (gradient dịch chuyển) để không tốn CPU lúc grab.
+        Gradient tính theo toạ độ sensor nên ảnh ROI/binning đúng là 1 phần của ảnh full sensor.
+        """
+        h, w = int(self.Height.Value), int(self.Width.Value)
+        bx, by = int(self.BinningHorizontal.Value), int(self.BinningVertical.Value)
+        xs = ((np.arange(w) + int(self.OffsetX.Value)) * bx).astype(np.uint16)
+        ys = ((np.arange(h) + int(self.OffsetY.Value)) * by).astype(np.uint16)[:, None]
+        patterns = []
+        for k in range(count):
+            img = ((xs + ys + k * 32) % 256).astype(np.uint8)
+            if not self.mono:
+                img = np.stack([img, img[:, ::-1], np.full_like(img, 96)], axis=-1)
+            patterns.append(img)
+        return patterns
+
+    def _target_response(self):
+        return float(self.ExposureTime.Value) / self.reference_exposure * 10 ** (float(self.Gain.Value) / 20.0)
+
+    def _render(self, response):
+        """Áp đáp ứng sáng lên các pattern bằng LUT (chỉ chạy khi Exposure/Gain đổi)."""
+        if abs(response - 1.0) < 1e-9:
+            return self._patterns
+        lut = np.clip(np.arange(256) * response, 0, 255).astype(np.uint8)
+        return [lut[p] for p in self._patterns]
+
+    def _on_response_changed(self):
+        """ExposureTime/Gain vừa được ghi: có hiệu lực từ frame thứ settings_latency kể từ lúc ghi."""
+        if not self._grabbing:
+            return
+        if abs(self._compute_period() - self._period) > 1e-9:
+            self._on_frame_rate_changed()  # ExposureTime dài hơn chu kỳ frame -> frame rate giảm
+        if self._software_triggered():
+            effective = self._next_index  # frame trigger sau lúc ghi
+        else:
+            produced = int((time.perf_counter() - self._t0) / self._frame_period())
+            effective = produced + self.settings_latency
+        self._pending_response.append((self._target_response(), effective))
+
+    def _on_frame_rate_changed(self):
+        """Đổi frame rate khi đang grabbing: dời gốc đồng hồ sensor để frame kế tiếp theo chu kỳ mới."""
+        if self._grabbing:
+            with self._lock:
+                self._period = self._compute_period()
+                self._t0 = time.perf_counter() - self._next_index * self._period
+
+    def _buffer_for(self, index):
+        """Buffer cho frame `index` (áp dụng Exposure/Gain mới khi tới frame có hiệu lực)."""
+        if self._pending_response and index >= self._pending_response[0][1]:
+            while self._pending_response and index >= self._pending_response[0][1]:
+                response, _ = self._pending_response.pop(0)
+            if response != self._response:
+                self._response = response
+                self._rendered = self._render(response)
+        return self._rendered[index % len(self._rendered)]
+
+    def _resulting_frame_rate(self):
+        rate = float(self.AcquisitionFrameRate.Value) if self.AcquisitionFrameRateEnable.Value else float("inf")
+        if self.readout_fps:
+            # Thời gian đọc sensor tỉ lệ với số dòng (Height)
+            rate = min(rate, self.readout_fps * self.sensor_height / float(self.Height.Value))
+        rate = min(rate, 1e6 / float(self.ExposureTime.Value))
+        return max(rate, 1e-3)
+
+    def _compute_period(self):
+        return 1.0 / self._resulting_frame_rate()
+
+    def _frame_period(self):
+        return self._period
+
+    # --- Trigger ---
+    def _software_triggered(self):
+        return self.TriggerMode.Value == "On" and self.TriggerSource.Value == "Software"
+
+    def WaitForFrameTriggerReady(self, timeout, handling=pylon.TimeoutHandling_ThrowException):
+        if not self._grabbing:
+            if handling == pylon.TimeoutHandling_ThrowException:
+                raise genicam.TimeoutException("Camera chưa grabbing")
+            return False
+        return True
+
+    def ExecuteSoftwareTrigger(self):
+        with self._trigger_cond:
+            self._pending_triggers += 1
+            self._trigger_cond.notify_all()
+
+    def _timeout_result(self, timeout, handling):
+        if handling == pylon.TimeoutHandling_ThrowException:
+            raise genicam.TimeoutException(f"Grab timeout {timeout} ms")
+        return SimGrabResult(None, ok=True)
+
+    def _retrieve_triggered(self, timeout, handling):
+        """Software trigger: mỗi trigger sinh 1 frame sau thời gian phơi sáng."""
+        with self._trigger_cond:
+            if not self._trigger_cond.wait_for(lambda: self._pending_triggers > 0, timeout / 1000.0):
+                return self._timeout_result(timeout, handling)
+            self._pending_triggers -= 1
+        time.sleep(float(self.ExposureTime.Value) / 1e6)
+        index = self._next_index
+        self._next_index += 1
+        buffer = self._buffer_for(index)
+        timestamp = int((time.perf_counter() - self._t0) * 1e9)
+        return SimGrabResult(buffer, timestamp=timestamp, block_id=index + 1)
+
+    def RetrieveResult(self, timeout, handling=pylon.TimeoutHandling_ThrowException):
+        with self._lock:
+            if not self._grabbing:
+                raise genicam.RuntimeException("Camera không ở trạng thái grabbing")
+            if self._removed:
+                # Rút không báo: camera không còn gửi frame
+                time.sleep(max(timeout / 1000.0, 0))
+                return self._timeout_result(timeout, handling)
+            if self._software_triggered():
+                return self._retrieve_triggered(timeout, handling)
+            # Freerun hoặc trigger line (coi như xung ngoài đều đặn theo AcquisitionFrameRate)
+            period = self._frame_period()
+            ready_at = self._t0 + (self._next_index + 1) * period
+            wait = ready_at - time.perf_counter()
+            if wait > timeout / 1000.0:
+                time.sleep(max(timeout / 1000.0, 0))
+                return self._timeout_result(timeout, handling)
+            if wait > 0:
+                time.sleep(wait)
+            # Số frame sensor đã sinh ra tới lúc này
+            produced = int((time.perf_counter() - self._t0) / period)
+            skipped = 0
+            if self._strategy == pylon.GrabStrategy_LatestImageOnly:
+                skipped = max(produced - 1 - self._next_index, 0)
+            elif produced - self._next_index > self.num_buffers:
+                # Hàng đợi đầy -> frame cũ bị mất
+                skipped = produced - self._next_index - self.num_buffers
+            index = self._next_index + skipped
+            self._next_index = index + 1
+            if self._max_frames is not None:
+                self._max_frames -= 1
+                if self._max_frames <= 0:
+                    self._grabbing = False
+            timestamp = int(((index + 1) * period + self._stalled_s) * 1e9)
+            fault = self._inject_faults(index)
+            if fault == "dropped":
+                return SimGrabResult(None, timestamp=timestamp, block_id=index + 1, ok=False,
+                                     error="Frame không đầy đủ (giả lập mất gói)")
+            if fault == "lost":
+                # Frame mất hẳn: host chờ tới frame kế tiếp, BlockID nhảy cóc
+                index += 1
+                self._next_index = index + 1
+                timestamp += int(period * 1e9)
+                wait = self._t0 + (index + 1) * period - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+            buffer = self._buffer_for(index)
+            return SimGrabResult(buffer, timestamp=timestamp, block_id=index + 1, skipped=skipped)
+
+    def _inject_faults(self, index):
+        """Quyết định lỗi giả lập cho frame `index`: None, "dropped" hoặc "lost"; có thể bắt đầu 1 lần ngừng gửi."""
+        if not (self.drop_rate or self.lost_rate or self.stall_rate):
+            return None
+        u = self._rng.random(3)
+        if u[2] < self.stall_rate:
+            # Camera ngừng gửi: các frame sau tới trễ stall_ms (đồng hồ camera vẫn chạy)
+            self._t0 += self.stall_ms / 1000.0
+            self._stalled_s += self.stall_ms / 1000.0
+            self.injected["stalls"] += 1
+        if u[0] < self.drop_rate:
+            self.injected["dropped"] += 1
+            return "dropped"
+        if u[1] < self.lost_rate:
+            self.injected["lost"] += 1
+            return "lost"
+        return None
+
+
+class SimTlFactory:
+    """
+    Transport layer giả lập thay cho pylon.TlFactory: EnumerateDevices() tốn `enumerate_delay`
+    giây (GigE thường mất 0.5-3 s), CreateDevice() trả về SimulatedCamera.
+    add_device()/remove_device() để giả lập cắm/rút camera.
+    """
+    def __init__(self, serials=("SIM0001",), enumerate_delay=0.0, **camera_kwargs):
+        self.enumerate_delay = enumerate_delay
+        self.camera_kwargs = camera_kwargs
+        self._devices = [SimDeviceInfo(serial) for serial in serials]
+        self._cameras = {}
+        self.enumerations = 0
+
+    def EnumerateDevices(self):
+        if self.enumerate_delay:
+            time.sleep(self.enumerate_delay)
+        self.enumerations += 1
+        return tuple(self._devices)
+
+    def CreateDevice(self, device_info):
+        serial = device_info.GetSerialNumber()
+        if all(d.GetSerialNumber() != serial for d in self._devices):
+            raise genicam.RuntimeException(f"Không tìm thấy thiết bị {serial}")
+        camera = SimulatedCamera(serial=serial, **self.camera_kwargs)
+        self._cameras[serial] = camera
+        return camera
+
+    def CreateFirstDevice(self):
+        if not self._devices:
+            raise genicam.RuntimeException("Không có thiết bị nào")
+        return self.CreateDevice(self._devices[0])
+
+    def add_device(self, serial):
+        self._devices.append(SimDeviceInfo(serial))
+
+    def remove_device(self, serial, notify=True):
+        """
+        Rút thiết bị: biến mất khỏi EnumerateDevices và camera đang mở bị rút
+        (notify=False: không có callback removal, xem SimulatedCamera.simulate_removal).
+        """
+        self._devices = [d for d in self._devices if d.GetSerialNumber() != serial]
+        camera = self._cameras.pop(serial, None)
+        if camera is not None:
+            camera.simulate_removal(notify)
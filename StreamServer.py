@@ -0,0 +1,381 @@
+# StreamServer.py
+# Stream MJPEG qua HTTP cho trình duyệt, chạy song song với Streamlit.
+# Mỗi frame chỉ được encode JPEG 1 lần và dùng chung cho mọi client.
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs
+from PIL import Image
+from Telemetry import TELEMETRY
+
+logger = logging.getLogger(__name__)
+
+
+class JpegEncoder:
+    """
+    Encode numpy frame -> JPEG với chất lượng và độ rộng tối đa cấu hình được.
+    Ảnh rộng hơn `max_width` được thu nhỏ theo hệ số nguyên (box filter) trước khi encode.
+    """
+    def __init__(self, quality=80, max_width=1280):
+        self.quality = int(quality)
+        self.max_width = max_width
+        self._buffer = BytesIO()
+
+    def encode(self, array):
+        img = Image.fromarray(array)
+        if self.max_width and img.width > self.max_width:
+            factor = -(-img.width // self.max_width)  # làm tròn lên
+            img = img.reduce(factor)
+        buf = self._buffer
+        buf.seek(0)
+        buf.truncate()
+        img.save(buf, format="JPEG", quality=self.quality)
+        return buf.getvalue()
+
+
+class _MjpegHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server.stream
+        path, _, query = self.path.partition("?")
+        if path == "/metrics":
+            body = server.telemetry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if path not in ("/stream.mjpg", "/snapshot.jpg"):
+            self.send_error(404)
+            return
+        # ?serial=<serial>: luồng của camera đó, không có thì luồng mặc định (frame_source của server)
+        serial = parse_qs(query).get("serial", [None])[0]
+        stream = server.channel(serial)
+        if stream is None or not stream.has_source:
+            # Luồng mặc định chưa có nguồn (mainWebUI chỉ đăng ký theo serial): báo lỗi ngay, không treo
+            self.send_error(404, f"No stream for camera {serial}" if serial is not None
+                            else "No default stream, use ?serial=<serial>")
+            return
+        if path == "/stream.mjpg":
+            self.send_response(200)
+            self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+            self.send_header("Cache-Control", "no-cache, private")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            stream.client_count(+1)
+            send = stream.tm["send"]
+            try:
+                seq = -1
+                while server.is_running and not stream.closed:
+                    jpeg, seq = stream.wait_jpeg(seq, timeout=1.0)
+                    if jpeg is None:
+                        continue
+                    t0 = time.perf_counter()
+                    self.wfile.write(
+                        b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                        + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n"
+                    )
+                    send.observe((time.perf_counter() - t0) * 1e3)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                stream.client_count(-1)
+        else:
+            stream.client_count(+1)
+            try:
+                jpeg, _ = stream.wait_jpeg(-1, timeout=1.0)
+            finally:
+                stream.client_count(-1)
+            if jpeg is None:
+                self.send_error(503, "No frame")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(jpeg)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(jpeg)
+
+    def log_message(self, format, *args):
+        pass  # Không in log mỗi request
+
+
+class MjpegChannel:
+    """
+    1 luồng MJPEG (thường là 1 camera): nguồn frame + encoder + JPEG mới nhất dùng chung cho mọi client.
+    Luồng encoder chỉ lấy và encode frame khi có client (stream hoặc snapshot đang chờ), giới hạn
+    `max_fps`, nên camera đã đăng ký mà không ai xem không tốn CPU encode.
+
+    frame_source: hàm kiểu BaslerCameraAPI.get_next(after_seq, timeout=..., out=..., newest=...) trả về Frame|None.
+    pixel_format: (tuỳ chọn) hàm trả về PixelFormat hiện tại của frame, gán vào encoder.pixel_format
+    trước mỗi lần encode (PixelFormat của camera có thể đổi giữa chừng).
+    """
+    def __init__(self, key, frame_source, encoder, max_fps=15.0, telemetry=None, pixel_format=None):
+        self.key = key
+        self.encoder = encoder
+        self.max_fps = max_fps
+        self.pixel_format = pixel_format
+        self._source = frame_source
+        self._source_gen = 0
+        self._thread = None
+        self._running = False
+        self.closed = False
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._jpeg_seq = -1
+        self._clients = 0
+        # Thống kê
+        self.frames_encoded = 0
+        self.encode_ms = 0.0        # trung bình trượt
+        self.bytes_per_frame = 0.0  # trung bình trượt
+        self.fps = 0.0
+        t = telemetry if telemetry is not None else TELEMETRY
+        labels = {"sink": "mjpeg"} if key is None else {"sink": "mjpeg", "camera": key}
+        self.tm = {
+            "encode": t.timing("display_encode", "Encode frame để hiển thị", **labels),
+            "send": t.timing("display_send", "Gửi 1 frame tới 1 client", **labels),
+            "latency": t.timing("display_latency", "Host nhận frame tới lúc frame hiển thị sẵn sàng", **labels),
+            "frames": t.rate("display_frames", "Frame đã đưa ra hiển thị", **labels),
+            "skipped": t.counter("display_skipped", "Frame grab được nhưng không được hiển thị", **labels),
+            "underruns": t.counter("display_underruns", "Lượt hiển thị không có frame mới", **labels),
+            "unchanged": t.counter("display_unchanged", "Frame trùng frame đã hiển thị, bỏ qua encode/gửi",
+                                   **labels),
+        }
+
+    @property
+    def clients(self):
+        return self._clients
+
+    @property
+    def has_source(self):
+        return self._source is not None
+
+    def client_count(self, delta):
+        with self._cond:
+            self._clients += delta
+            self._cond.notify_all()
+
+    def set_source(self, frame_source):
+        """Đổi nguồn frame (seq của nguồn mới đếm lại từ đầu)."""
+        if frame_source != self._source:
+            self._source = frame_source
+            self._source_gen += 1
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        name = "MjpegEncoder" if self.key is None else f"MjpegEncoder-{self.key}"
+        self._thread = threading.Thread(target=self._encode_loop, name=name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def _encode_loop(self):
+        last_seq = -1
+        encoded_seq = -1
+        last_time = 0.0
+        out = None
+        gen = self._source_gen
+        min_period = 1.0 / self.max_fps if self.max_fps else 0.0
+        tm = self.tm
+        while self._running:
+            source = self._source
+            if gen != self._source_gen:
+                # Nguồn mới: seq đếm lại từ đầu
+                gen, last_seq, encoded_seq, out = self._source_gen, -1, -1, None
+            with self._cond:
+                if not self._clients:
+                    # Không ai xem: chờ client, lần xem sau bắt đầu từ frame mới nhất
+                    self._cond.wait(0.5)
+                    last_seq = encoded_seq = -1
+                    continue
+            if source is None:
+                time.sleep(0.05)
+                continue
+            # Giới hạn FPS: chưa tới lượt thì chờ, frame mới nhất sẽ được lấy sau
+            wait = last_time + min_period - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            frame = source(last_seq, timeout=0.5, out=out, newest=True)
+            if frame is None:
+                if last_seq >= 0:
+                    tm["underruns"].inc()
+                continue
+            out = frame.array  # tái sử dụng buffer cho lần sau
+            if last_seq >= 0 and frame.seq > last_seq + 1:
+                tm["skipped"].inc(frame.seq - last_seq - 1)
+            last_seq = frame.seq
+            if frame.unchanged_since(encoded_seq):
+                # Cảnh không đổi (ChangeDetector): client giữ ảnh đã nhận, không encode/gửi lại
+                tm["unchanged"].inc()
+                last_time = time.perf_counter()
+                continue
+            encoded_seq = frame.seq
+            if self.pixel_format is not None:
+                self.encoder.pixel_format = self.pixel_format()
+            t0 = time.perf_counter()
+            jpeg = self.encoder.encode(frame.array)
+            now = time.perf_counter()
+            tm["encode"].observe((now - t0) * 1e3)
+            tm["latency"].observe((now - frame.host_time) * 1e3)
+            tm["frames"].tick(now)
+            self._update_stats((now - t0) * 1000.0, len(jpeg), now - last_time if last_time else 0.0)
+            last_time = now
+            with self._cond:
+                self._jpeg = jpeg
+                self._jpeg_seq += 1
+                self._cond.notify_all()
+
+    def _update_stats(self, encode_ms, size, period):
+        alpha = 0.1 if self.frames_encoded else 1.0
+        self.encode_ms += alpha * (encode_ms - self.encode_ms)
+        self.bytes_per_frame += alpha * (size - self.bytes_per_frame)
+        if period > 0:
+            self.fps += alpha * (1.0 / period - self.fps)
+        self.frames_encoded += 1
+
+    def wait_jpeg(self, after_seq, timeout=1.0):
+        """Chờ JPEG mới hơn after_seq. Trả về (bytes|None, seq)."""
+        with self._cond:
+            if self._jpeg_seq <= after_seq:
+                self._cond.wait(timeout)
+            if self._jpeg is None or self._jpeg_seq <= after_seq:
+                return None, after_seq
+            return self._jpeg, self._jpeg_seq
+
+    def stats(self):
+        return {
+            "frames_encoded": self.frames_encoded,
+            "encode_ms": round(self.encode_ms, 2),
+            "bytes_per_frame": int(self.bytes_per_frame),
+            "fps": round(self.fps, 1),
+            "clients": self._clients,
+            "quality": self.encoder.quality,
+            "max_width": self.encoder.max_width,
+        }
+
+
+class MjpegStreamServer:
+    """
+    Server MJPEG-over-HTTP chạy nền, 1 process phục vụ mọi phiên và mọi camera.
+      /stream.mjpg?serial=<serial>  : luồng multipart/x-mixed-replace của camera đó (dùng trực tiếp trong thẻ <img>)
+      /snapshot.jpg?serial=<serial> : frame JPEG mới nhất
+      /metrics                      : số liệu Telemetry dạng text Prometheus (grab, encode, send, FPS, drop, underrun)
+
+    Mỗi camera là 1 MjpegChannel riêng (nguồn frame, encoder, PixelFormat), đăng ký bằng
+    add_source(serial, ...) / remove_source(serial) (CameraService làm khi mở/đóng thiết bị), nên
+    2 tab xem 2 camera khác nhau không giẫm lên nhau. Không có `serial` thì dùng luồng mặc định
+    `frame_source` (set_source), như khi chỉ có 1 camera.
+    Frame full-res trong ring không bị thay đổi, chỉ bản encode bị thu nhỏ.
+    """
+    def __init__(self, frame_source=None, host="0.0.0.0", port=8502, quality=80, max_width=1280, max_fps=15.0,
+                 encoder=None, telemetry=None, encoder_factory=None):
+        self.host = host
+        self.port = port
+        self.max_fps = max_fps
+        # encoder_factory() -> đối tượng có encode(array) -> bytes (vd. Preview.PreviewPipeline), 1 cái cho mỗi luồng
+        self.encoder_factory = encoder_factory or (lambda: JpegEncoder(quality=quality, max_width=max_width))
+        self.telemetry = telemetry if telemetry is not None else TELEMETRY
+        self._httpd = None
+        self._http_thread = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._default = MjpegChannel(None, frame_source, encoder or self.encoder_factory(), max_fps=max_fps,
+                                     telemetry=self.telemetry)
+
+    @property
+    def is_running(self):
+        return self._running
+
+    @property
+    def encoder(self):
+        """Encoder của luồng mặc định."""
+        return self._default.encoder
+
+    @property
+    def clients(self):
+        with self._lock:
+            return self._default.clients + sum(c.clients for c in self._channels.values())
+
+    def channel(self, serial=None):
+        """MjpegChannel của camera `serial` (None = luồng mặc định), None nếu chưa đăng ký."""
+        if serial is None:
+            return self._default
+        with self._lock:
+            return self._channels.get(serial)
+
+    def set_source(self, frame_source):
+        """Đổi nguồn frame của luồng mặc định (ví dụ khi kết nối camera khác)."""
+        self._default.set_source(frame_source)
+
+    def add_source(self, serial, frame_source, pixel_format=None, encoder=None):
+        """
+        Đăng ký luồng /stream.mjpg?serial=<serial>. pixel_format: hàm trả về PixelFormat hiện tại
+        của frame (vd. lambda: api.frame_format). Đăng ký lại cùng serial thì chỉ đổi nguồn frame.
+        """
+        with self._lock:
+            channel = self._channels.get(serial)
+            if channel is None:
+                channel = MjpegChannel(serial, frame_source, encoder or self.encoder_factory(), max_fps=self.max_fps,
+                                       telemetry=self.telemetry, pixel_format=pixel_format)
+                self._channels[serial] = channel
+                if self._running:
+                    channel.start()
+                return channel
+        channel.set_source(frame_source)
+        channel.pixel_format = pixel_format
+        return channel
+
+    def remove_source(self, serial):
+        """Gỡ luồng của camera `serial` (client đang xem sẽ bị ngắt)."""
+        with self._lock:
+            channel = self._channels.pop(serial, None)
+        if channel is not None:
+            channel.closed = True
+            channel.stop()
+
+    def start(self):
+        if self._running:
+            return
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _MjpegHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stream = self
+        self.port = self._httpd.server_address[1]
+        self._running = True
+        self._http_thread = threading.Thread(target=self._httpd.serve_forever, name="MjpegHttp", daemon=True)
+        self._http_thread.start()
+        with self._lock:
+            channels = [self._default] + list(self._channels.values())
+        for channel in channels:
+            channel.start()
+        logger.info("Đang phục vụ tại http://%s:%s/stream.mjpg", self.host, self.port)
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        with self._lock:
+            channels = [self._default] + list(self._channels.values())
+        for channel in channels:
+            channel.stop()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._http_thread.join(timeout=2.0)
+        self._http_thread = None
+        logger.info("Đã dừng.")
+
+    def stats(self):
+        """Số liệu của luồng mặc định, kèm "streams": {serial: số liệu} của các camera đã đăng ký."""
+        with self._lock:
+            channels = dict(self._channels)
+        return {**self._default.stats(), "streams": {serial: c.stats() for serial, c in channels.items()}}
@@ -1,25 +1,143 @@
+import functools
+import json
+import os
+import re
+import time
+from io import BytesIO
+from urllib.parse import quote
 import streamlit as st
 import numpy as np
-from Resource import LOGO_BASE64
+from PIL import Image
+from Telemetry import TELEMETRY
+
+try:
+    from streamlit_image_coordinates import streamlit_image_coordinates
+except ImportError:  # không có thì chọn vùng kiểm tra bằng ô nhập số
+    streamlit_image_coordinates = None
+
+# Logo phục vụ như file tĩnh: với server.enableStaticServing (.streamlit/config.toml) trình duyệt tải
+# /app/static/logo1.png 1 lần rồi dùng cache HTTP, mỗi rerun chỉ gửi thẻ <img>
+_STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+_LOGO_FILE = "logo1.png"
+
+_CUSTOM_CSS = """
+<style>
+    /* --- Background chính và màu chữ mặc định --- */
+    [data-testid="stAppViewContainer"] > .main {
+        background-color: #57564F;
+    }
+    body, [data-testid="stMarkdown"], [data-testid="stHeader"] {
+        color: #F8F3CE;
+    }
+
+    /* --- Style chung cho các widget --- */
+    [data-testid="stSelectbox"], [data-testid="stChatMessage"] {
+        background-color: #7A7A73;
+        border-radius: 10px;
+    }
+    
+    /* --- Style cho các container cụ thể bằng class --- */
+    /* Container cho lịch sử chat */
+    .chat-container {
+        background-color: #7A7A73; /* Màu mặc định */
+        border-radius: 10px;
+        padding: 10px;
+    }
+    /* Container cho parser setting, có màu nền khác */
+    .parser-container {
+        background-color: #4a4a44; /* Màu tối hơn để phân biệt */
+        border-radius: 10px;
+        padding: 15px;
+    }
+    
+    /* --- Các style khác --- */
+    [data-testid="stSelectbox"] div, [data-testid="stChatMessage"] p, [data-testid="stTextInput"] div {
+        color: #000000 !important;
+    }
+    [data-testid="stButton"] button {
+        background-color: #7A7A73; color: #F8F3CE; border: 1px solid #F8F3CE;
+        border-radius: 5px; width: 100%;
+    }
+    [data-testid="stButton"] button:hover {
+        background-color: #57564F; color: #F8F3CE; border: 1px solid #FFFFFF;
+    }
+    [data-testid="stImage"] img {
+        background-color: white; padding: 5px; border-radius: 10px;
+    }
+    .block-container { padding: 2rem; }
+</style>
+"""
+# Bỏ comment và khoảng trắng thừa 1 lần lúc import: chuỗi này được gửi lại ở mỗi rerun
+_CUSTOM_CSS = re.sub(r"\s+", " ", re.sub(r"/\*.*?\*/", "", _CUSTOM_CSS, flags=re.S)).strip()
+
+
+@functools.lru_cache(maxsize=1)
+def _logo_bytes():
+    """Logo đọc 1 lần cho cả process (khi không bật static serving)."""
+    with open(os.path.join(_STATIC_DIR, _LOGO_FILE), "rb") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=1)
+def _placeholder_image():
+    """Ảnh xám chờ khi chưa có frame: encode 1 lần cho cả process thay vì cấp phát mảng mới mỗi lần vẽ."""
+    buf = BytesIO()
+    Image.fromarray(np.full((720, 1280, 3), 122, dtype=np.uint8)).save(buf, format="JPEG", quality=50)
+    return buf.getvalue()
 
 class VisionUI:
     """
     Một lớp để đóng gói và quản lý toàn bộ giao diện người dùng (UI)
     của ứng dụng Vision AI Assistant trên Streamlit.
     """
-    def __init__(self, camera_api):
-        """Khởi tạo các giá trị và cấu hình ban đầu."""
-        st.set_page_config(
-            page_title="Vision AI Assistant",
-            layout="wide"
-        )
+    def __init__(self, camera_api, stream_server=None, analysis_worker=None, preview=None, live_fps=15.0,
+                 telemetry=None, clip_budget_mb=256):
+        """
+        Khởi tạo các giá trị ban đầu. mainWebUI giữ VisionUI trong session_state nên hàm này chạy
+        1 lần mỗi phiên; cấu hình trang nằm ở configure_page().
+        """
         # Lưu camera_api để sử dụng trong các hàm khác
         self.api = camera_api
+        # Server MJPEG (StreamServer.MjpegStreamServer), None = hiển thị bằng st.image
+        self.stream_server = stream_server
+        # AnalysisWorker.AnalysisWorker: phân tích + gọi agent ngoài luồng script, None = trả lời tại chỗ
+        self.analysis_worker = analysis_worker
+        # Không có server MJPEG: frame được encode bằng preview (Preview.PreviewPipeline) và vẽ
+        # lại trong 1 fragment chạy live_fps lần/giây, không giữ luồng script
+        self.preview = preview
+        self.live_fps = live_fps
+        # Bộ đệm event clip (MB) chỉ được cấp khi người dùng bấm "Arm Clip" lần đầu
+        self.clip_budget_mb = clip_budget_mb
+        # Telemetry.Telemetry: số liệu của vòng hiển thị + panel "Telemetry"
+        self.telemetry = telemetry if telemetry is not None else TELEMETRY
+        t = self.telemetry
+        self._tm = {
+            "encode": t.timing("display_encode", "Encode frame để hiển thị", sink="streamlit"),
+            "send": t.timing("display_send", "Gửi 1 frame tới 1 client", sink="streamlit"),
+            "latency": t.timing("display_latency", "Host nhận frame tới lúc frame hiển thị sẵn sàng", sink="streamlit"),
+            "frames": t.rate("display_frames", "Frame đã đưa ra hiển thị", sink="streamlit"),
+            "skipped": t.counter("display_skipped", "Frame grab được nhưng không được hiển thị", sink="streamlit"),
+            "underruns": t.counter("display_underruns", "Lượt hiển thị không có frame mới", sink="streamlit"),
+            "unchanged": t.counter("display_unchanged", "Frame trùng frame đã hiển thị, bỏ qua encode/gửi",
+                                   sink="streamlit"),
+        }
 
         self._initialize_session_state()
-        self.cameras_info = self._get_camera_list()
+        # Danh sách camera nạp khi vẽ lần đầu (sau khi trang đã hiện), sau đó chỉ nạp lại khi
+        # DeviceRegistry báo danh sách đổi (cameras_version của CameraHandle)
+        self.cameras_info = None
+        self._cameras_version = None
+        self._camera_notice = None
         self.image_placeholder = None
 
+    @staticmethod
+    def configure_page():
+        """Tiêu đề + layout trang; trình duyệt giữ qua các lần rerun nên chỉ cần gọi 1 lần mỗi phiên."""
+        st.set_page_config(
+            page_title="Vision AI Assistant",
+            layout="wide"
+        )
+
     def _initialize_session_state(self):
         """Khởi tạo các biến cần thiết trong st.session_state."""
         if "messages" not in st.session_state:
@@ -32,12 +150,26 @@ class VisionUI:
             st.session_state.connect_status = False
         if "stream_status" not in st.session_state:
             st.session_state.stream_status = False
+        # Future của các câu hỏi đang chờ agent trả lời
+        if "pending_replies" not in st.session_state:
+            st.session_state.pending_replies = []
+        # Job "Analyze" đang chờ AnalysisWorker: {"future", "seq", "region"} hoặc None
+        if "pending_analysis" not in st.session_state:
+            st.session_state.pending_analysis = None
             
+    def _refresh_camera_list(self):
+        """Nạp lại danh sách camera nếu chưa có hoặc registry báo thay đổi (không có version: nạp mỗi lần)."""
+        version = getattr(self.api, "cameras_version", None)
+        if self.cameras_info is None or version is None or version != self._cameras_version:
+            self._cameras_version = version
+            self.cameras_info = self._get_camera_list()
+
     def _get_camera_list(self):
+        self._camera_notice = None
         try:
             available_cameras = self.api.list_cameras()
             if not available_cameras:
-                st.warning("No cameras found. Please connect a camera.")
+                self._camera_notice = (st.warning, "No cameras found. Please connect a camera.")
                 return {"No Camera Found": {"serial": None, "model": "N/A", "info": "N/A"}}
             # Chuyển đổi list[CameraInfo] thành dict mong muốn
             cam_dict = {}
@@ -50,7 +182,7 @@ class VisionUI:
                 }
             return cam_dict
         except Exception as e:
-            st.error(f"Error fetching camera list: {e}")
+            self._camera_notice = (st.error, f"Error fetching camera list: {e}")
             return {"Error": {"serial": None, "model": str(e), "info": "N/A"}}
     
     # Các hàm callback để xử lý khi toggle thay đổi
@@ -67,6 +199,8 @@ class VisionUI:
                 return
             st.toast(f"🚀 Connecting to camera {serial}...")
             is_ok = self.api.connect(serial=serial)
+            # seq của camera mới đếm riêng: lần hiển thị đầu luôn encode
+            st.session_state.pop("live_encoded_seq", None)
             if is_ok:
                 st.toast("✅ Connection successful!", icon="✅")
                 st.session_state.connect_status = True
@@ -99,8 +233,11 @@ class VisionUI:
                 return
             
             st.toast("🎥 Starting stream...")
-            # << THÊM LOGIC BẮT ĐẦU STREAM CỦA BẠN VÀO ĐÂY >>
-            self.api.start_stream()
+            # Stream dùng freerun; nếu trước đó Capture đã bật software trigger thì tắt đi
+            if self.api.trigger_source is not None:
+                self.api.set_trigger_mode(None)
+            # Grab nền vào ring buffer, vòng lặp hiển thị chỉ đọc frame mới nhất
+            self.api.start_background_grab()
             st.session_state.stream_status = True
         else:
             if self.api.is_connected:
@@ -117,7 +254,11 @@ class VisionUI:
             return
         
         st.toast("📸 Capturing image...")
-        img = self.api.get_image()
+        # Khi không stream: giữ camera ở chế độ software trigger (grab engine luôn armed),
+        # mỗi lần Capture chỉ tốn 1 vòng trigger thay vì start/stop grabbing.
+        if not self.api.is_background_grabbing and self.api.trigger_source is None:
+            self.api.set_trigger_mode("Software")
+        img = self.api.capture()
         if img is not None:
             st.session_state.captured_image = img
             with st.dialog("Captured Image"):
@@ -126,66 +267,103 @@ class VisionUI:
         else:
             st.toast("❌ Failed to capture image!", icon="❌")
 
+    def handle_clip_button(self):
+        """
+        Xử lý nút clip: lần đầu 'Arm Clip' bật bộ đệm giữ vài giây gần nhất (tốn 1 lần chép frame
+        mỗi frame nên không bật sẵn), sau đó 'Save Clip' ghi vài giây trước/sau sự kiện.
+        """
+        if not self.api.is_background_grabbing:
+            st.toast("⚠️ Please start the stream first!", icon="⚠️")
+            return
+        if self.api.event_clip is None:
+            clip = self.api.enable_event_clip(byte_budget_mb=self.clip_budget_mb)
+            st.toast(f"🎞️ Clip buffer armed ({self.clip_budget_mb} MB, -{clip.pre_seconds}s/+{clip.post_seconds}s)")
+            return
+        # Ghi ra đĩa ở luồng nền, không làm dừng stream
+        path = self.api.trigger_event_clip()
+        clip = self.api.event_clip
+        if clip.capacity == 0 and clip.frames_dropped:
+            st.toast("⚠️ Clip buffer too small for the current frame size!", icon="⚠️")
+        st.toast(f"🎞️ Saving clip (-{clip.pre_seconds}s/+{clip.post_seconds}s) to {path}")
+        st.session_state.messages.append({"role": "assistant", "content": f"Event clip saved to `{path}`"})
+
+    def handle_analyze_button(self):
+        """
+        Xử lý sự kiện khi người dùng nhấn nút 'Analyze' (tính chỉ số chất lượng ảnh hiện tại).
+        Có AnalysisWorker thì chỉ gửi bản copy frame đi rồi trả luồng script ngay, kết quả được
+        _poll_replies hiển thị khi xong; bấm liên tục thì worker gộp theo camera, chỉ phân tích frame mới nhất.
+        """
+        if not self.api.is_connected:
+            st.toast("⚠️ Please connect to a camera first!", icon="⚠️")
+            return
+        if self.analysis_worker is None:
+            self._show_metrics(self.api.analyze_image())
+            return
+        seq = -1
+        array = None
+        if self.api.is_background_grabbing:
+            frame = self.api.get_latest()
+            if frame is not None:
+                last_seq = st.session_state.get("metrics_seq", -1)
+                if st.session_state.get("metrics") is not None and frame.unchanged_since(last_seq):
+                    # Cảnh không đổi từ lần phân tích trước: dùng lại kết quả, không gửi job
+                    self._show_metrics(st.session_state.metrics)
+                    return
+                seq, array = frame.seq, frame.array
+        else:
+            array = self.api.get_image()
+        if array is None:
+            self._show_metrics(None)
+            return
+        try:
+            region = dict(zip(("sensor_xywh", "binning"), self.api.current_region()))
+        except Exception:
+            region = None
+        future = self.analysis_worker.submit(
+            array, key=f"analyze-{getattr(self.api, 'viewer_id', '')}-{st.session_state.selected_serial}",
+            pixel_format=self.api.frame_format, seq=seq)
+        st.session_state.pending_analysis = {"future": future, "seq": seq, "region": region}
+
+    def _show_metrics(self, metrics):
+        """Đưa kết quả Analyze vào panel Parser Setting + 1 dòng tóm tắt trong chat."""
+        if metrics is None:
+            st.toast("❌ No frame to analyze!", icon="❌")
+            return
+        st.session_state.metrics = metrics
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": (f"Brightness {metrics['mean']:.2f} (p99 {metrics['p99']:.2f}), "
+                        f"clipped {metrics['clipped_high']:.2%}, sharpness {metrics['sharpness']:.0f}, "
+                        f"noise {metrics['noise']:.1f}"),
+        })
+
     def _inject_custom_css(self):
-        """Nhúng mã CSS tùy chỉnh vào ứng dụng."""
-        st.markdown("""
-        <style>
-            /* --- Background chính và màu chữ mặc định --- */
-            [data-testid="stAppViewContainer"] > .main {
-                background-color: #57564F;
-            }
-            body, [data-testid="stMarkdown"], [data-testid="stHeader"] {
-                color: #F8F3CE;
-            }
-
-            /* --- Style chung cho các widget --- */
-            [data-testid="stSelectbox"], [data-testid="stChatMessage"] {
-                background-color: #7A7A73;
-                border-radius: 10px;
-            }
-            
-            /* --- Style cho các container cụ thể bằng class --- */
-            /* Container cho lịch sử chat */
-            .chat-container {
-                background-color: #7A7A73; /* Màu mặc định */
-                border-radius: 10px;
-                padding: 10px;
-            }
-            /* Container cho parser setting, có màu nền khác */
-            .parser-container {
-                background-color: #4a4a44; /* Màu tối hơn để phân biệt */
-                border-radius: 10px;
-                padding: 15px;
-            }
-            
-            /* --- Các style khác --- */
-            [data-testid="stSelectbox"] div, [data-testid="stChatMessage"] p, [data-testid="stTextInput"] div {
-                color: #000000 !important;
-            }
-            [data-testid="stButton"] button {
-                background-color: #7A7A73; color: #F8F3CE; border: 1px solid #F8F3CE;
-                border-radius: 5px; width: 100%;
-            }
-            [data-testid="stButton"] button:hover {
-                background-color: #57564F; color: #F8F3CE; border: 1px solid #FFFFFF;
-            }
-            [data-testid="stImage"] img {
-                background-color: white; padding: 5px; border-radius: 10px;
-            }
-            .block-container { padding: 2rem; }
-        </style>
-        """, unsafe_allow_html=True)
-
-    def _render_left_panel(self):
+        """Nhúng mã CSS tùy chỉnh vào ứng dụng (chuỗi đã rút gọn sẵn lúc import module)."""
+        st.markdown(_CUSTOM_CSS, unsafe_allow_html=True)
+
+    def _render_logo(self):
+        if st.get_option("server.enableStaticServing") and os.path.isfile(os.path.join(_STATIC_DIR, _LOGO_FILE)):
+            st.markdown(f'<img src="app/static/{_LOGO_FILE}" width="120" alt="logo">', unsafe_allow_html=True)
+        else:
+            st.image(_logo_bytes(), width=120)
+
+    def _render_left_panel(self, profiler=None):
         """Vẽ cột bên trái chứa các thành phần điều khiển camera."""
         with st.container():
             st.header("Camera Control")
 
             top_cols = st.columns([1, 3, 2, 1], gap="medium")
             with top_cols[0]:
-                st.image(f"data:image/png;base64,{LOGO_BASE64}", width=120)
+                self._render_logo()
+            if profiler is not None:
+                profiler.mark("first_paint")
 
             with top_cols[1]:
+                # Lần đầu có thể phải chờ enumerate (GigE vài giây): trang đã hiện khung và logo
+                self._refresh_camera_list()
+                if self._camera_notice is not None:
+                    notify, message = self._camera_notice
+                    notify(message)
                 is_disabled = not st.session_state.connect_status
                 camera_options = list(self.cameras_info.keys())
                 selected_camera_name = st.selectbox("List Camera", options=camera_options, label_visibility="collapsed")
@@ -211,13 +389,184 @@ class VisionUI:
                 )
                 
             top_cols[3].button("Capture", key="capture_image", on_click=self.handle_capture_button, use_container_width=True)
-            top_cols[3].button("Analyze", key="analyze", use_container_width=True)
+            top_cols[3].button("Analyze", key="analyze", on_click=self.handle_analyze_button, use_container_width=True)
+            clip_label = "Arm Clip" if self.api.event_clip is None else "Save Clip"
+            top_cols[3].button(clip_label, key="save_clip", on_click=self.handle_clip_button, use_container_width=True)
             
             st.markdown("---")
             st.subheader("Show Image Stream")
             self.image_placeholder = st.empty()
-            placeholder_frame = np.full((720, 1280, 3), 122, dtype=np.uint8)
-            self.image_placeholder.image(placeholder_frame, caption="Camera feed will appear here.", use_column_width=True)
+            if st.session_state.stream_status and self.stream_server is not None:
+                # Trình duyệt kéo thẳng luồng MJPEG, Streamlit không phải gửi từng frame
+                self.image_placeholder.markdown(
+                    f'<img src="{self._stream_url()}" style="width:100%; border-radius:10px;" alt="Camera feed">',
+                    unsafe_allow_html=True,
+                )
+            elif st.session_state.stream_status and self.preview is not None:
+                with self.image_placeholder.container():
+                    st.fragment(self._render_live_frame, run_every=1.0 / self.live_fps)()
+            else:
+                self.image_placeholder.image(_placeholder_image(), caption="Camera feed will appear here.",
+                                             use_column_width=True)
+
+            if st.session_state.connect_status:
+                st.fragment(self._render_connection_status, run_every=1.0)()
+            if st.session_state.connect_status and self.api.is_connected:
+                with st.expander("Inspect Region"):
+                    self._render_region_picker()
+
+            if st.toggle("Telemetry", key="show_telemetry"):
+                st.fragment(self._render_telemetry, run_every=1.0)()
+
+    def _render_live_frame(self):
+        """Vẽ frame mới nhất của stream (chạy lại định kỳ như 1 fragment)."""
+        if hasattr(self.api, "next_frame"):
+            frame = self.api.next_frame()  # CameraService.CameraHandle: con trỏ seq riêng của phiên
+        else:
+            frame = self.api.get_next(st.session_state.get("live_seq", -1), newest=True)
+        tm = self._tm
+        if frame is not None:
+            last_seq = st.session_state.get("live_seq", -1)
+            if 0 <= last_seq < frame.seq - 1:
+                tm["skipped"].inc(frame.seq - last_seq - 1)
+            st.session_state.live_seq = frame.seq
+            if "live_image" in st.session_state and frame.unchanged_since(st.session_state.get("live_encoded_seq", -1)):
+                # Cảnh không đổi (ChangeDetector): vẽ lại ảnh đã encode, trình duyệt không tải lại
+                tm["unchanged"].inc()
+                frame = None
+            else:
+                st.session_state.live_encoded_seq = frame.seq
+                self.preview.pixel_format = self.api.frame_format
+                t0 = time.perf_counter()
+                st.session_state.live_image = self.preview.encode(frame.array)
+                tm["encode"].observe((time.perf_counter() - t0) * 1e3)
+        elif "live_image" in st.session_state:
+            tm["underruns"].inc()
+        image = st.session_state.get("live_image")
+        if image is not None:
+            # Mất camera: giữ frame tốt cuối cùng trên màn hình trong lúc kết nối lại
+            caption = "Camera feed" if self.api.is_connected else "Last frame (camera reconnecting)"
+            t0 = time.perf_counter()
+            st.image(image, caption=caption, use_column_width=True)
+            now = time.perf_counter()
+            if frame is not None:
+                tm["send"].observe((now - t0) * 1e3)
+                tm["latency"].observe((now - frame.host_time) * 1e3)
+                tm["frames"].tick(now)
+        else:
+            st.image(_placeholder_image(), caption="No camera feed available.", use_column_width=True)
+
+    def _render_connection_status(self):
+        """Báo mất camera / đang kết nối lại (fragment tự chạy lại mỗi giây, cả khi hiển thị bằng MJPEG)."""
+        state = self.api.connection_state
+        if state == "reconnecting":
+            stats = self.api.connection_stats()
+            st.warning(f"📡 Camera lost, reconnecting... (attempt {stats['attempts']}, "
+                       f"down {stats.get('down_s', 0.0):.0f} s)")
+        elif state == "lost":
+            st.error("📡 Camera was removed. Toggle Connect to reconnect.")
+
+    def _render_region_picker(self):
+        """
+        Chọn vùng kiểm tra: kéo chuột trên ảnh hiện tại (hoặc nhập toạ độ sensor), camera chỉ đọc vùng
+        đó (ROI + binning) nên frame rate tối đa tăng và băng thông giảm.
+        """
+        sensor_w, sensor_h = self.api.sensor_size()
+        frame = self.api.get_latest(copy=False) if self.api.is_background_grabbing else None
+        if frame is not None and streamlit_image_coordinates is not None:
+            preview = self.preview if self.preview is not None else getattr(self.stream_server, "encoder", None)
+            img = frame.array
+            if preview is not None:
+                preview.pixel_format = self.api.frame_format
+                img = preview.prepare(img)
+            st.caption("Drag on the image to select a region.")
+            value = streamlit_image_coordinates(Image.fromarray(img), key="region_picker", click_and_drag=True)
+            if value and "x1" in value and (value["x1"], value["y1"]) != (value["x2"], value["y2"]):
+                # Ảnh hiển thị -> pixel của frame (có thể đang là ROI/binning) -> toạ độ sensor
+                sx = frame.array.shape[1] / (value.get("width") or img.shape[1])
+                sy = frame.array.shape[0] / (value.get("height") or img.shape[0])
+                x0, x1 = sorted((value["x1"] * sx, value["x2"] * sx))
+                y0, y1 = sorted((value["y1"] * sy, value["y2"] * sy))
+                (x0, x1), (y0, y1) = self.api.frame_to_sensor([x0, x1], [y0, y1])
+                selection = [int(x0), int(y0), max(int(x1 - x0), 1), max(int(y1 - y0), 1)]
+                if st.session_state.get("region_selection") != selection:
+                    st.session_state.region_selection = selection
+                    for key, v in zip(("region_x", "region_y", "region_w", "region_h"), selection):
+                        st.session_state[key] = v
+        elif frame is None:
+            st.caption("Start the stream to draw the region on the live image.")
+        region, (bx, _) = self.api.current_region()
+        for key, v in zip(("region_x", "region_y", "region_w", "region_h"), region):
+            st.session_state.setdefault(key, int(v))
+        cols = st.columns(5)
+        cols[0].number_input("X", 0, sensor_w - 1, key="region_x")
+        cols[1].number_input("Y", 0, sensor_h - 1, key="region_y")
+        cols[2].number_input("Width", 1, sensor_w, key="region_w")
+        cols[3].number_input("Height", 1, sensor_h, key="region_h")
+        binning_options = [1, 2, 4] if self.api.binning_nodes() else [1]
+        cols[4].selectbox("Binning", binning_options, index=binning_options.index(bx) if bx in binning_options else 0,
+                          key="region_binning", disabled=len(binning_options) == 1)
+        cols = st.columns(2)
+        cols[0].button("Apply Region", key="apply_region", on_click=self._handle_region_apply,
+                       use_container_width=True)
+        cols[1].button("Full Sensor", key="full_sensor", on_click=self._handle_region_apply, args=(True,),
+                       use_container_width=True)
+        info = st.session_state.get("region_info")
+        if info is not None:
+            rx, ry, rw, rh = info["region"]
+            st.caption(f"Sensor region {rw}x{rh} at ({rx}, {ry}), binning {info['binning'][0]}x{info['binning'][1]}: "
+                       f"max {info['max_fps'] or 0:.1f} fps (was {info['previous_max_fps'] or 0:.1f} fps)")
+
+    def _handle_region_apply(self, full_sensor=False):
+        """Ghi vùng kiểm tra đang chọn (hoặc toàn sensor) xuống camera, chỉ restart acquisition 1 lần."""
+        state = st.session_state
+        if full_sensor:
+            info = self.api.set_inspect_region(None)
+        else:
+            region = (state.region_x, state.region_y, state.region_w, state.region_h)
+            info = self.api.set_inspect_region(region, binning=state.get("region_binning", 1))
+        if info is None:
+            st.toast("❌ Failed to set region!", icon="❌")
+            return
+        state.region_info = info
+        state.pop("region_selection", None)
+        for key, v in zip(("region_x", "region_y", "region_w", "region_h"), info["region"]):
+            state[key] = int(v)
+        st.toast(f"🔍 Max frame rate {info['max_fps'] or 0:.1f} fps")
+
+    def _render_telemetry(self):
+        """Panel số liệu grab/hiển thị (fragment tự chạy lại mỗi giây). Dạng Prometheus ở /metrics của server MJPEG."""
+        rows = self.telemetry.snapshot()
+
+        def total(metric, key):
+            return sum(r.get(key, 0) for r in rows if r["metric"] == metric)
+
+        cols = st.columns(4)
+        cols[0].metric("Grab FPS", f"{total('grab_frames', 'per_second'):.1f}")
+        cols[1].metric("Display FPS", f"{total('display_frames', 'per_second'):.1f}")
+        cols[2].metric("Dropped", total("grab_dropped", "value"))
+        cols[3].metric("Underruns", total("grab_timeouts", "value") + total("display_underruns", "value"))
+        timings = [r for r in rows if "avg_ms" in r]
+        if timings:
+            st.dataframe(timings, hide_index=True, use_container_width=True)
+        if self.stream_server is not None:
+            st.caption(f"Prometheus: {self._stream_url('/metrics')}")
+
+    def _stream_url(self, path="/stream.mjpg"):
+        """
+        URL của server MJPEG theo host mà trình duyệt đang dùng để truy cập Streamlit. Luồng ảnh
+        là của camera phiên này đang xem (?serial=...), mỗi tab 1 camera khác nhau cũng không lẫn hình.
+        """
+        host = "localhost"
+        try:
+            host = st.context.headers.get("Host", host).split(":")[0]
+        except Exception:
+            pass
+        url = f"http://{host}:{self.stream_server.port}{path}"
+        serial = getattr(self.api, "serial", None)
+        if path != "/metrics" and serial is not None:
+            url += f"?serial={quote(str(serial))}"
+        return url
 
     def _render_right_panel(self):
         """Vẽ cột bên phải chứa các thành phần chat."""
@@ -240,38 +589,111 @@ class VisionUI:
             st.subheader("Parser Setting")
             # Bọc text_area trong một div với class tùy chỉnh khác
             st.markdown('<div class="parser-container">', unsafe_allow_html=True)
+            metrics = st.session_state.get("metrics")
+            if metrics is not None:
+                result = {k: v for k, v in metrics.items() if k != "histogram"}
+                value = json.dumps(result, indent=2)
+            else:
+                value = "{\n  \"status\": \"Press Analyze to compute image metrics\"\n}"
             st.text_area(
                 "Agent's processed result",
-                value="{\n  \"object_detected\": \"gear\",\n  \"status\": \"OK\",\n  \"confidence\": 0.98\n}",
+                value=value,
                 height=150,
                 disabled=True,
                 label_visibility="collapsed"
             )
+            if metrics is not None:
+                st.bar_chart(metrics["histogram"], height=120)
             st.markdown('</div>', unsafe_allow_html=True)
 
+            if st.session_state.pending_replies or st.session_state.pending_analysis is not None:
+                self._poll_replies()
+
             # --- Input prompt ---
             if prompt := st.chat_input("Prompt request..."):
                 st.session_state.messages.append({"role": "user", "content": prompt})
-                # ... logic xử lí và phản hồi của bot ...
-                response = f"Echo from bot: {prompt}"
-                st.session_state.messages.append({"role": "assistant", "content": response})
+                if self.analysis_worker is None:
+                    response = f"Echo from bot: {prompt}"
+                    st.session_state.messages.append({"role": "assistant", "content": response})
+                else:
+                    # Gửi frame hiện tại + prompt cho worker, không chờ kết quả ở luồng script
+                    future = self.analysis_worker.submit(
+                        self._current_frame(), prompt,
+                        key=f"chat-{len(st.session_state.messages)}",
+                        pixel_format=self.api.frame_format if self.api.is_connected else None,
+                    )
+                    st.session_state.pending_replies.append(future)
                 st.rerun() # Chạy lại script để cập nhật giao diện chat
 
-    def render(self):
-        """Phương thức chính để vẽ toàn bộ giao diện."""
-        self._inject_custom_css()
-        
+    def _current_frame(self):
+        """Bản copy của frame đang hiển thị (stream) hoặc ảnh đã Capture, None nếu chưa có."""
+        if self.api.is_connected and self.api.is_background_grabbing:
+            frame = self.api.get_latest()
+            if frame is not None:
+                return frame.array
+        return st.session_state.get("captured_image")
+
+    @st.fragment(run_every=0.5)
+    def _poll_replies(self):
+        """Kiểm tra các câu trả lời / kết quả Analyze đang chờ (chỉ chạy lại fragment này, không chạy lại cả trang)."""
+        pending = st.session_state.pending_replies
+        analysis = st.session_state.pending_analysis
+        done = [f for f in pending if f.done()]
+        analysis_done = analysis is not None and analysis["future"].done()
+        if not done and not analysis_done:
+            waiting = len(pending) + (analysis is not None)
+            st.caption(f"⏳ Analyzing... ({waiting} pending)")
+            return
+        for future in done:
+            pending.remove(future)
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                st.session_state.messages.append({"role": "assistant", "content": f"❌ Analysis failed: {e}"})
+                continue
+            if result["metrics"] is not None:
+                st.session_state.metrics = result["metrics"]
+            st.session_state.messages.append({"role": "assistant", "content": result["reply"]})
+        if analysis_done:
+            st.session_state.pending_analysis = None
+            future = analysis["future"]
+            if not future.cancelled():
+                try:
+                    metrics = future.result()["metrics"]
+                except Exception as e:
+                    st.session_state.messages.append({"role": "assistant", "content": f"❌ Analysis failed: {e}"})
+                else:
+                    if analysis["region"] is not None:
+                        metrics["region"] = analysis["region"]
+                    st.session_state.metrics_seq = analysis["seq"]
+                    self._show_metrics(metrics)
+        st.rerun()
+
+    def render(self, profiler=None):
+        """
+        Phương thức chính để vẽ toàn bộ giao diện.
+        profiler: (tuỳ chọn) Telemetry.PhaseProfiler đo thời gian từng phần.
+        """
+        if profiler is None:
+            from Telemetry import PhaseProfiler
+            profiler = PhaseProfiler(enabled=False)
+        with profiler.phase("css"):
+            self._inject_custom_css()
+
         col_cam, col_chat = st.columns([3, 2], gap="large")
 
-        with col_cam:
-            self._render_left_panel()
+        with col_cam, profiler.phase("left_panel"):
+            self._render_left_panel(profiler)
 
-        with col_chat:
+        with col_chat, profiler.phase("right_panel"):
             self._render_right_panel()
 
 
 # --- Điểm bắt đầu chạy ứng dụng ---
 if __name__ == "__main__":
+    VisionUI.configure_page()
     app = VisionUI(None)
     app.render()
 
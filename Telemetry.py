@@ -0,0 +1,251 @@
+# Telemetry.py
+# Đo đạc theo frame (thời gian từng chặng, FPS, frame mất, underrun) với chi phí rất thấp,
+# xuất dạng text Prometheus (/metrics của MjpegStreamServer) và bảng cho panel của VisionUI.
+import bisect
+import contextlib
+import threading
+import time
+
+# Biên bucket histogram (ms) dùng chung cho mọi Timing
+BUCKETS_MS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0, 250.0, 500.0, 1000.0)
+
+
+class Timing:
+    """
+    Phân bố thời gian 1 chặng (ms): count/sum/max, histogram bucket cố định và trung bình trượt.
+    observe() không khoá (vài phép cộng, ~0.3 µs): thường chỉ 1 luồng ghi (luồng grab, luồng encode);
+    ghi song song từ nhiều luồng có thể sót vài mẫu, chấp nhận được cho số liệu giám sát.
+    """
+    __slots__ = ("count", "total", "max", "ewma", "buckets")
+    kind = "histogram"
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.ewma = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def observe(self, ms):
+        self.ewma += (ms - self.ewma) * (0.1 if self.count else 1.0)
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "ewma_ms": round(self.ewma, 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class Counter:
+    """Bộ đếm tăng dần; fn (tuỳ chọn) đọc giá trị từ nơi khác lúc xuất (vd. FrameRingBuffer.frames_dropped)."""
+    __slots__ = ("value", "fn")
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+        self.fn = None
+
+    def inc(self, n=1):
+        self.value += n
+
+    def get(self):
+        if self.fn is not None:
+            try:
+                return self.fn()
+            except Exception:
+                return self.value
+        return self.value
+
+    def snapshot(self):
+        return {"value": self.get()}
+
+
+class Gauge(Counter):
+    """Giá trị tức thời (set() hoặc fn)."""
+    __slots__ = ()
+    kind = "gauge"
+
+    def set(self, value):
+        self.value = value
+
+
+class Rate:
+    """Đếm sự kiện và tốc độ (sự kiện/s) trung bình trượt theo khoảng cách giữa các lần tick()."""
+    __slots__ = ("count", "per_second", "_last")
+    kind = "rate"
+
+    def __init__(self):
+        self.count = 0
+        self.per_second = 0.0
+        self._last = None
+
+    def tick(self, now=None):
+        now = time.perf_counter() if now is None else now
+        last = self._last
+        if last is not None and now > last:
+            inst = 1.0 / (now - last)
+            self.per_second += (inst - self.per_second) * (0.1 if self.count > 1 else 1.0)
+        self._last = now
+        self.count += 1
+
+    def get(self):
+        # Không có sự kiện trong 2 chu kỳ gần nhất -> coi như đã dừng
+        if self._last is None or (self.per_second and time.perf_counter() - self._last > 2.0 / self.per_second):
+            return 0.0
+        return self.per_second
+
+    def snapshot(self):
+        return {"count": self.count, "per_second": round(self.get(), 2)}
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in items)
+    return "{" + body + "}"
+
+
+class Telemetry:
+    """
+    Sổ đăng ký các chuỗi số liệu theo (tên, nhãn). timing()/counter()/gauge()/rate() trả về cùng
+    1 đối tượng cho cùng tên + nhãn, nên thành phần kết nối lại (vd. camera cùng serial) đếm tiếp.
+    Phía đo giữ tham chiếu tới đối tượng và gọi observe()/inc()/tick() trực tiếp, không tra dict mỗi frame.
+    """
+    def __init__(self, prefix="basler"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._series = {}  # (name, labels) -> instrument
+        self._help = {}
+
+    def _get(self, cls, name, help, labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        inst = self._series.get(key)
+        if inst is None:
+            with self._lock:
+                inst = self._series.get(key)
+                if inst is None:
+                    inst = self._series[key] = cls()
+                    self._help.setdefault(name, help)
+        return inst
+
+    def timing(self, name, help="", **labels):
+        return self._get(Timing, name, help, labels)
+
+    def counter(self, name, help="", fn=None, **labels):
+        counter = self._get(Counter, name, help, labels)
+        if fn is not None:
+            counter.fn = fn
+        return counter
+
+    def gauge(self, name, help="", fn=None, **labels):
+        gauge = self._get(Gauge, name, help, labels)
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def rate(self, name, help="", **labels):
+        return self._get(Rate, name, help, labels)
+
+    def snapshot(self):
+        """list[dict] mỗi chuỗi 1 dòng: metric, labels, rồi các giá trị của loại đó (dùng cho st.dataframe)."""
+        with self._lock:
+            series = sorted(self._series.items())
+        return [{"metric": name, "labels": ", ".join(f"{k}={v}" for k, v in labels), **inst.snapshot()}
+                for (name, labels), inst in series]
+
+    def render_prometheus(self):
+        """Text exposition format 0.0.4 của Prometheus (thời gian xuất theo giây)."""
+        with self._lock:
+            series = sorted(self._series.items())
+        lines = []
+        family = None
+        for (name, labels), inst in series:
+            kind = inst.kind
+            metric = f"{self.prefix}_{name}"
+            if kind == "histogram":
+                metric += "_seconds"
+            elif kind in ("counter", "rate"):
+                metric += "_total"
+            if metric != family:
+                family = metric
+                lines.append(f"# HELP {metric} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {metric} {'counter' if kind == 'rate' else kind}")
+            if kind == "histogram":
+                cumulative = 0
+                for bound, n in zip(BUCKETS_MS, inst.buckets):
+                    cumulative += n
+                    lines.append(f"{metric}_bucket{_format_labels(labels, ('le', repr(bound / 1e3)))} {cumulative}")
+                lines.append(f"{metric}_bucket{_format_labels(labels, ('le', '+Inf'))} {inst.count}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {inst.total / 1e3!r}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {inst.count}")
+            elif kind == "rate":
+                lines.append(f"{metric}{_format_labels(labels)} {inst.count}")
+            else:
+                lines.append(f"{metric}{_format_labels(labels)} {inst.get()}")
+        # Tốc độ (Rate) xuất thêm 1 gauge /s để xem nhanh không cần rate() của Prometheus
+        rates = [(name, labels, inst) for (name, labels), inst in series if inst.kind == "rate"]
+        family = None
+        for name, labels, inst in rates:
+            metric = f"{self.prefix}_{name}_per_second"
+            if metric != family:
+                family = metric
+                lines.append(f"# HELP {metric} {self._help.get(name, '')} (trung bình trượt)")
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{_format_labels(labels)} {round(inst.get(), 3)}")
+        return "\n".join(lines) + "\n"
+
+
+class PhaseProfiler:
+    """
+    Thời gian từng chặng của 1 lần chạy script Streamlit (khởi động hoặc rerun):
+        prof = PhaseProfiler(telemetry, kind="rerun")
+        with prof.phase("css"): ...
+        prof.mark("first_paint")   # từ đầu lần chạy tới lúc này
+        prof.finish()              # -> {chặng: ms}, kèm "total"
+    Mỗi chặng ghi vào Timing app_phase{kind, phase} (panel Telemetry và /metrics). Tạo mới cho mỗi
+    lần chạy (các phiên chạy song song không dùng chung). enabled=False thì phase()/mark() không đo gì.
+    """
+    def __init__(self, telemetry=None, kind="rerun", enabled=True, start=None):
+        self.telemetry = telemetry if telemetry is not None else TELEMETRY
+        self.kind = kind
+        self.enabled = enabled
+        self.t0 = time.perf_counter() if start is None else start
+        self.phases = {}
+
+    def add(self, name, ms):
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+        self.telemetry.timing("app_phase", "Thời gian từng chặng của 1 lần chạy script Streamlit",
+                              kind=self.kind, phase=name).observe(ms)
+
+    @contextlib.contextmanager
+    def _timed(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t0) * 1e3)
+
+    def phase(self, name):
+        return self._timed(name) if self.enabled else contextlib.nullcontext()
+
+    def mark(self, name):
+        if self.enabled and name not in self.phases:
+            self.add(name, (time.perf_counter() - self.t0) * 1e3)
+
+    def finish(self):
+        if self.enabled:
+            self.add("total", (time.perf_counter() - self.t0) * 1e3)
+        return self.phases
+
+
+# Sổ đăng ký mặc định cho cả process (BaslerCameraAPI, MjpegStreamServer, VisionUI)
+TELEMETRY = Telemetry()
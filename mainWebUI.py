@@ -1,51 +1,149 @@
 # mainWebUI.py
 #streamlit run mainWebUI.py --logger.level=debug
-import streamlit as st
 import time
-import numpy as np
-from BaslerAPI import BaslerCameraAPI
-from PIL import Image
-from io import BytesIO
+_RUN_START = time.perf_counter()  # mỗi lần chạy script (khởi động/rerun) bắt đầu từ đây
+import logging
+import os
+import streamlit as st
 from StreamlitUI import VisionUI
+from Telemetry import PhaseProfiler
+# Các module nặng (pypylon, process pool, server MJPEG...) chỉ import trong các hàm st.cache_resource bên dưới,
+# tức 1 lần cho cả process; mỗi rerun chỉ còn tra sys.modules cho 2 import ở trên
+_IMPORTS_MS = (time.perf_counter() - _RUN_START) * 1e3
+
+# Cấu hình stream MJPEG cho trình duyệt (MJPEG_PORT=0 để quay về hiển thị bằng st.image)
+MJPEG_PORT = int(os.environ.get("MJPEG_PORT", "8502"))
+MJPEG_QUALITY = int(os.environ.get("MJPEG_QUALITY", "80"))
+MJPEG_MAX_WIDTH = int(os.environ.get("MJPEG_MAX_WIDTH", "1280"))
+MJPEG_MAX_FPS = float(os.environ.get("MJPEG_MAX_FPS", "15"))
+# Ảnh xem trước: cột camera chiếm ~60% trang nên không cần gửi full-res sensor
+PREVIEW_FORMAT = os.environ.get("PREVIEW_FORMAT", "JPEG")  # JPEG hoặc WEBP
+PREVIEW_BITRATE = float(os.environ.get("PREVIEW_BITRATE", "8e6"))  # bit/s mục tiêu
+# Enumerate camera ở luồng nền mỗi DEVICE_REFRESH_S giây thay vì mỗi lần rerun
+DEVICE_REFRESH_S = float(os.environ.get("DEVICE_REFRESH_S", "5"))
+# Backend camera: "pylon" (camera thật) hoặc "sim" (SimCamera, chạy cả ứng dụng không cần camera)
+CAMERA_BACKEND = os.environ.get("CAMERA_BACKEND", "pylon").lower()
+SIM_CAMERAS = os.environ.get("SIM_CAMERAS", "SIM0001,SIM0002").split(",")
+SIM_SIZE = os.environ.get("SIM_SIZE", "1280x720")
+SIM_FPS = float(os.environ.get("SIM_FPS", "30"))
+# Tốc độ đọc sensor giả lập ở full-frame (giảm ROI/binning thì frame rate tối đa tăng)
+SIM_READOUT_FPS = float(os.environ.get("SIM_READOUT_FPS", "30"))
+SIM_DROP_RATE = float(os.environ.get("SIM_DROP_RATE", "0"))
+# Thời gian EnumerateDevices giả lập (GigE thật thường 0.5-3 s)
+SIM_ENUMERATE_DELAY = float(os.environ.get("SIM_ENUMERATE_DELAY", "0"))
+# Bỏ qua encode/phân tích frame trùng khi cảnh tĩnh: ngưỡng lệch (mức xám 8-bit) của 1 ô, 0 = tắt;
+# CHANGE_REFRESH_S: vẫn làm mới ít nhất mỗi chừng ấy giây
+CHANGE_THRESHOLD = float(os.environ.get("CHANGE_THRESHOLD", "6"))
+CHANGE_REFRESH_S = float(os.environ.get("CHANGE_REFRESH_S", "2"))
+# Ngân sách bộ đệm event clip (MB), chỉ cấp khi người dùng bấm "Arm Clip"
+EVENT_CLIP_MB = float(os.environ.get("EVENT_CLIP_MB", "256"))
+# Mức log của các module camera (DEBUG, INFO, WARNING, ERROR); Streamlit có --logger.level riêng
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# PROFILE=1: đo từng chặng của mỗi lần khởi động/rerun (log INFO + app_phase trong panel Telemetry, /metrics)
+PROFILE = os.environ.get("PROFILE", "0").lower() in ("1", "true", "yes")
+
+# basicConfig chỉ có tác dụng ở lần chạy đầu (root logger chưa có handler), các lần rerun bỏ qua
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+def make_preview_pipeline():
+    from Preview import PreviewPipeline
+    return PreviewPipeline(display_width=MJPEG_MAX_WIDTH, fmt=PREVIEW_FORMAT, target_bitrate=PREVIEW_BITRATE,
+                           fps=MJPEG_MAX_FPS, quality=MJPEG_QUALITY)
+
+@st.cache_resource
+def get_stream_server():
+    """Khởi động server MJPEG 1 lần cho cả process (không chạy lại mỗi lần rerun)."""
+    if not MJPEG_PORT:
+        return None
+    from StreamServer import MjpegStreamServer
+    # Mỗi camera CameraService mở có 1 luồng (encoder) riêng: /stream.mjpg?serial=<serial>
+    server = MjpegStreamServer(port=MJPEG_PORT, max_fps=MJPEG_MAX_FPS, encoder_factory=make_preview_pipeline)
+    try:
+        server.start()
+    except OSError as e:
+        logger.warning("Không mở được server MJPEG port %s: %s", MJPEG_PORT, e)
+        return None
+    return server
+
+@st.cache_resource
+def get_tl_factory():
+    """Transport layer theo CAMERA_BACKEND; None = pylon.TlFactory mặc định."""
+    if CAMERA_BACKEND != "sim":
+        return None
+    from SimCamera import SimTlFactory
+    width, height = (int(v) for v in SIM_SIZE.lower().split("x"))
+    logger.info("Dùng camera giả lập: %s (%dx%d @ %s fps)", ", ".join(SIM_CAMERAS), width, height, SIM_FPS)
+    # Camera màu: raw BayerRG8 như camera thật, luồng grab demosaic (CameraService bật convert)
+    return SimTlFactory(serials=SIM_CAMERAS, width=width, height=height, fps=SIM_FPS, pixel_format="BayerRG8",
+                        readout_fps=SIM_READOUT_FPS, drop_rate=SIM_DROP_RATE, enumerate_delay=SIM_ENUMERATE_DELAY)
+
+@st.cache_resource
+def get_device_registry():
+    """Danh sách camera cache + sự kiện cắm/rút, làm mới ở luồng nền."""
+    from DeviceRegistry import DeviceRegistry
+    registry = DeviceRegistry(tl_factory=get_tl_factory(), ttl=DEVICE_REFRESH_S)
+    registry.start()
+    return registry
+
+def make_change_detector():
+    if CHANGE_THRESHOLD <= 0:
+        return None
+    from ChangeDetector import ChangeDetector
+    return ChangeDetector(threshold=CHANGE_THRESHOLD, refresh_interval=CHANGE_REFRESH_S)
+
+@st.cache_resource
+def get_camera_service():
+    """Sở hữu các camera cho cả process, sống qua mọi lần rerun và mọi phiên."""
+    from CameraService import CameraService
+    return CameraService(registry=get_device_registry(), change_detector_factory=make_change_detector,
+                         stream_server=get_stream_server())
+
+@st.cache_resource
+def get_analysis_worker():
+    """Worker phân tích/agent dùng chung cho cả process (process pool + event loop riêng)."""
+    from AnalysisWorker import AnalysisWorker
+    return AnalysisWorker()
 
 def main():
+    # Lần chạy đầu của phiên (mở/tải lại trang) đo là "startup", các lần sau là "rerun"
+    first_run = "camera_api" not in st.session_state
+    prof = PhaseProfiler(kind="startup" if first_run else "rerun", enabled=PROFILE, start=_RUN_START)
+    if PROFILE:
+        prof.add("imports", _IMPORTS_MS)
     # --- KHỞI TẠO ---
-    # Sử dụng session_state để API chỉ được khởi tạo 1 lần duy nhất
-    if 'camera_api' not in st.session_state:
-        st.session_state.camera_api = BaslerCameraAPI()
-
-    # Lấy đối tượng API từ session_state
-    api = st.session_state.camera_api
-    # baslerapi = BaslerCameraAPI()
-    # Khởi tạo UI và truyền đối tượng API vào
-    # Giao diện UI giờ đây có thể truy cập các hàm của API
-    ui = VisionUI(camera_api=api)
+    if first_run:
+        # Layout/tiêu đề trang được trình duyệt giữ qua các lần rerun: chỉ gửi 1 lần mỗi phiên
+        with prof.phase("page_config"):
+            VisionUI.configure_page()
+    with prof.phase("resources"):
+        # Camera được giữ bởi CameraService dùng chung cho cả process: mỗi phiên (tab) chỉ có 1 handle
+        # riêng trong session_state, nhiều tab cùng xem 1 camera mà thiết bị chỉ được mở 1 lần
+        if first_run:
+            st.session_state.camera_api = get_camera_service().viewer()
+        api = st.session_state.camera_api
+        # Server MJPEG dùng chung: luồng của từng camera do CameraService đăng ký, rerun không đụng tới
+        stream_server = get_stream_server()
+        if 'preview' not in st.session_state:
+            st.session_state.preview = make_preview_pipeline()
+    with prof.phase("ui_init"):
+        # VisionUI sống cùng phiên: danh sách camera, số liệu... không dựng lại mỗi rerun
+        # (isinstance: sau khi sửa code StreamlitUI, lớp mới được nạp lại thì dựng lại)
+        ui = st.session_state.get("vision_ui")
+        if not isinstance(ui, VisionUI):
+            ui = st.session_state.vision_ui = VisionUI(
+                camera_api=api, stream_server=stream_server, analysis_worker=get_analysis_worker(),
+                preview=st.session_state.preview, live_fps=MJPEG_MAX_FPS, clip_budget_mb=EVENT_CLIP_MB)
     # --- VẼ GIAO DIỆN ---
-    ui.render()
-
-    while st.session_state.stream_status:
-        # Lấy ảnh từ camera
-        image = api.get_image(timeout=100) # timeout thấp để không bị treo
-        if image is not None:
-            # Chuyển đổi ảnh sang định dạng phù hợp với Streamlit
-            img = Image.fromarray(image)
-            # Hiển thị ảnh trong placeholder
-            ui.image_placeholder.image(img, caption="Camera feed", use_column_width=True)
-        else:
-            # Hiển thị ảnh mặc định nếu không có dữ liệu
-            placeholder_frame = np.full((720, 1280, 3), 122, dtype=np.uint8)
-            ui.image_placeholder.image(placeholder_frame, caption="No camera feed available.", use_column_width=True)
-        time.sleep(0.01)
-        # Kiểm tra lại trạng thái, nếu người dùng đã tắt stream thì thoát vòng lặp
-        if not st.session_state.stream_status:
-            break
-    # Hiển thị ảnh mặc định khi không stream
-    if not st.session_state.stream_status:
-        placeholder_frame = np.full((720, 1280, 3), 122, dtype=np.uint8)
-        if ui.image_placeholder:
-            ui.image_placeholder.image(placeholder_frame, caption="Camera feed will appear here.", use_column_width=True)
+    # Không còn vòng lặp while giữ luồng script: có server MJPEG thì trình duyệt tự kéo stream,
+    # không có thì VisionUI vẽ frame trong 1 fragment tự chạy lại theo MJPEG_MAX_FPS
+    ui.render(profiler=prof)
+    phases = prof.finish()
+    if PROFILE:
+        logger.info("%s %.1f ms: %s", prof.kind, phases["total"],
+                    ", ".join(f"{name} {ms:.1f}" for name, ms in phases.items() if name != "total"))
 
 if __name__ == "__main__":
     # Chạy ứng dụng Streamlit
     main()
-    # Hoặc nếu muốn chạy trực tiếp từ terminal: streamlit run mainWebUI.py --logger.level=debug
\ No newline at end of file
+    # Hoặc nếu muốn chạy trực tiếp từ terminal: streamlit run mainWebUI.py --logger.level=debug